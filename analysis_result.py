@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+記憶體中的分析結果
+
+AnalysisResult 由分析直接交給繪圖、HTML 報告與 Shiny，不必再從 coverage_data.csv、
+coverage_stats.json 重新解析同一份數據。每個結果有一個輸入指紋 (key)：
+由分析產生時為分析參數 (TLE、觀測點、時間範圍、方法) 的雜湊，由輸出目錄讀取時為結果檔案的大小與修改時間，
+產物清單 (artifact_manifest.py) 以此判斷圖表與報告是否需要重新產生。
+
+load_result() 由輸出目錄讀取結果並在行程內快取，檔案未變更時重複呼叫 (例如 Shiny 每次切換頁面) 不會重新解析。
+"""
+
+import os
+import json
+import hashlib
+
+import pandas as pd
+
+from result_writer import read_results
+
+COVERAGE_NAME = 'coverage_data'
+HANDOVER_NAME = 'handover_data'
+STATS_FILE = 'coverage_stats.json'
+
+# 由輸出目錄讀取的結果：絕對路徑 -> (檔案簽章, AnalysisResult)
+_loaded = {}
+
+
+class AnalysisResult:
+    """一次分析的覆蓋數據、統計與切換事件"""
+
+    def __init__(self, coverage_df, stats=None, handovers_df=None, output_dir=None, params=None, key=None):
+        """
+        Args:
+            coverage_df (DataFrame): 覆蓋數據 (coverage_data 格式)
+            stats (dict): 統計數據 (coverage_stats.json 的內容)，None 表示由使用端計算
+            handovers_df (DataFrame): 衛星切換事件
+            output_dir (str): 結果所在的輸出目錄
+            params (dict): 產生結果的分析參數，用於計算輸入指紋
+            key (str): 指定輸入指紋；未指定時由 params 或覆蓋數據內容計算
+        """
+        self.coverage_df = coverage_df
+        self.stats = stats
+        self.handovers_df = handovers_df
+        self.output_dir = output_dir
+        self.params = dict(params) if params else {}
+        self._key = key
+
+    @property
+    def key(self):
+        """輸入指紋：輸入相同時產生的圖表與報告也相同"""
+        if self._key is None:
+            if self.params:
+                payload = json.dumps(self.params, sort_keys=True, default=str).encode()
+            else:
+                # 沒有分析參數時以覆蓋數據的內容計算
+                payload = (pd.util.hash_pandas_object(self.coverage_df, index=False).to_numpy().tobytes()
+                           if self.coverage_df is not None else b'')
+            self._key = hashlib.sha256(payload).hexdigest()[:16]
+        return self._key
+
+    @property
+    def empty(self):
+        return self.coverage_df is None or self.coverage_df.empty
+
+    @classmethod
+    def load(cls, output_dir):
+        """由輸出目錄讀取結果 (依序讀取 Parquet 分片、Arrow 串流或 CSV)；沒有覆蓋數據時回傳 None"""
+        signature = _result_signature(output_dir)
+        if signature is None:
+            return None
+        coverage_df = read_results(output_dir, COVERAGE_NAME)
+        stats = None
+        stats_path = os.path.join(output_dir, STATS_FILE)
+        if os.path.exists(stats_path):
+            with open(stats_path, 'r') as f:
+                stats = json.load(f)
+        handovers_df = read_results(output_dir, HANDOVER_NAME)
+        return cls(coverage_df, stats, handovers_df if len(handovers_df.columns) else None, output_dir,
+                   key=hashlib.sha256(repr(signature).encode()).hexdigest()[:16])
+
+
+def _result_signature(output_dir):
+    """結果檔案的 (路徑, 大小, 修改時間)，沒有覆蓋數據時為 None"""
+    paths = [os.path.join(output_dir, f"{COVERAGE_NAME}.csv"), os.path.join(output_dir, f"{COVERAGE_NAME}.parquet"),
+             os.path.join(output_dir, f"{COVERAGE_NAME}.arrows"), os.path.join(output_dir, STATS_FILE),
+             os.path.join(output_dir, f"{HANDOVER_NAME}.csv"), os.path.join(output_dir, f"{HANDOVER_NAME}.parquet"),
+             os.path.join(output_dir, f"{HANDOVER_NAME}.arrows")]
+    if not any(os.path.exists(path) for path in paths[:3]):
+        return None
+    signature = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                stat = os.stat(os.path.join(path, name))
+                signature.append((os.path.basename(path), name, stat.st_size, stat.st_mtime_ns))
+        elif os.path.exists(path):
+            stat = os.stat(path)
+            signature.append((os.path.basename(path), stat.st_size, stat.st_mtime_ns))
+    return tuple(signature)
+
+
+def load_result(output_dir):
+    """讀取輸出目錄的分析結果，檔案未變更時回傳先前讀取的結果
+
+    Returns:
+        AnalysisResult；沒有覆蓋數據時為 None
+    """
+    path = os.path.abspath(output_dir)
+    signature = _result_signature(path)
+    if signature is None:
+        _loaded.pop(path, None)
+        return None
+    cached = _loaded.get(path)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    result = AnalysisResult.load(output_dir)
+    _loaded[path] = (signature, result)
+    return result
+
+
+def remember_result(result):
+    """登記剛產生並寫出的結果，之後 load_result() 讀取同一目錄時直接使用，不重新解析檔案"""
+    if result is None or result.output_dir is None or result.coverage_df is None:
+        return
+    path = os.path.abspath(result.output_dir)
+    signature = _result_signature(path)
+    if signature is not None:
+        _loaded[path] = (signature, result)
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+產物清單
+
+輸出目錄中的 artifacts.json 記錄每個產物 (時間線圖、熱力圖、HTML 報告) 的輸入指紋與輸出檔案。
+輸入指紋 (分析結果的 key、程式版本加上解析度、格式等設定) 相同且檔案仍在、大小未變時，產物不需重新產生；
+計算引擎、繪圖或報告模板的原始碼變更後，所有產物都會重新產生。
+Shiny 等使用端也可讀取清單判斷哪些產物已是最新。
+"""
+
+import os
+import json
+import hashlib
+from datetime import datetime, timezone
+
+from result_cache import code_version
+
+MANIFEST_FILE = 'artifacts.json'
+
+# 決定圖表與報告外觀的模組，內容變更時所有產物重新產生
+_RENDER_MODULES = ('rendering.py', 'plotting.py', 'report_templates.py')
+
+_render_version = None
+
+
+def render_version():
+    """計算引擎版本 (code_version) 與繪圖、報告模板原始碼的雜湊值，作為產物輸入指紋的一部分"""
+    global _render_version
+    if _render_version is None:
+        digest = hashlib.sha256(code_version().encode())
+        root = os.path.dirname(os.path.abspath(__file__))
+        for name in _RENDER_MODULES:
+            path = os.path.join(root, name)
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    digest.update(f.read())
+        _render_version = digest.hexdigest()[:16]
+    return _render_version
+
+
+class ArtifactManifest:
+    """輸出目錄的產物清單"""
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, MANIFEST_FILE)
+        self.entries = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r') as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"產物清單 {self.path} 無法讀取，將重新產生所有產物: {e}")
+
+    def is_current(self, name, inputs):
+        """產物 name 是否已由相同的輸入產生且檔案未被更動"""
+        entry = self.entries.get(name)
+        if entry is None or entry.get('inputs') != inputs:
+            return False
+        for filename, size in entry.get('files', {}).items():
+            path = os.path.join(self.output_dir, filename)
+            if not os.path.exists(path) or os.path.getsize(path) != size:
+                return False
+        return True
+
+    def record(self, name, inputs, paths):
+        """記錄產物 name 的輸入指紋與輸出檔案，並寫出清單"""
+        if isinstance(paths, str):
+            paths = [paths]
+        self.entries[name] = {
+            'inputs': inputs,
+            'files': {os.path.relpath(path, self.output_dir): os.path.getsize(path)
+                      for path in paths if os.path.exists(path)},
+            'created_at': datetime.now(timezone.utc).isoformat(),
+        }
+        self.save()
+
+    def invalidate(self, name=None):
+        """移除產物 name (None 表示全部) 的紀錄，下次使用時重新產生"""
+        if name is None:
+            self.entries = {}
+        else:
+            self.entries.pop(name, None)
+        self.save()
+
+    def save(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.entries, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
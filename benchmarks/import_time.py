@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+匯入時間預算檢查
+
+在全新的 Python 行程中多次匯入計算模組，取中位數與預算比較，
+並確認只做計算時不會載入繪圖與網路相關的套件。超出預算或載入了不該載入的套件時以非零狀態結束，
+可放在 CI 或發佈前執行：
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --budget 0.8 --repeat 7
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+# 預設的匯入時間預算(秒)，可由環境變數覆寫
+DEFAULT_BUDGET_SECONDS = float(os.environ.get('STARLINK_IMPORT_BUDGET_SECONDS', 1.0))
+# 計算路徑匯入的模組 (visibility 為 app.R 以 source_python 載入的 py/visibility.py)
+DEFAULT_MODULES = ('satellite_analysis', 'propagation', 'visibility')
+# 只做計算時不應載入的套件 (繪圖後端、進度條、網路)
+FORBIDDEN_MODULES = ('matplotlib', 'plotly', 'tqdm', 'requests')
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'loaded': [m for m in {forbidden!r} if m in sys.modules]}}))
+"""
+
+
+def measure_import(module, repeat=5):
+    """在 repeat 個新行程中匯入 module
+
+    Returns:
+        (各次匯入秒數列表, 載入的禁用套件列表)
+    """
+    paths = [PROJECT_ROOT, os.path.join(PROJECT_ROOT, 'py'), os.environ.get('PYTHONPATH')]
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, paths)))
+    timings = []
+    loaded = set()
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, '-c', _PROBE.format(module=module, forbidden=FORBIDDEN_MODULES)],
+            cwd=PROJECT_ROOT, env=env, check=True, capture_output=True, text=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        timings.append(result['seconds'])
+        loaded.update(result['loaded'])
+    return timings, sorted(loaded)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='檢查計算模組的匯入時間預算')
+    parser.add_argument('--budget', type=float, default=DEFAULT_BUDGET_SECONDS, help='匯入時間預算(秒，取中位數比較)')
+    parser.add_argument('--repeat', type=int, default=5, help='每個模組重複匯入的次數')
+    parser.add_argument('modules', nargs='*', default=list(DEFAULT_MODULES), help='要檢查的模組')
+    args = parser.parse_args(argv)
+
+    failed = False
+    for module in args.modules:
+        timings, loaded = measure_import(module, repeat=max(1, args.repeat))
+        median = statistics.median(timings)
+        status = '通過' if median <= args.budget and not loaded else '失敗'
+        print(f"{module:20s} 中位數 {median:.3f} 秒 (最快 {min(timings):.3f} 秒，預算 {args.budget:.3f} 秒) {status}")
+        if loaded:
+            print(f"  載入了不應在計算路徑載入的套件: {', '.join(loaded)}")
+        failed = failed or status == '失敗'
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+離線效能基準測試
+
+以專案內附的 TLE 測試資料 (benchmarks/fixtures/starlink_fixture.tle，1000 顆依 Starlink
+軌道殼層產生的衛星) 與固定的起始時間，依序量測分析流程的各個階段：
+
+    catalog_compile / catalog_load   TLE 編譯為二進位目錄、以記憶體映射讀回
+    propagate[衛星數x時間點數]       向量化引擎在不同規模下的傳播
+    analyze                          analyze_24h_coverage (含串流統計、切換追蹤與寫出)
+    stats / handover                 由 coverage_df 重算統計與切換事件
+    compute_visibility               Shiny 使用的 py/visibility.py 逐筆可見紀錄
+    render[preview|print] / heatmap  各預設組合的圖表 (行程池同時繪製) 與單獨的互動熱力圖
+    html_report                      HTML 報告
+
+每個階段輸出牆鐘時間、CPU 時間、吞吐量 (衛星 × 時間點 / 秒) 與行程的峰值常駐記憶體，
+並以目前的純量 skyfield 路徑 `(satellite - observer).at(t).altaz()` 驗證向量化引擎的結果，
+再以 DataFrame.equals 確認中斷後由檢查點繼續的分析與不中斷的執行完全相同 (單行程與平行、各輸出格式)，
+並確認以 workers=2 提交的背景工作 (jobs.py) 能在工作行程內平行計算並完成。
+不需要網路連線，所有輸出都寫入暫存目錄。
+
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --quick --json bench.json
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import argparse
+import importlib.util
+import platform
+import tempfile
+import contextlib
+from datetime import datetime, timezone
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'py'))
+
+import numpy as np
+from skyfield.api import wgs84, EarthSatellite
+
+from catalog import load_catalog
+from time_grid import TimeGrid
+from coverage_stats import CoverageStats
+from run_metrics import peak_rss_mb
+from handover import handovers_from_coverage
+from propagation import SatelliteArray, propagate_coverage, shared_timescale, DEFAULT_MIN_ELEVATION
+from satellite_analysis import StarlinkAnalysis, TAIPEI_LAT, TAIPEI_LON, ELEVATION
+from rendering import render_heatmap, HEATMAP_FILE
+
+FIXTURE_TLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'starlink_fixture.tle')
+# 固定的起始時間 (與測試資料的 TLE 曆元相同)，結果不隨執行時間改變
+FIXED_START = datetime(2025, 5, 19, 0, 0, tzinfo=timezone.utc)
+# 傳播的 (衛星數, 時間點數) 規模，時間間隔一分鐘
+DEFAULT_SIZES = ((100, 60), (500, 360), (1000, 1440))
+QUICK_SIZES = ((100, 60), (1000, 120))
+# 完整分析與報告使用的時長(分鐘)
+DEFAULT_ANALYSIS_MINUTES = 360
+QUICK_ANALYSIS_MINUTES = 60
+# 正確性檢查：衛星數、時間點數、時間間隔(秒)與可接受的仰角差異(度)
+CHECK_SATELLITES = 60
+CHECK_STEPS = 120
+CHECK_STEP_SECONDS = 30
+CHECK_TOLERANCE_DEG = 1e-3
+# 繼續分析檢查：分析時長(分鐘)與中斷前完成的時間點數
+RESUME_CHECK_MINUTES = 180
+RESUME_INTERRUPT_STEPS = 70
+# 背景工作檢查：分析時長(分鐘)、平行行程數與等待上限(秒)
+JOB_CHECK_MINUTES = 30
+JOB_CHECK_WORKERS = 2
+JOB_CHECK_TIMEOUT_SECONDS = 300
+
+
+class _NullProgress:
+    """不顯示的進度條"""
+
+    def update(self, n=1):
+        pass
+
+
+class _Interrupted(Exception):
+    """模擬的分析中斷"""
+
+
+class _InterruptingProgress:
+    """完成 limit 個時間點後拋出 _Interrupted，模擬分析中途被終止"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.n = 0
+
+    def update(self, n=1):
+        self.n += n
+        if self.n >= self.limit:
+            raise _Interrupted()
+
+
+def read_fixture(path=FIXTURE_TLE, n_satellites=None):
+    """讀取測試資料的 TLE 文字行，可只取前 n_satellites 顆"""
+    with open(path, 'r') as f:
+        lines = f.read().strip().split('\n')
+    return lines if n_satellites is None else lines[:3 * n_satellites]
+
+
+class BenchmarkRun:
+    """依序執行並記錄各階段"""
+
+    def __init__(self, verbose=False):
+        self.verbose = verbose
+        self.results = []
+
+    def phase(self, name, func, satellite_steps=None):
+        """執行一個階段並記錄時間與記憶體；階段失敗時記錄錯誤並繼續後續階段"""
+        output = None if self.verbose else io.StringIO()
+        redirect = contextlib.redirect_stdout(output) if output is not None else contextlib.nullcontext()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        value, error = None, None
+        try:
+            with redirect:
+                value = func()
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+        record = {
+            'phase': name,
+            'wall_seconds': round(wall, 4),
+            'cpu_seconds': round(cpu, 4),
+            'satellite_steps': satellite_steps,
+            'throughput': round(satellite_steps / wall) if satellite_steps and wall > 0 else None,
+            'peak_rss_mb': peak_rss_mb(),
+            'status': 'ok' if error is None else 'error',
+        }
+        if error is not None:
+            record['error'] = error
+        self.results.append(record)
+        self._print(record)
+        return value
+
+    @staticmethod
+    def _print(record):
+        throughput = f"{record['throughput']:>14,}" if record['throughput'] else ' ' * 14
+        rss = f"{record['peak_rss_mb']:>8.1f}" if record['peak_rss_mb'] is not None else ' ' * 8
+        line = (f"{record['phase']:28s} {record['wall_seconds']:9.3f} {record['cpu_seconds']:9.3f} "
+                f"{throughput} {rss}")
+        if record['status'] != 'ok':
+            line += f"  失敗 ({record['error']})"
+        print(line, flush=True)
+
+
+def check_against_skyfield(tle_lines, observer, n_satellites=CHECK_SATELLITES, n_steps=CHECK_STEPS,
+                           step_seconds=CHECK_STEP_SECONDS, min_elevation=DEFAULT_MIN_ELEVATION):
+    """以純量 skyfield 路徑驗證向量化引擎的可見衛星數與最佳衛星
+
+    仰角與門檻相差不到 CHECK_TOLERANCE_DEG 的衛星兩者判斷可能不同，不計為不一致。
+
+    Returns:
+        dict，包含最大仰角差異、不一致的時間點數與是否通過
+    """
+    ts = shared_timescale()
+    catalog = load_catalog(tle_lines[:3 * n_satellites])
+    satellite_array = SatelliteArray.from_catalog(catalog)
+    time_grid = TimeGrid(FIXED_START, np.arange(n_steps) * float(step_seconds))
+    t = time_grid.to_skyfield(ts)
+    coverage = propagate_coverage(satellite_array, observer, t, min_elevation)
+
+    # 目前的純量路徑：直接由原始 TLE 文字行建立 EarthSatellite (不經過衛星目錄)，以 skyfield 計算整段時間的仰角
+    satellites = [EarthSatellite(line1, line2, name.strip(), ts)
+                  for name, line1, line2 in zip(*[iter(tle_lines[:3 * n_satellites])] * 3)]
+    if [satellite.name for satellite in satellites] != list(satellite_array.names):
+        raise ValueError("衛星目錄與原始 TLE 的衛星順序不同，無法逐顆比較")
+    alt = np.array([(satellite - observer).at(t).altaz()[0].degrees for satellite in satellites])
+    visible = alt > min_elevation
+    near_threshold = np.abs(alt - min_elevation) < CHECK_TOLERANCE_DEG
+    count_mismatch = (visible.sum(axis=0) != coverage['visible_count']) & ~near_threshold.any(axis=0)
+
+    has_visible = coverage['best_index'] >= 0
+    columns = np.flatnonzero(has_visible)
+    best_diff = np.abs(alt[coverage['best_index'][columns], columns] - coverage['best_alt'][columns])
+    scalar_best = np.where(visible, alt, -np.inf).max(axis=0)
+    best_alt_diff = np.abs(scalar_best[columns] - coverage['best_alt'][columns])
+    max_diff = float(max(best_diff.max(initial=0.0), best_alt_diff.max(initial=0.0)))
+    return {
+        'satellites': len(satellite_array),
+        'steps': n_steps,
+        'max_alt_diff_deg': max_diff,
+        'visible_count_mismatches': int(count_mismatch.sum()),
+        'passed': bool(max_diff <= CHECK_TOLERANCE_DEG and not count_mismatch.any()),
+    }
+
+
+def check_resume(work_dir, formats=('csv',), workers=1, minutes=RESUME_CHECK_MINUTES,
+                 interrupt_steps=RESUME_INTERRUPT_STEPS):
+    """驗證中斷後由檢查點繼續的分析與不中斷的執行完全相同
+
+    比較記憶體中的 coverage_df (DataFrame.equals，逐位元相同) 與統計數據。
+
+    Returns:
+        dict，包含輸出格式、行程數與是否相同
+    """
+    def analyze(output_dir, progress, resume=False):
+        analysis = StarlinkAnalysis(output_dir=output_dir, tle_file=FIXTURE_TLE, result_formats=formats)
+        stats = analysis.analyze_24h_coverage(interval_minutes=1, analysis_duration_minutes=minutes,
+                                              start=FIXED_START, workers=workers, progress=progress,
+                                              resume=resume, checkpoint_seconds=0)
+        return analysis.coverage_df, stats
+
+    name = f"{'+'.join(formats)}-{workers}"
+    reference, reference_stats = analyze(os.path.join(work_dir, f"full-{name}"), _NullProgress())
+    resumed_dir = os.path.join(work_dir, f"resumed-{name}")
+    try:
+        analyze(resumed_dir, _InterruptingProgress(interrupt_steps))
+    except _Interrupted:
+        pass
+    resumed, resumed_stats = analyze(resumed_dir, _NullProgress(), resume=True)
+    same_stats = json.dumps(reference_stats, sort_keys=True) == json.dumps(resumed_stats, sort_keys=True)
+    return {
+        'formats': list(formats),
+        'workers': workers,
+        'identical': bool(reference.equals(resumed) and same_stats),
+    }
+
+
+def check_parallel_job(work_dir, workers=JOB_CHECK_WORKERS, minutes=JOB_CHECK_MINUTES,
+                       timeout=JOB_CHECK_TIMEOUT_SECONDS):
+    """以 workers > 1 提交背景工作，驗證工作行程內的平行計算可以完成
+
+    Returns:
+        dict，包含行程數、最終狀態、錯誤訊息與是否通過
+    """
+    from jobs import JobRunner, DONE, FINISHED_STATES
+
+    runner = JobRunner(max_concurrent=1, output_root=os.path.join(work_dir, 'jobs'))
+    job_id = runner.submit(TAIPEI_LAT, TAIPEI_LON, interval_minutes=1, analysis_duration_minutes=minutes,
+                           tle_file=FIXTURE_TLE, workers=workers, use_cache=False, render_preset='preview')
+    deadline = time.time() + timeout
+    status = runner.status(job_id)
+    while status.get('state') not in FINISHED_STATES and time.time() < deadline:
+        time.sleep(0.5)
+        status = runner.status(job_id)
+    if status.get('state') not in FINISHED_STATES:
+        runner.shutdown()
+    return {
+        'workers': workers,
+        'state': status.get('state'),
+        'error': status.get('error'),
+        'passed': status.get('state') == DONE,
+    }
+
+
+def run(sizes=DEFAULT_SIZES, analysis_minutes=DEFAULT_ANALYSIS_MINUTES, verbose=False, skip_render=False):
+    """執行所有階段
+
+    Returns:
+        (各階段紀錄列表, 正確性檢查結果)
+    """
+    bench = BenchmarkRun(verbose=verbose)
+    tle_lines = read_fixture()
+    n_fixture = len(tle_lines) // 3
+    ts = shared_timescale()
+    observer = wgs84.latlon(TAIPEI_LAT, TAIPEI_LON, elevation_m=ELEVATION)
+
+    print(f"測試資料 {n_fixture} 顆衛星，起始時間 {FIXED_START.isoformat()}")
+    print(f"{'階段':26s} {'牆鐘(秒)':>8s} {'CPU(秒)':>8s} {'衛星×時間點/秒':>12s} {'峰值RSS(MB)':>10s}")
+
+    with tempfile.TemporaryDirectory(prefix='starlink-bench-') as work_dir:
+        catalog_dir = os.path.join(work_dir, 'catalog')
+        bench.phase('catalog_compile', lambda: load_catalog(tle_lines, catalog_dir=catalog_dir))
+        bench.phase('catalog_load', lambda: load_catalog(tle_lines, catalog_dir=catalog_dir))
+
+        for n_satellites, n_steps in sizes:
+            n_satellites = min(n_satellites, n_fixture)
+            catalog = load_catalog(tle_lines[:3 * n_satellites], catalog_dir=catalog_dir)
+            t = TimeGrid.from_interval(FIXED_START, n_steps, 1).to_skyfield(ts)
+            bench.phase(f"propagate[{n_satellites}x{n_steps}]",
+                        lambda: propagate_coverage(SatelliteArray.from_catalog(catalog), observer, t),
+                        satellite_steps=n_satellites * n_steps)
+
+        output_dir = os.path.join(work_dir, 'output')
+        analysis = StarlinkAnalysis(output_dir=output_dir, tle_file=FIXTURE_TLE)
+        analysis_steps = n_fixture * analysis_minutes
+        bench.phase('analyze', lambda: analysis.analyze_24h_coverage(
+            interval_minutes=1, analysis_duration_minutes=analysis_minutes, start=FIXED_START,
+            progress=_NullProgress(), checkpoint_seconds=None), satellite_steps=analysis_steps)
+        coverage_df = getattr(analysis, 'coverage_df', None)
+        if coverage_df is not None:
+            time_grid = TimeGrid.from_interval(FIXED_START, analysis_minutes, 1)
+            bench.phase('stats', lambda: CoverageStats.from_frame(coverage_df).summary(analysis_minutes, 1))
+            bench.phase('handover', lambda: handovers_from_coverage(
+                coverage_df, SatelliteArray.from_catalog(analysis.catalog).names, time_grid))
+
+        from visibility import compute_visibility
+        bench.phase('compute_visibility', lambda: compute_visibility(
+            tle_lines, TAIPEI_LAT, TAIPEI_LON, ELEVATION, interval_minutes=1,
+            duration_hours=analysis_minutes / 60, start=FIXED_START), satellite_steps=analysis_steps)
+
+        if not skip_render and coverage_df is not None:
+            for preset in ('preview', 'print'):
+                bench.phase(f"render[{preset}]", lambda: analysis.generate_visualizations(preset=preset, force=True))
+            bench.phase('heatmap', lambda: render_heatmap(os.path.join(output_dir, HEATMAP_FILE),
+                                                          coverage_df['visible_satellites'].to_numpy()))
+            bench.phase('html_report', lambda: analysis.export_html_report(force=True))
+
+        # Parquet 與 Arrow 需要 pyarrow，未安裝時只檢查 CSV
+        resume_cases = [(('csv',), 1), (('csv',), 2)]
+        if importlib.util.find_spec('pyarrow') is not None:
+            resume_cases += [(('parquet',), 1), (('arrow',), 2)]
+        output = None if verbose else io.StringIO()
+        with contextlib.redirect_stdout(output) if output is not None else contextlib.nullcontext():
+            resume_checks = [check_resume(work_dir, formats, workers) for formats, workers in resume_cases]
+            job_check = check_parallel_job(work_dir)
+
+    check = check_against_skyfield(tle_lines, observer)
+    status = '通過' if check['passed'] else '失敗'
+    print(f"正確性檢查 ({check['satellites']} 顆衛星 × {check['steps']} 個時間點，與 skyfield 比較): "
+          f"最大仰角差異 {check['max_alt_diff_deg']:.2e} 度，"
+          f"可見數不一致 {check['visible_count_mismatches']} 個時間點 {status}")
+    for resume_check in resume_checks:
+        print(f"繼續分析檢查 ({'+'.join(resume_check['formats'])}，{resume_check['workers']} 個行程): "
+              f"{'與不中斷的執行相同' if resume_check['identical'] else '結果不同 失敗'}")
+    job_status = '完成' if job_check['passed'] else f"失敗 (狀態 {job_check['state']}：{job_check['error']})"
+    print(f"背景工作檢查 ({job_check['workers']} 個行程): {job_status}")
+    check['resume'] = resume_checks
+    check['job'] = job_check
+    check['passed'] = (check['passed'] and all(resume_check['identical'] for resume_check in resume_checks)
+                       and job_check['passed'])
+    return bench.results, check
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Starlink 分析流程的離線效能基準測試')
+    parser.add_argument('--quick', action='store_true', help='使用較小的規模 (快速檢查)')
+    parser.add_argument('--sizes', type=str, default=None,
+                        help='傳播規模，例如 "100x60,1000x1440" (衛星數x時間點數)')
+    parser.add_argument('--duration', type=int, default=None, help='完整分析與報告的時長(分鐘)')
+    parser.add_argument('--skip-render', action='store_true', help='略過 PNG、熱力圖與 HTML 報告')
+    parser.add_argument('--json', type=str, default=None, help='將結果另存為 JSON 檔')
+    parser.add_argument('--verbose', action='store_true', help='顯示各階段的訊息輸出')
+    args = parser.parse_args(argv)
+
+    if args.sizes:
+        sizes = tuple(tuple(int(value) for value in size.lower().split('x')) for size in args.sizes.split(','))
+    else:
+        sizes = QUICK_SIZES if args.quick else DEFAULT_SIZES
+    duration = args.duration or (QUICK_ANALYSIS_MINUTES if args.quick else DEFAULT_ANALYSIS_MINUTES)
+
+    results, check = run(sizes, duration, verbose=args.verbose, skip_render=args.skip_render)
+    if args.json:
+        report = {
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'start': FIXED_START.isoformat(),
+            'analysis_duration_minutes': duration,
+            'phases': results,
+            'correctness': check,
+        }
+        with open(args.json, 'w') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"結果已保存至 {args.json}")
+    return 0 if check['passed'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
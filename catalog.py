@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+預先解析的二進位衛星目錄
+
+將 TLE 文字解析後的軌道根數存成單一結構化 NumPy 陣列 (.npy)，
+以 TLE 內容的雜湊值為檔名，再次載入時以記憶體映射讀取，
+直接用 sgp4init 重建衛星模型，不必重新解析數千組 TLE 文字。
+"""
+
+import os
+import hashlib
+import numpy as np
+from sgp4.api import Satrec, WGS72
+
+# 目錄格式版本，變更欄位時遞增以讓舊目錄失效
+CATALOG_VERSION = 1
+
+DEFAULT_CATALOG_DIR = os.environ.get(
+    'STARLINK_CATALOG_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'catalog'))
+# 保留最近使用的目錄數，寫入新目錄後刪除較舊的目錄，長時間執行的儀表板不會無限累積
+DEFAULT_CATALOG_KEEP = int(os.environ.get('STARLINK_CATALOG_KEEP', '4'))
+
+# sgp4init 的紀元以 1949-12-31 00:00 UT 起算的日數表示
+SGP4_EPOCH_JD = 2433281.5
+
+CATALOG_DTYPE = np.dtype([
+    ('satnum', '<i4'),
+    ('epoch_jd', '<f8'),
+    ('epoch_fraction', '<f8'),
+    ('bstar', '<f8'),
+    ('ndot', '<f8'),
+    ('nddot', '<f8'),
+    ('ecco', '<f8'),
+    ('argpo', '<f8'),
+    ('inclo', '<f8'),
+    ('mo', '<f8'),
+    ('no_kozai', '<f8'),
+    ('nodeo', '<f8'),
+    ('name', '<U48'),
+    ('line1', '<U69'),
+    ('line2', '<U69'),
+])
+
+
+def tle_source_hash(tle_lines):
+    """計算 TLE 文字內容的雜湊值，作為目錄檔名"""
+    digest = hashlib.sha256(f"catalog-v{CATALOG_VERSION}\n".encode('utf-8'))
+    for line in tle_lines:
+        digest.update(line.strip().encode('utf-8'))
+        digest.update(b'\n')
+    return digest.hexdigest()[:16]
+
+
+def compile_catalog(tle_lines):
+    """將 TLE 文字行解析為目錄結構化陣列
+
+    每三行一組(名稱、第一行、第二行)，無法解析的衛星會被略過。
+    """
+    records = []
+    for i in range(0, len(tle_lines), 3):
+        if i + 2 >= len(tle_lines):
+            break
+        name = tle_lines[i].strip()
+        line1 = tle_lines[i + 1].strip()
+        line2 = tle_lines[i + 2].strip()
+        if not (line1.startswith('1 ') and line2.startswith('2 ')):
+            print(f"無法解析衛星 {name}: TLE 行格式錯誤")
+            continue
+        try:
+            satrec = Satrec.twoline2rv(line1, line2)
+        except Exception as e:
+            print(f"無法解析衛星 {name}: {str(e)}")
+            continue
+        records.append((
+            satrec.satnum, satrec.jdsatepoch, satrec.jdsatepochF, satrec.bstar,
+            satrec.ndot, satrec.nddot, satrec.ecco, satrec.argpo, satrec.inclo,
+            satrec.mo, satrec.no_kozai, satrec.nodeo, name, line1, line2,
+        ))
+    return np.array(records, dtype=CATALOG_DTYPE)
+
+
+class SatelliteCatalog:
+    """已解析的衛星目錄，可重建 sgp4 模型或 skyfield 的 EarthSatellite"""
+
+    def __init__(self, records, source_hash=None, path=None):
+        self.records = records
+        self.source_hash = source_hash
+        self.path = path
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def names(self):
+        return self.records['name'].tolist()
+
+    def tle_triples(self):
+        """回傳 (名稱, 第一行, 第二行) 列表"""
+        return list(zip(self.records['name'].tolist(),
+                        self.records['line1'].tolist(),
+                        self.records['line2'].tolist()))
+
+    def satrecs(self):
+        """以儲存的軌道根數重建 sgp4 Satrec 列表"""
+        r = self.records
+        # 先整欄轉為 Python 列表，避免逐筆索引記憶體映射陣列的開銷
+        epochs = ((r['epoch_jd'] - SGP4_EPOCH_JD) + r['epoch_fraction']).tolist()
+        columns = zip(r['satnum'].tolist(), epochs, r['bstar'].tolist(), r['ndot'].tolist(),
+                      r['nddot'].tolist(), r['ecco'].tolist(), r['argpo'].tolist(),
+                      r['inclo'].tolist(), r['mo'].tolist(), r['no_kozai'].tolist(),
+                      r['nodeo'].tolist())
+        satrecs = []
+        for satnum, epoch, bstar, ndot, nddot, ecco, argpo, inclo, mo, no_kozai, nodeo in columns:
+            satrec = Satrec()
+            satrec.sgp4init(WGS72, 'i', satnum, epoch, bstar, ndot, nddot, ecco,
+                            argpo, inclo, mo, no_kozai, nodeo)
+            satrecs.append(satrec)
+        return satrecs
+
+    def earth_satellites(self, ts):
+        """重建 skyfield EarthSatellite 列表"""
+        from skyfield.api import EarthSatellite
+
+        satellites = []
+        for satrec, name in zip(self.satrecs(), self.names):
+            satellite = EarthSatellite.from_satrec(satrec, ts)
+            satellite.name = name
+            satellites.append(satellite)
+        return satellites
+
+
+def load_catalog(tle_lines, catalog_dir=None, keep=DEFAULT_CATALOG_KEEP):
+    """載入 TLE 對應的二進位目錄，不存在時先編譯並保存
+
+    Args:
+        tle_lines: TLE 文字行列表
+        catalog_dir (str): 目錄保存位置，預設為 data/catalog
+        keep (int): 保存新目錄後保留的目錄數 (含這次的目錄)，較舊者刪除
+
+    Returns:
+        SatelliteCatalog
+    """
+    catalog_dir = catalog_dir or DEFAULT_CATALOG_DIR
+    source_hash = tle_source_hash(tle_lines)
+    path = os.path.join(catalog_dir, f"{source_hash}.npy")
+
+    if os.path.exists(path):
+        try:
+            records = np.load(path, mmap_mode='r')
+            if records.dtype == CATALOG_DTYPE:
+                # 更新修改時間作為最近使用時間，清理舊目錄時保留
+                try:
+                    os.utime(path)
+                except OSError:
+                    pass
+                return SatelliteCatalog(records, source_hash, path)
+        except (OSError, ValueError) as e:
+            print(f"衛星目錄 {path} 無法讀取，重新編譯: {e}")
+
+    records = compile_catalog(tle_lines)
+    try:
+        os.makedirs(catalog_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npy"
+        np.save(tmp_path, records)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"無法保存衛星目錄 {path}: {e}")
+        path = None
+    else:
+        prune_catalogs(catalog_dir, keep=keep, current=path)
+    return SatelliteCatalog(records, source_hash, path)
+
+
+def prune_catalogs(catalog_dir=None, keep=DEFAULT_CATALOG_KEEP, current=None):
+    """只保留最近使用的 keep 個目錄 (current 一律保留)，回傳刪除的檔案數
+
+    已以記憶體映射開啟的目錄被刪除後仍可繼續讀取，直到關閉為止。
+    """
+    catalog_dir = catalog_dir or DEFAULT_CATALOG_DIR
+    try:
+        names = [name for name in os.listdir(catalog_dir) if name.endswith('.npy') and '.tmp' not in name]
+    except OSError:
+        return 0
+    entries = []
+    for name in names:
+        path = os.path.join(catalog_dir, name)
+        try:
+            entries.append((os.path.getmtime(path), path))
+        except OSError:
+            continue
+    entries.sort(reverse=True)
+    removed = 0
+    kept = 0
+    for _, path in entries:
+        if current is not None and os.path.abspath(path) == os.path.abspath(current):
+            continue
+        kept += 1
+        if kept < max(int(keep), 1):
+            continue
+        try:
+            os.remove(path)
+            removed += 1
+        except OSError:
+            pass
+    return removed
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+長時間分析的檢查點
+
+分析進行中定期將已完成的時間批次進度、累計狀態 (統計與切換追蹤) 與執行設定
+保存到輸出目錄；中斷 (當機、被終止) 後以 resume 從最後完成的批次繼續，
+結果與不中斷的執行相同。分析完成後檢查點會自動刪除。
+
+檔案：
+    checkpoint.json        執行設定與進度 (下一個要計算的時間索引、寫入器狀態)
+    checkpoint_state.pkl   累計狀態
+    checkpoint.tle         分析使用的 TLE，繼續時使用同一份衛星目錄
+"""
+
+import os
+import json
+import time
+import pickle
+from datetime import datetime, timezone
+
+CHECKPOINT_FILE = 'checkpoint.json'
+CHECKPOINT_STATE_FILE = 'checkpoint_state.pkl'
+CHECKPOINT_TLE_FILE = 'checkpoint.tle'
+# 兩次保存檢查點之間的最短間隔(秒)
+DEFAULT_CHECKPOINT_SECONDS = float(os.environ.get('STARLINK_CHECKPOINT_SECONDS', 30))
+
+
+class AnalysisCheckpoint:
+    """輸出目錄中的分析檢查點"""
+
+    def __init__(self, output_dir, interval_seconds=DEFAULT_CHECKPOINT_SECONDS):
+        """
+        Args:
+            output_dir (str): 分析的輸出目錄
+            interval_seconds (float): 兩次保存之間的最短間隔(秒)，0 表示每個批次都保存
+        """
+        self.output_dir = output_dir
+        self.interval_seconds = interval_seconds
+        self.path = os.path.join(output_dir, CHECKPOINT_FILE)
+        self.state_path = os.path.join(output_dir, CHECKPOINT_STATE_FILE)
+        self.tle_path = os.path.join(output_dir, CHECKPOINT_TLE_FILE)
+        self.config = None
+        self._last_save = time.time()
+
+    def exists(self):
+        return os.path.exists(self.path) and os.path.exists(self.state_path)
+
+    def begin(self, config, tle_triples):
+        """開始新的分析：保存設定與 TLE (尚無已完成的批次)"""
+        self.config = dict(config)
+        os.makedirs(self.output_dir, exist_ok=True)
+        _write_atomic(self.tle_path, 'w', lambda f: f.writelines(
+            f"{name}\n{line1}\n{line2}\n" for name, line1, line2 in tle_triples))
+        for path in (self.path, self.state_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self._last_save = time.time()
+
+    def load(self):
+        """讀取檢查點
+
+        Returns:
+            (設定 dict, TLE 文字行列表, 下一個時間索引, 狀態 dict)；沒有可用的檢查點時為 None
+        """
+        if not self.exists():
+            return None
+        try:
+            with open(self.path, 'r') as f:
+                checkpoint = json.load(f)
+            with open(self.state_path, 'rb') as f:
+                state = pickle.load(f)
+            with open(self.tle_path, 'r') as f:
+                tle_lines = f.read().strip().split('\n')
+        except (OSError, ValueError, pickle.UnpicklingError, EOFError) as e:
+            print(f"檢查點無法讀取，將重新開始分析: {e}")
+            return None
+        if state.get('next_index') != checkpoint.get('next_index'):
+            print("檢查點的狀態與進度不一致，將重新開始分析")
+            return None
+        self.config = checkpoint['config']
+        self._last_save = time.time()
+        return self.config, tle_lines, int(checkpoint['next_index']), state
+
+    def due(self):
+        """距離上次保存是否已超過保存間隔"""
+        return time.time() - self._last_save >= self.interval_seconds
+
+    def save(self, next_index, state):
+        """保存進度：時間索引 next_index 之前的批次都已寫出
+
+        狀態先寫入，進度檔最後以改名取代，任何時間點中斷都只會留下完整的檢查點。
+        """
+        state = dict(state, next_index=int(next_index))
+        _write_atomic(self.state_path, 'wb', lambda f: pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL))
+        checkpoint = {
+            'config': self.config,
+            'next_index': int(next_index),
+            'updated_at': datetime.now(timezone.utc).isoformat(),
+        }
+        _write_atomic(self.path, 'w', lambda f: json.dump(checkpoint, f, ensure_ascii=False, indent=2))
+        self._last_save = time.time()
+
+    def clear(self):
+        """分析完成後刪除檢查點"""
+        for path in (self.path, self.state_path, self.tle_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def _write_atomic(path, mode, write):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, mode) as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+串流覆蓋統計
+
+在傳播過程中逐批更新 coverage_stats.json 的各項指標，不必保留逐時間點的資料：
+平均/最大/最小可見衛星數、覆蓋率、最佳衛星的平均/最高仰角，
+另提供可見衛星數的直方圖與百分位數、最佳仰角的百分位數，以及斷線 (沒有可見衛星) 區段的統計。
+
+百分位數以可合併的直方圖計算：可見衛星數為整數，直方圖即為精確分布；
+仰角以固定寬度的區間 (預設 0.1 度) 累計，百分位數的誤差不超過區間寬度。
+兩段相鄰時間的統計可以 merge() 合併 (斷線區段跨越分段邊界時會接起來)，
+平行計算的各分片或多天的分析分別累計後合併，結果與一次累計相同。
+"""
+
+import numpy as np
+
+# 仰角直方圖的區間寬度(度)與範圍
+ELEVATION_BIN_DEG = 0.1
+_ELEVATION_MIN = -90.0
+_ELEVATION_BINS = int(round(180.0 / ELEVATION_BIN_DEG))
+# 輸出的百分位數
+PERCENTILES = (5, 50, 95)
+
+
+class CoverageStats:
+    """逐批累計的覆蓋統計 (可合併)"""
+
+    def __init__(self):
+        self.n_times = 0
+        self.visible_sum = 0
+        self.covered = 0
+        self.evaluated = 0
+        self.max_visible = None
+        self.min_visible = None
+        # visible_histogram[k] 為可見衛星數為 k 的時間點數
+        self.visible_histogram = np.zeros(0, dtype=np.int64)
+        self.elevation_count = 0
+        self.elevation_sum = 0.0
+        self.max_elevation = None
+        self.elevation_histogram = np.zeros(_ELEVATION_BINS, dtype=np.int64)
+        # 斷線區段：開頭的區段、中間已結束的區段 (數量、總長、最長)、結尾尚未結束的區段，長度以時間點計
+        self._leading = 0
+        self._closed_count = 0
+        self._closed_total = 0
+        self._closed_max = 0
+        self._trailing = 0
+
+    @classmethod
+    def from_frame(cls, coverage_df):
+        """由 coverage_data 格式的 DataFrame 建立"""
+        stats = cls()
+        best_alt = coverage_df['best_alt'].to_numpy(dtype=float) if 'best_alt' in coverage_df.columns else None
+        stats.add(coverage_df['visible_satellites'].to_numpy(), best_alt=best_alt)
+        return stats
+
+    def add(self, visible_count, evaluated_count=None, best_alt=None):
+        """附加一批接續在先前批次之後的時間點
+
+        Args:
+            visible_count: 每個時間點的可見衛星數
+            evaluated_count: 每個時間點實際精算的衛星數 (粗篩統計)
+            best_alt: 每個時間點最佳衛星的仰角(度)，沒有可見衛星時為 NaN
+        """
+        chunk = CoverageStats()
+        visible_count = np.asarray(visible_count, dtype=np.int64)
+        if len(visible_count) == 0:
+            return
+        chunk.n_times = len(visible_count)
+        chunk.visible_sum = int(np.sum(visible_count))
+        chunk.covered = int(np.count_nonzero(visible_count))
+        if evaluated_count is not None:
+            chunk.evaluated = int(np.sum(evaluated_count))
+        chunk.max_visible = int(np.max(visible_count))
+        chunk.min_visible = int(np.min(visible_count))
+        chunk.visible_histogram = np.bincount(visible_count)
+
+        if best_alt is not None:
+            best_alt = np.asarray(best_alt, dtype=float)
+            best_alt = best_alt[~np.isnan(best_alt)]
+            if len(best_alt):
+                chunk.elevation_count = len(best_alt)
+                chunk.elevation_sum = float(np.sum(best_alt))
+                chunk.max_elevation = float(np.max(best_alt))
+                bins = np.clip(((best_alt - _ELEVATION_MIN) / ELEVATION_BIN_DEG).astype(np.int64), 0,
+                               _ELEVATION_BINS - 1)
+                chunk.elevation_histogram = np.bincount(bins, minlength=_ELEVATION_BINS)
+
+        # 斷線區段以游程編碼求得
+        outage = visible_count == 0
+        if outage.all():
+            chunk._leading = len(outage)
+        else:
+            edges = np.flatnonzero(np.diff(np.concatenate(([0], outage.astype(np.int8), [0]))))
+            starts, ends = edges[::2], edges[1::2]
+            lengths = ends - starts
+            if len(lengths) and starts[0] == 0:
+                chunk._leading = int(lengths[0])
+                starts, lengths = starts[1:], lengths[1:]
+            if len(lengths) and starts[-1] + lengths[-1] == len(outage):
+                chunk._trailing = int(lengths[-1])
+                lengths = lengths[:-1]
+            chunk._closed_count = len(lengths)
+            chunk._closed_total = int(np.sum(lengths))
+            chunk._closed_max = int(np.max(lengths)) if len(lengths) else 0
+        self.merge(chunk)
+
+    @property
+    def _all_outage(self):
+        return self.n_times > 0 and self._leading == self.n_times
+
+    def merge(self, other):
+        """合併緊接在本段之後的另一段統計 (other 不會被修改)"""
+        if other.n_times == 0:
+            return self
+        if self.n_times == 0:
+            self.__dict__.update({key: (value.copy() if isinstance(value, np.ndarray) else value)
+                                  for key, value in other.__dict__.items()})
+            return self
+
+        # 斷線區段：本段結尾與下一段開頭的區段相連
+        if self._all_outage:
+            self._leading += other._leading
+            if not other._all_outage:
+                self._closed_count, self._closed_total, self._closed_max = (
+                    other._closed_count, other._closed_total, other._closed_max)
+                self._trailing = other._trailing
+        elif other._all_outage:
+            self._trailing += other._leading
+        else:
+            middle = self._trailing + other._leading
+            self._closed_count += other._closed_count + (middle > 0)
+            self._closed_total += other._closed_total + middle
+            self._closed_max = max(self._closed_max, other._closed_max, middle)
+            self._trailing = other._trailing
+
+        self.n_times += other.n_times
+        self.visible_sum += other.visible_sum
+        self.covered += other.covered
+        self.evaluated += other.evaluated
+        self.max_visible = max(self.max_visible, other.max_visible)
+        self.min_visible = min(self.min_visible, other.min_visible)
+        size = max(len(self.visible_histogram), len(other.visible_histogram))
+        self.visible_histogram = (np.pad(self.visible_histogram, (0, size - len(self.visible_histogram))) +
+                                  np.pad(other.visible_histogram, (0, size - len(other.visible_histogram))))
+        self.elevation_count += other.elevation_count
+        self.elevation_sum += other.elevation_sum
+        if other.max_elevation is not None:
+            self.max_elevation = (other.max_elevation if self.max_elevation is None
+                                  else max(self.max_elevation, other.max_elevation))
+        self.elevation_histogram = self.elevation_histogram + other.elevation_histogram
+        return self
+
+    def outage_runs(self):
+        """各斷線區段長度的 (數量, 總時間點數, 最長時間點數)"""
+        count, total, longest = self._closed_count, self._closed_total, self._closed_max
+        for run in (self._leading, 0 if self._all_outage else self._trailing):
+            if run:
+                count += 1
+                total += run
+                longest = max(longest, run)
+        return count, total, longest
+
+    def visible_percentile(self, q):
+        """可見衛星數的第 q 百分位數 (取累計比例首次達到 q% 的值)"""
+        return _histogram_percentile(self.visible_histogram, q)
+
+    def elevation_percentile(self, q):
+        """最佳衛星仰角的第 q 百分位數 (精確到 ELEVATION_BIN_DEG)，沒有可見衛星時為 None"""
+        index = _histogram_percentile(self.elevation_histogram, q)
+        if index is None:
+            return None
+        return round(_ELEVATION_MIN + (index + 0.5) * ELEVATION_BIN_DEG, 6)
+
+    def summary(self, analysis_duration_minutes=None, interval_minutes=None):
+        """coverage_stats.json 的統計數據 (Python 原生類型，不含 NaN)
+
+        未指定 interval_minutes 時斷線時間以時間點數計。沒有數據時平均值與最大最小值為 0，百分位數為 None。
+        """
+        n_times = max(self.n_times, 1)
+        step_seconds = float(interval_minutes) * 60.0 if interval_minutes is not None else 1.0
+        outage_count, outage_total, outage_longest = self.outage_runs()
+        stats = {
+            'avg_visible_satellites': float(self.visible_sum / n_times) if self.n_times else 0.0,
+            'max_visible_satellites': self.max_visible if self.max_visible is not None else 0,
+            'min_visible_satellites': self.min_visible if self.min_visible is not None else 0,
+            'coverage_percentage': float(self.covered / n_times * 100) if self.n_times else 0.0,
+        }
+        for q in PERCENTILES:
+            value = self.visible_percentile(q)
+            stats[f'visible_p{q}'] = value
+        stats['visible_histogram'] = self.visible_histogram.tolist()
+        # 沒有可見衛星時仰角以 0 表示；不寫入 NaN (json.dump 會輸出 R 端 jsonlite 無法解析的 NaN)
+        stats['avg_elevation'] = (float(self.elevation_sum / self.elevation_count) if self.elevation_count
+                                  else 0.0)
+        stats['max_elevation'] = self.max_elevation if self.max_elevation is not None else 0.0
+        for q in PERCENTILES:
+            stats[f'elevation_p{q}'] = self.elevation_percentile(q)
+        stats.update({
+            'outage_count': outage_count,
+            'outage_seconds': float(outage_total * step_seconds),
+            'mean_outage_seconds': float(outage_total / outage_count * step_seconds) if outage_count else 0.0,
+            'max_outage_seconds': float(outage_longest * step_seconds),
+        })
+        if analysis_duration_minutes is not None:
+            stats['analysis_duration_minutes'] = analysis_duration_minutes
+        if interval_minutes is not None:
+            stats['interval_minutes'] = float(interval_minutes)
+        return stats
+
+
+def _histogram_percentile(histogram, q):
+    """直方圖的第 q 百分位數所在的索引，沒有資料時為 None"""
+    total = int(np.sum(histogram))
+    if total == 0:
+        return None
+    rank = max(1, int(np.ceil(q / 100.0 * total)))
+    return int(np.searchsorted(np.cumsum(histogram), rank))
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+區域網格覆蓋分析
+
+在經緯度網格(例如台灣本島 0.05° 網格)上計算每個時間點的可見衛星數與最高仰角，
+結果存為 (時間 × 緯度 × 經度) 的精簡三維陣列。
+每批時間點只傳播一次星座，再以矩陣乘法一次計算所有網格點的仰角；
+遠離區域的衛星先以地心夾角保守排除，網格點則分批計算以限制記憶體用量。
+"""
+
+import os
+import json
+import warnings
+import numpy as np
+import pandas as pd
+from skyfield.api import wgs84
+
+from propagation import DEFAULT_MIN_ELEVATION, DEFAULT_TIME_CHUNK, PRUNING_ELEVATION_MARGIN_DEG
+from time_grid import TimeGrid
+
+# 台灣本島(含離島邊緣)的經緯度範圍
+TAIWAN_BOUNDS = (21.85, 25.35, 119.95, 122.05)  # (最小緯度, 最大緯度, 最小經度, 最大經度)
+DEFAULT_GRID_STEP_DEG = 0.05
+# 每次矩陣運算的 衛星 × 網格點 元素上限，限制暫存陣列的記憶體用量
+DEFAULT_MAX_BLOCK_ELEMENTS = 4_000_000
+
+
+class RegionGrid:
+    """規則經緯度網格"""
+
+    def __init__(self, lats, lons, elevation_m=0.0):
+        self.lats = np.asarray(lats, dtype=float)
+        self.lons = np.asarray(lons, dtype=float)
+        self.elevation_m = float(elevation_m)
+
+    @classmethod
+    def from_bounds(cls, bounds=TAIWAN_BOUNDS, step_deg=DEFAULT_GRID_STEP_DEG, elevation_m=0.0):
+        """以 (最小緯度, 最大緯度, 最小經度, 最大經度) 與網格間隔建立網格(含兩端)"""
+        if step_deg <= 0:
+            raise ValueError(f"網格間隔必須大於 0，收到 {step_deg}")
+        lat_min, lat_max, lon_min, lon_max = bounds
+        n_lat = int(np.floor(round((lat_max - lat_min) / step_deg, 9))) + 1
+        n_lon = int(np.floor(round((lon_max - lon_min) / step_deg, 9))) + 1
+        return cls(lat_min + np.arange(n_lat) * step_deg, lon_min + np.arange(n_lon) * step_deg, elevation_m)
+
+    @property
+    def shape(self):
+        return len(self.lats), len(self.lons)
+
+    def __len__(self):
+        return len(self.lats) * len(self.lons)
+
+    def cell_frames(self):
+        """回傳各網格點的 ITRS 位置(公里)與天頂單位向量，形狀皆為 (網格點數, 3)，依緯度優先排列"""
+        lat, lon = np.meshgrid(self.lats, self.lons, indexing='ij')
+        lat, lon = lat.ravel(), lon.ravel()
+        position = wgs84.latlon(lat, lon, elevation_m=self.elevation_m).itrs_xyz.km.T
+        lat_rad, lon_rad = np.radians(lat), np.radians(lon)
+        # 與 propagation.enu_rotation 的天頂列相同(大地緯度)
+        up = np.stack([np.cos(lat_rad) * np.cos(lon_rad),
+                       np.cos(lat_rad) * np.sin(lon_rad),
+                       np.sin(lat_rad)], axis=-1)
+        return position, up
+
+
+def compute_grid_coverage(satellite_array, ts, time_grid, region_grid, min_elevation=DEFAULT_MIN_ELEVATION,
+                          time_chunk=DEFAULT_TIME_CHUNK, max_block_elements=DEFAULT_MAX_BLOCK_ELEMENTS,
+                          progress=None):
+    """計算網格上每個時間點的可見衛星數與最高仰角
+
+    Args:
+        satellite_array (SatelliteArray): 衛星陣列
+        ts: skyfield 時間尺度
+        time_grid (TimeGrid): 分析時間網格
+        region_grid (RegionGrid): 經緯度網格
+        min_elevation (float): 最小可見仰角(度)
+        time_chunk (int): 每批傳播的時間點數量
+        max_block_elements (int): 每次矩陣運算的 衛星 × 網格點 元素上限
+        progress: 可選的 tqdm 類進度條，每批完成後以時間點數呼叫 update()
+
+    Returns:
+        dict，visible_count 為 uint16、best_elevation 為 float32 (無可見衛星時為 NaN)，
+        形狀皆為 (時間點數, 緯度數, 經度數)
+    """
+    n_times = len(time_grid)
+    n_lat, n_lon = region_grid.shape
+    n_cells = len(region_grid)
+    visible_count = np.zeros((n_times, n_cells), dtype=np.uint16)
+    best_sin = np.full((n_times, n_cells), -np.inf)
+
+    cell_xyz, cell_up = region_grid.cell_frames()
+    cell_r2 = np.einsum('ij,ij->i', cell_xyz, cell_xyz)
+    cell_height = np.einsum('ij,ij->i', cell_xyz, cell_up)
+    sin_mask = np.sin(np.radians(min_elevation))
+
+    # 區域中心與涵蓋半徑(地心夾角)，供保守排除遠方衛星
+    cell_radius = np.sqrt(cell_r2)
+    cell_unit = cell_xyz / cell_radius[:, None]
+    center = cell_unit.mean(axis=0)
+    center /= np.linalg.norm(center)
+    region_radius = np.max(np.arccos(np.clip(cell_unit @ center, -1.0, 1.0)))
+    observer_radius = np.max(cell_radius)
+    mask = np.radians(min_elevation - PRUNING_ELEVATION_MARGIN_DEG)
+
+    if len(satellite_array) and n_times and n_cells:
+        t_all = time_grid.to_skyfield(ts)
+        time_chunk = max(1, int(time_chunk))
+        for start in range(0, n_times, time_chunk):
+            stop = min(start + time_chunk, n_times)
+            r_itrs = satellite_array.itrs_positions_km(t_all[start:stop])
+            radius = np.linalg.norm(r_itrs, axis=-1)
+            psi = np.arccos(np.clip((r_itrs @ center) / radius, -1.0, 1.0))
+            footprint = np.arccos(np.clip(observer_radius * np.cos(mask) / radius, -1.0, 1.0)) - mask
+            # 與區域中心的夾角超過 覆蓋半角 + 區域半徑 的衛星必定不可見(NaN 一併排除)
+            near = psi <= footprint + region_radius
+
+            for column in range(stop - start):
+                r = r_itrs[near[:, column], column]
+                if not len(r):
+                    continue
+                r2 = np.einsum('ij,ij->i', r, r)
+                cell_block = max(1, max_block_elements // len(r))
+                for c0 in range(0, n_cells, cell_block):
+                    c1 = min(c0 + cell_block, n_cells)
+                    # sin(仰角) = (r - o)·u / |r - o|，以矩陣乘法一次計算所有 衛星 × 網格點
+                    up = r @ cell_up[c0:c1].T - cell_height[c0:c1]
+                    distance2 = r2[:, None] - 2.0 * (r @ cell_xyz[c0:c1].T) + cell_r2[c0:c1]
+                    sin_elevation = up / np.sqrt(distance2)
+                    time_index = start + column
+                    visible_count[time_index, c0:c1] = (sin_elevation > sin_mask).sum(axis=0)
+                    best_sin[time_index, c0:c1] = sin_elevation.max(axis=0)
+            if progress is not None:
+                progress.update(stop - start)
+
+    best_elevation = np.degrees(np.arcsin(np.clip(best_sin, -1.0, 1.0))).astype(np.float32)
+    best_elevation[visible_count == 0] = np.nan
+    return {
+        'visible_count': visible_count.reshape(n_times, n_lat, n_lon),
+        'best_elevation': best_elevation.reshape(n_times, n_lat, n_lon),
+    }
+
+
+def save_grid_coverage(path, grid_coverage, time_grid, region_grid, min_elevation=DEFAULT_MIN_ELEVATION):
+    """以壓縮 .npz 保存網格覆蓋結果 (含時間、經緯度座標)"""
+    np.savez_compressed(
+        path,
+        visible_count=grid_coverage['visible_count'],
+        best_elevation=grid_coverage['best_elevation'],
+        lats=region_grid.lats,
+        lons=region_grid.lons,
+        offsets_seconds=time_grid.offsets_seconds,
+        start=np.array(pd.Timestamp(time_grid.start).isoformat()),
+        elevation_m=np.array(region_grid.elevation_m),
+        min_elevation=np.array(float(min_elevation)),
+    )
+
+
+def load_grid_coverage(path):
+    """讀取 save_grid_coverage 保存的結果，回傳 (覆蓋結果 dict, TimeGrid, RegionGrid)"""
+    with np.load(path) as data:
+        grid_coverage = {
+            'visible_count': data['visible_count'],
+            'best_elevation': data['best_elevation'],
+        }
+        time_grid = TimeGrid(pd.Timestamp(str(data['start'])).to_pydatetime(), data['offsets_seconds'])
+        region_grid = RegionGrid(data['lats'], data['lons'], float(data['elevation_m']))
+    return grid_coverage, time_grid, region_grid
+
+
+def grid_summary(grid_coverage, region_grid):
+    """將三維結果沿時間軸彙整為每個網格點一列的 DataFrame"""
+    visible_count = grid_coverage['visible_count']
+    lat, lon = np.meshgrid(region_grid.lats, region_grid.lons, indexing='ij')
+    with warnings.catch_warnings():
+        # 整段時間都沒有可見衛星的網格點，平均仰角為 NaN
+        warnings.simplefilter('ignore', RuntimeWarning)
+        summary = pd.DataFrame({
+            'lat': lat.ravel(),
+            'lon': lon.ravel(),
+            'avg_visible_satellites': visible_count.mean(axis=0).ravel(),
+            'min_visible_satellites': visible_count.min(axis=0).ravel(),
+            'coverage_percentage': ((visible_count > 0).mean(axis=0) * 100).ravel(),
+            'avg_best_elevation': np.nanmean(grid_coverage['best_elevation'], axis=0).ravel(),
+        })
+    return summary
+
+
+def generate_grid_heatmap(output_path, grid_coverage, time_grid, region_grid, max_frames=48):
+    """生成網格覆蓋的互動式熱力圖 (平均可見衛星數，另附逐時間點動畫)
+
+    Args:
+        output_path (str): 輸出 HTML 路徑
+        max_frames (int): 動畫最多顯示的時間點數，超過時等間隔抽樣
+    """
+    import plotly.express as px
+
+    visible_count = grid_coverage['visible_count']
+    n_times = visible_count.shape[0]
+    frame_index = np.unique(np.linspace(0, n_times - 1, min(n_times, max_frames)).round().astype(int))
+    labels = np.array(time_grid.labels())[frame_index]
+
+    # 第一個畫格為整段時間的平均，其後為抽樣的各時間點
+    frames = np.concatenate([visible_count.mean(axis=0, keepdims=True), visible_count[frame_index]])
+    fig = px.imshow(frames,
+                    animation_frame=0,
+                    labels=dict(x="經度", y="緯度", color="可見衛星數", animation_frame="時間"),
+                    x=region_grid.lons,
+                    y=region_grid.lats,
+                    origin='lower',
+                    color_continuous_scale="Viridis",
+                    zmin=0,
+                    zmax=float(visible_count.max()) if visible_count.size else 1.0,
+                    title="區域衛星覆蓋熱力圖 (第一格為平均值)")
+    slider_labels = ['平均'] + labels.tolist()
+    for step, label in zip(fig.layout.sliders[0].steps, slider_labels):
+        step.label = label
+    fig.update_layout(autosize=True, height=800, margin=dict(t=50, l=50, b=50, r=50))
+    fig.write_html(output_path)
+    return output_path
+
+
+def run_grid_analysis(satellite_array, ts, time_grid, region_grid, output_dir, min_elevation=DEFAULT_MIN_ELEVATION,
+                      progress=None):
+    """計算並保存網格覆蓋結果：grid_coverage.npz、grid_summary.csv、grid_stats.json 與 grid_heatmap.html"""
+    grid_coverage = compute_grid_coverage(satellite_array, ts, time_grid, region_grid,
+                                          min_elevation=min_elevation, progress=progress)
+    save_grid_coverage(os.path.join(output_dir, 'grid_coverage.npz'), grid_coverage, time_grid, region_grid,
+                       min_elevation)
+    summary = grid_summary(grid_coverage, region_grid)
+    summary.to_csv(os.path.join(output_dir, 'grid_summary.csv'), index=False)
+
+    visible_count = grid_coverage['visible_count']
+    stats = {
+        'grid_shape': [int(n) for n in visible_count.shape],
+        'avg_visible_satellites': float(visible_count.mean()) if visible_count.size else 0.0,
+        'min_visible_satellites': int(visible_count.min()) if visible_count.size else 0,
+        'max_visible_satellites': int(visible_count.max()) if visible_count.size else 0,
+        'coverage_percentage': float((visible_count > 0).mean() * 100) if visible_count.size else 0.0,
+        'min_elevation': float(min_elevation),
+    }
+    with open(os.path.join(output_dir, 'grid_stats.json'), 'w') as f:
+        json.dump(stats, f)
+
+    try:
+        generate_grid_heatmap(os.path.join(output_dir, 'grid_heatmap.html'), grid_coverage, time_grid, region_grid)
+    except Exception as e:
+        print(f"生成網格熱力圖時出錯: {e}")
+    return grid_coverage, stats
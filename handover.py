@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+衛星切換(handover)分析
+
+在傳播過程中逐批接收每個時間點的最佳衛星 (仰角最高者，由陣列 argmax 求得)，
+一次掃描即產生切換事件、每顆最佳衛星的駐留時間與統計摘要，
+不必保留完整的可見度表，也不必事後再分組排序。
+跨批次的狀態 (上一個最佳衛星與其開始時間) 由 HandoverTracker 保存，
+分批與一次處理整段時間的結果完全相同。
+"""
+
+import numpy as np
+import pandas as pd
+
+from visibility_store import DIRECTIONS, direction_codes
+
+# handover_data.csv 的欄位 (rain 只在有天氣資料時輸出)
+HANDOVER_COLUMNS = ['handover_id', 'time', 'switch_time', 'from', 'to', 'from_alt', 'to_alt',
+                    'from_az', 'to_az', 'direction', 'dwell_seconds', 'duration_minutes']
+
+
+def best_per_step(time_index, satellite_index, alt, az, rain=None):
+    """由稀疏的可見紀錄 (propagation.iter_visible 的輸出) 取出每個時間點的最佳衛星
+
+    仰角相同時取衛星索引較小者，與 propagate_coverage 的 argmax 一致。
+
+    Returns:
+        (time_index, best_index, best_alt, best_az, best_rain) 陣列組，每個有可見衛星的時間點一列，
+        依時間排序；未提供 rain 時 best_rain 為 None
+    """
+    time_index = np.asarray(time_index)
+    if len(time_index) == 0:
+        empty = np.array([], dtype=np.int64)
+        return empty, empty, np.array([]), np.array([]), None if rain is None else empty
+    # lexsort 為穩定排序，同仰角時保留原本的衛星順序
+    order = np.lexsort((np.asarray(satellite_index), -np.asarray(alt), time_index))
+    sorted_time = time_index[order]
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = sorted_time[1:] != sorted_time[:-1]
+    pick = order[first]
+    best_rain = None if rain is None else np.asarray(rain)[pick]
+    return (time_index[pick], np.asarray(satellite_index)[pick], np.asarray(alt)[pick],
+            np.asarray(az)[pick], best_rain)
+
+
+class HandoverTracker:
+    """逐批追蹤最佳衛星並記錄切換事件"""
+
+    def __init__(self, satellite_names, time_grid, subsecond=None):
+        """
+        Args:
+            satellite_names: 衛星名稱列表，best_index 為其索引
+            time_grid (TimeGrid): 整段分析的時間網格，傳入的 time_index 為其索引
+            subsecond (bool): 時間標籤是否保留微秒，None 表示依時間網格判斷
+        """
+        self.names = np.asarray(list(satellite_names), dtype=object)
+        self.time_grid = time_grid
+        self.subsecond = time_grid.has_subsecond if subsecond is None else subsecond
+        self._offsets = time_grid.offsets_seconds
+        # 上一個有最佳衛星的時間點: (衛星索引, 時間索引, 仰角, 方位角, 天氣)
+        self._last = None
+        # 目前最佳衛星開始擔任最佳衛星的時間索引
+        self._segment_start = None
+        self._events = []
+        self._best_seen = set()
+        self._has_rain = False
+
+    def update(self, time_index, best_index, best_alt, best_az, rain=None):
+        """附加一批時間點的最佳衛星 (time_index 需遞增且接續先前的批次)，best_index 為 -1 表示無可見衛星"""
+        time_index = np.asarray(time_index)
+        best_index = np.asarray(best_index)
+        keep = best_index >= 0
+        if not keep.any():
+            return
+        time_index = time_index[keep]
+        best_index = best_index[keep]
+        best_alt = np.asarray(best_alt, dtype=float)[keep]
+        best_az = np.asarray(best_az, dtype=float)[keep]
+        if rain is not None:
+            self._has_rain = True
+            rain = np.asarray(rain)[keep]
+        else:
+            rain = np.zeros(len(time_index), dtype=np.int64)
+        self._best_seen.update(np.unique(best_index).tolist())
+
+        # 接上前一批的最後一個時間點，使跨批次的切換也能以相鄰比較求得
+        if self._last is not None:
+            last_index, last_time, last_alt, last_az, last_rain = self._last
+            time_index = np.concatenate(([last_time], time_index))
+            best_index = np.concatenate(([last_index], best_index))
+            best_alt = np.concatenate(([last_alt], best_alt))
+            best_az = np.concatenate(([last_az], best_az))
+            rain = np.concatenate(([last_rain], rain))
+        else:
+            self._segment_start = time_index[0]
+        self._last = (best_index[-1], time_index[-1], best_alt[-1], best_az[-1], rain[-1])
+
+        # 相鄰時間點的最佳衛星不同即為一次切換 (中間沒有可見衛星的時間點不影響判斷)
+        switch = np.flatnonzero(best_index[1:] != best_index[:-1])
+        if len(switch) == 0:
+            return
+        to_position = switch + 1
+        segment_starts = np.concatenate(([self._segment_start], time_index[to_position[:-1]]))
+        self._segment_start = time_index[to_position[-1]]
+        self._events.append({
+            'time_index': time_index[switch],
+            'switch_index': time_index[to_position],
+            'segment_start': segment_starts,
+            'from_index': best_index[switch],
+            'to_index': best_index[to_position],
+            'from_alt': best_alt[switch],
+            'to_alt': best_alt[to_position],
+            'from_az': best_az[switch],
+            'to_az': best_az[to_position],
+            'rain': rain[switch],
+        })
+
+    def update_coverage(self, start, stop, coverage):
+        """附加 propagation.iter_coverage 輸出的一批覆蓋結果"""
+        self.update(np.arange(start, stop), coverage['best_index'], coverage['best_alt'], coverage['best_az'])
+
+    def update_visible(self, time_index, satellite_index, alt, az, rain=None):
+        """附加 propagation.iter_visible 輸出的一批稀疏可見紀錄"""
+        step_index, best_index, best_alt, best_az, best_rain = best_per_step(time_index, satellite_index,
+                                                                           alt, az, rain)
+        self.update(step_index, best_index, best_alt, best_az, best_rain)
+
+    def _collect(self):
+        if not self._events:
+            return None
+        return {key: np.concatenate([event[key] for event in self._events]) for key in self._events[0]}
+
+    def events(self):
+        """切換事件 DataFrame (handover_data.csv 格式)
+
+        time 為切換前最後一個由原衛星擔任最佳衛星的時間點，switch_time 為新衛星開始擔任的時間點；
+        dwell_seconds 為原衛星擔任最佳衛星的時間，duration_minutes 為距下一次切換的時間 (最後一次為 NaN)。
+        """
+        events = self._collect()
+        if events is None:
+            columns = HANDOVER_COLUMNS + (['rain'] if self._has_rain else [])
+            return pd.DataFrame(columns=columns)
+        times = self._offsets[events['time_index']]
+        labels = np.asarray(self.time_grid.labels(self.subsecond), dtype=object)
+        duration_minutes = np.full(len(times), np.nan)
+        duration_minutes[:-1] = np.diff(times) / 60.0
+        df = pd.DataFrame({
+            'handover_id': np.arange(1, len(times) + 1),
+            'time': labels[events['time_index']],
+            'switch_time': labels[events['switch_index']],
+            'from': self.names[events['from_index']],
+            'to': self.names[events['to_index']],
+            'from_alt': events['from_alt'],
+            'to_alt': events['to_alt'],
+            'from_az': events['from_az'],
+            'to_az': events['to_az'],
+            'direction': np.asarray(DIRECTIONS, dtype=object)[direction_codes(events['from_az'])],
+            'dwell_seconds': self._offsets[events['switch_index']] - self._offsets[events['segment_start']],
+            'duration_minutes': duration_minutes,
+        })
+        if self._has_rain:
+            df['rain'] = events['rain']
+        return df
+
+    def summary(self):
+        """切換統計 (合併到 coverage_stats.json)
+
+        駐留時間只計入已完整觀察到的區段：不含由分析起點開始、被時間窗截斷的第一個區段，
+        也不含尚未結束的最後一個區段。
+        """
+        events = self._collect()
+        count = 0 if events is None else len(events['time_index'])
+        step = self.time_grid.step_seconds or 0.0
+        hours = len(self.time_grid) * step / 3600.0
+        stats = {
+            'handover_count': count,
+            'handovers_per_hour': float(count / hours) if hours > 0 else 0.0,
+            'best_satellite_count': len(self._best_seen),
+            # 沒有完整觀察到的區段時為 None (JSON 的 null)，不寫入 NaN
+            'mean_dwell_seconds': None,
+            'median_dwell_seconds': None,
+            'min_dwell_seconds': None,
+            'max_dwell_seconds': None,
+        }
+        # 由第一個時間點開始的區段在分析起點之前可能已經開始，不計入駐留時間
+        observed = None if events is None else events['segment_start'] > 0
+        if count and observed.any():
+            dwell = (self._offsets[events['switch_index'][observed]]
+                     - self._offsets[events['segment_start'][observed]])
+            stats.update({
+                'mean_dwell_seconds': float(np.mean(dwell)),
+                'median_dwell_seconds': float(np.median(dwell)),
+                'min_dwell_seconds': float(np.min(dwell)),
+                'max_dwell_seconds': float(np.max(dwell)),
+            })
+        return stats
+
+
+def handovers_from_coverage(coverage_df, satellite_names, time_grid, subsecond=None):
+    """由 coverage_data 格式的 DataFrame 重建切換事件 (例如取自結果快取時)
+
+    Returns:
+        (events DataFrame, 統計 dict)
+    """
+    tracker = HandoverTracker(satellite_names, time_grid, subsecond)
+    # 名稱重複時取第一個索引；沒有可見衛星(None)的時間點為 -1
+    lookup = {}
+    for index, name in enumerate(satellite_names):
+        lookup.setdefault(name, index)
+    best_index = coverage_df['best_satellite'].map(lookup).fillna(-1).to_numpy(dtype=np.int64)
+    tracker.update(np.arange(len(coverage_df)), best_index, coverage_df['best_alt'].to_numpy(),
+                   coverage_df['best_az'].to_numpy())
+    return tracker.events(), tracker.summary()
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+衛星切換策略模擬
+
+「每個時間點都連到仰角最高的衛星」會高估實際終端的切換次數。
+本模組先傳播一次，建立稀疏的可見度資料 (每個時間點的可見衛星與仰角)，
+再以多種選星策略重播：仰角最高、遲滯門檻、最短駐留時間、
+類 Starlink 的固定排程時槽 (例如每 15 秒才重新分配一次)，
+比較各策略的切換頻率與斷線時間。
+所有策略在同一個時間迴圈中以陣列同時模擬，增加策略幾乎不增加成本。
+"""
+
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from propagation import iter_visible, DEFAULT_MIN_ELEVATION
+from handover import best_per_step
+
+# 「先斷後連」時每次切換的中斷時間(秒)
+DEFAULT_BREAK_SECONDS = 0.5
+
+# handover_policies.csv 的欄位
+POLICY_COLUMNS = ['policy', 'hysteresis_deg', 'min_dwell_seconds', 'slot_seconds', 'make_before_break',
+                  'handover_count', 'handovers_per_hour', 'forced_handover_count', 'mean_dwell_seconds',
+                  'outage_seconds', 'outage_percentage', 'mean_serving_elevation']
+
+
+class HandoverPolicy:
+    """選星策略
+
+    只有在決策時間點 (每個時槽的開頭；slot_seconds 為 0 時為每個時間點) 才會切換：
+    目前的衛星已不可見時強制切換到仰角最高者；仍可見時，只有在已駐留 min_dwell_seconds 以上，
+    且最高仰角比目前衛星高出 hysteresis_deg 以上才切換。
+    目前的衛星在時槽中途落下時，到下一個決策時間點前都是斷線。
+    """
+
+    def __init__(self, name=None, hysteresis_deg=0.0, min_dwell_seconds=0.0, slot_seconds=0.0,
+                 make_before_break=True, break_seconds=DEFAULT_BREAK_SECONDS):
+        """
+        Args:
+            name (str): 策略名稱，None 表示依參數自動命名
+            hysteresis_deg (float): 遲滯門檻(度)
+            min_dwell_seconds (float): 主動切換前的最短駐留時間(秒)
+            slot_seconds (float): 排程時槽長度(秒)，0 表示每個時間點都可切換
+            make_before_break (bool): 是否先連後斷 (切換時不中斷)
+            break_seconds (float): 先斷後連時每次切換的中斷時間(秒)
+        """
+        if hysteresis_deg < 0 or min_dwell_seconds < 0 or slot_seconds < 0:
+            raise ValueError("策略參數不可為負數")
+        self.hysteresis_deg = float(hysteresis_deg)
+        self.min_dwell_seconds = float(min_dwell_seconds)
+        self.slot_seconds = float(slot_seconds)
+        self.make_before_break = bool(make_before_break)
+        self.break_seconds = float(break_seconds)
+        self.name = name or self._default_name()
+
+    def _default_name(self):
+        if not (self.hysteresis_deg or self.min_dwell_seconds or self.slot_seconds):
+            name = 'max_elevation'
+        else:
+            name = f"hyst{self.hysteresis_deg:g}_dwell{self.min_dwell_seconds:g}_slot{self.slot_seconds:g}"
+        return name if self.make_before_break else f"{name}_bbm"
+
+    def __repr__(self):
+        return f"HandoverPolicy({self.name!r})"
+
+
+def max_elevation_policy():
+    """每個時間點都選仰角最高的衛星 (analyze_24h_coverage 的切換定義)"""
+    return HandoverPolicy('max_elevation')
+
+
+def policy_grid(hysteresis_deg=(0, 2, 5, 10), min_dwell_seconds=(0, 30, 60, 120), slot_seconds=(0, 15),
+                make_before_break=(True,)):
+    """以參數組合產生策略列表 (預設 32 種，第一個為仰角最高策略)"""
+    return [HandoverPolicy(hysteresis_deg=h, min_dwell_seconds=d, slot_seconds=s, make_before_break=m)
+            for h, d, s, m in itertools.product(hysteresis_deg, min_dwell_seconds, slot_seconds,
+                                                make_before_break)]
+
+
+class VisibilityCube:
+    """稀疏的 時間 × 衛星 仰角資料，依時間、再依衛星索引排序"""
+
+    def __init__(self, time_grid, time_index, satellite_index, alt, satellite_names=None):
+        """
+        Args:
+            time_grid (TimeGrid): 時間網格
+            time_index: 每筆紀錄的時間索引 (遞增)
+            satellite_index: 每筆紀錄的衛星索引 (同一時間點內遞增)
+            alt: 每筆紀錄的仰角(度)
+            satellite_names: 衛星名稱列表
+        """
+        self.time_grid = time_grid
+        self.time_index = np.asarray(time_index, dtype=np.int64)
+        self.satellite_index = np.asarray(satellite_index, dtype=np.int64)
+        self.alt = np.asarray(alt, dtype=float)
+        self.satellite_names = satellite_names
+        # 第 k 個時間點的紀錄為 [step_start[k], step_start[k + 1])
+        self.step_start = np.searchsorted(self.time_index, np.arange(len(time_grid) + 1))
+        steps, best_index, best_alt, _, _ = best_per_step(self.time_index, self.satellite_index, self.alt,
+                                                          np.zeros(len(self.alt)))
+        self.best_index = np.full(len(time_grid), -1, dtype=np.int64)
+        self.best_alt = np.full(len(time_grid), -np.inf)
+        self.best_index[steps] = best_index
+        self.best_alt[steps] = best_alt
+
+    @classmethod
+    def from_propagation(cls, satellite_array, observer, ts, time_grid, min_elevation=DEFAULT_MIN_ELEVATION,
+                         coarse_step_seconds=None):
+        """傳播一次，收集所有仰角高於門檻的紀錄"""
+        chunks = list(iter_visible(satellite_array, observer, time_grid.to_skyfield(ts),
+                                   min_elevation=min_elevation, coarse_step_seconds=coarse_step_seconds))
+        if chunks:
+            time_index, satellite_index, alt = (np.concatenate(column) for column in list(zip(*chunks))[:3])
+        else:
+            time_index = satellite_index = alt = np.array([])
+        return cls(time_grid, time_index, satellite_index, alt, satellite_array.names)
+
+    @classmethod
+    def from_store(cls, store):
+        """由 visibility_store.VisibilityStore 建立 (不需重新傳播)"""
+        return cls(store.time_grid, store.column('time_index'), store.column('satellite_id'),
+                   store.column('elev'), store.satellites)
+
+    def __len__(self):
+        return len(self.time_index)
+
+
+def simulate_policies(cube, policies):
+    """以同一份可見度資料模擬多個選星策略
+
+    Args:
+        cube (VisibilityCube): 可見度資料
+        policies: HandoverPolicy 列表
+
+    Returns:
+        每個策略一列的 DataFrame (POLICY_COLUMNS)
+    """
+    policies = list(policies)
+    n_policies = len(policies)
+    n_times = len(cube.time_grid)
+    offsets = cube.time_grid.offsets_seconds
+    step = cube.time_grid.step_seconds or 0.0
+    if n_policies == 0:
+        return pd.DataFrame(columns=POLICY_COLUMNS)
+
+    hysteresis = np.array([p.hysteresis_deg for p in policies])
+    min_dwell = np.array([p.min_dwell_seconds for p in policies])
+    slot = np.array([p.slot_seconds for p in policies])
+    break_penalty = np.array([0.0 if p.make_before_break else p.break_seconds for p in policies])
+    has_slot = slot > 0
+    safe_slot = np.where(has_slot, slot, 1.0)
+
+    # 各策略的狀態：目前連線的衛星(-1 為無)、最後一次連線的衛星、開始連線的時間、目前的時槽
+    current = np.full(n_policies, -1, dtype=np.int64)
+    last_serving = np.full(n_policies, -1, dtype=np.int64)
+    since = np.zeros(n_policies)
+    slot_id = np.full(n_policies, -1, dtype=np.int64)
+
+    handovers = np.zeros(n_policies, dtype=np.int64)
+    forced = np.zeros(n_policies, dtype=np.int64)
+    dwell_sum = np.zeros(n_policies)
+    outage_steps = np.zeros(n_policies, dtype=np.int64)
+    elevation_sum = np.zeros(n_policies)
+    serving_steps = np.zeros(n_policies, dtype=np.int64)
+
+    for k in range(n_times):
+        lo, hi = cube.step_start[k], cube.step_start[k + 1]
+        satellites = cube.satellite_index[lo:hi]
+        best, best_alt = cube.best_index[k], cube.best_alt[k]
+
+        # 目前衛星的仰角 (已不可見時為 -inf)
+        if hi > lo:
+            position = np.minimum(np.searchsorted(satellites, current), hi - lo - 1)
+            found = (current >= 0) & (satellites[position] == current)
+            current_alt = np.where(found, cube.alt[lo:hi][position], -np.inf)
+        else:
+            found = np.zeros(n_policies, dtype=bool)
+            current_alt = np.full(n_policies, -np.inf)
+
+        # 決策時間點：每個時槽的開頭 (無時槽時為每個時間點)
+        new_slot_id = np.where(has_slot, np.floor(offsets[k] / safe_slot + 1e-9).astype(np.int64), k)
+        decide = new_slot_id != slot_id
+        slot_id = new_slot_id
+
+        lost = ~found
+        if best >= 0:
+            voluntary = found & (best != current) & (best_alt > current_alt + hysteresis) & \
+                (offsets[k] - since >= min_dwell)
+            switch = decide & (lost | voluntary)
+        else:
+            switch = np.zeros(n_policies, dtype=bool)
+
+        # 換到另一顆衛星才算一次切換 (斷線後重新連上同一顆不算)
+        changed = switch & (last_serving >= 0) & (best != last_serving)
+        handovers += changed
+        forced += changed & lost
+        dwell_sum += np.where(changed, offsets[k] - since, 0.0)
+        since = np.where(switch & (best != last_serving), offsets[k], since)
+        current = np.where(switch, best, current)
+        last_serving = np.where(switch, best, last_serving)
+
+        serving = switch | found
+        outage_steps += ~serving
+        serving_steps += serving
+        elevation_sum += np.where(switch, best_alt, np.where(found, current_alt, 0.0))
+
+    duration_seconds = n_times * step
+    hours = duration_seconds / 3600.0
+    outage_seconds = outage_steps * step + handovers * break_penalty
+    with np.errstate(invalid='ignore', divide='ignore'):
+        results = pd.DataFrame({
+            'policy': [p.name for p in policies],
+            'hysteresis_deg': hysteresis,
+            'min_dwell_seconds': min_dwell,
+            'slot_seconds': slot,
+            'make_before_break': [p.make_before_break for p in policies],
+            'handover_count': handovers,
+            'handovers_per_hour': handovers / hours if hours > 0 else np.nan,
+            'forced_handover_count': forced,
+            'mean_dwell_seconds': np.where(handovers > 0, dwell_sum / np.maximum(handovers, 1), np.nan),
+            'outage_seconds': outage_seconds,
+            'outage_percentage': outage_seconds / duration_seconds * 100 if duration_seconds > 0 else np.nan,
+            'mean_serving_elevation': np.where(serving_steps > 0, elevation_sum / np.maximum(serving_steps, 1),
+                                               np.nan),
+        })
+    return results[POLICY_COLUMNS]
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+背景分析工作
+
+每個分析在獨立的子行程中執行，呼叫端(例如 Shiny 儀表板)不會被阻塞。
+工作狀態、完成百分比與錯誤訊息寫在輸出目錄的 job_status.json，
+R 端可直接讀取該檔案，也可透過 JobRunner.status() 查詢；
+取消時在輸出目錄寫入旗標檔，分析在下一次進度回報時停止。
+中斷、失敗或取消的工作可以 JobRunner.resume() 由輸出目錄中的檢查點繼續。
+同時執行的工作數有上限，其餘工作依提交順序排隊。
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import atexit
+import signal
+import multiprocessing
+from datetime import datetime
+
+STATUS_FILE = 'job_status.json'
+CANCEL_FILE = 'job_cancel'
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+DEFAULT_MAX_CONCURRENT = int(os.environ.get('STARLINK_MAX_CONCURRENT_JOBS', '2'))
+# 進度百分比的分配：傳播計算佔 90%，其餘為繪圖與報告
+ANALYSIS_PERCENT = 90.0
+# 兩次寫入狀態檔的最短間隔(秒)
+STATUS_WRITE_INTERVAL = 0.5
+
+
+class JobCancelled(Exception):
+    """工作被取消"""
+
+
+def _write_status(output_dir, **fields):
+    """合併並以原子方式寫入狀態檔"""
+    status = read_status(output_dir) or {}
+    status.update(fields, updated_at=time.time())
+    tmp_path = os.path.join(output_dir, f"{STATUS_FILE}.{os.getpid()}.tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(status, f, ensure_ascii=False, default=str)
+    os.replace(tmp_path, os.path.join(output_dir, STATUS_FILE))
+    return status
+
+
+def read_status(output_dir):
+    """讀取輸出目錄中的工作狀態，沒有狀態檔時回傳 None"""
+    try:
+        with open(os.path.join(output_dir, STATUS_FILE), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class _JobProgress:
+    """tqdm 相容的進度回報器：寫入狀態檔並檢查取消旗標"""
+
+    def __init__(self, output_dir, total):
+        self.output_dir = output_dir
+        self.total = max(int(total), 1)
+        self.n = 0
+        self._last_write = 0.0
+
+    def update(self, n=1):
+        self.n += n
+        if os.path.exists(os.path.join(self.output_dir, CANCEL_FILE)):
+            raise JobCancelled("工作已取消")
+        now = time.time()
+        if now - self._last_write >= STATUS_WRITE_INTERVAL or self.n >= self.total:
+            self._last_write = now
+            percent = ANALYSIS_PERCENT * min(self.n / self.total, 1.0)
+            _write_status(self.output_dir, percent=round(percent, 1),
+                          message=f"正在計算衛星覆蓋 ({self.n}/{self.total})")
+
+
+def _terminate_children(signum, frame):
+    """工作行程被終止時一併終止平行計算的子行程，避免留下孤兒行程"""
+    for child in multiprocessing.active_children():
+        child.terminate()
+    for child in multiprocessing.active_children():
+        child.join(1.0)
+    os._exit(128 + signum)
+
+
+def _run_job(output_dir, params):
+    """子行程進入點：執行完整分析並更新狀態檔"""
+    # 工作行程不是 daemon，可以再建立平行計算與繪圖的行程池 (workers > 1)；
+    # 強制取消 (terminate) 時由訊號處理一併結束這些子行程
+    signal.signal(signal.SIGTERM, _terminate_children)
+    from satellite_analysis import StarlinkAnalysis
+    from result_cache import ResultCache
+    from time_grid import TimeGrid
+    from run_metrics import start_profiling, DEFAULT_PROFILE
+
+    # 子行程結束時不執行 atexit，剖析結果在 finally 中保存
+    stop_profiling = start_profiling(output_dir) if params.get('profile', DEFAULT_PROFILE) else None
+    try:
+        _write_status(output_dir, state=RUNNING, percent=0.0, message="正在載入衛星數據", pid=os.getpid(),
+                      started_at=time.time())
+        analyzer = StarlinkAnalysis(output_dir=output_dir, tle_file=params.get('tle_file'),
+                                    result_cache=ResultCache() if params.get('use_cache', True) else None)
+        analyzer.set_observer_location(params['lat'], params['lon'])
+
+        duration = min(24 * 60, params['analysis_duration_minutes'])
+        n_times = len(TimeGrid.from_interval(datetime.now(), duration, params['interval_minutes']))
+        stats = analyzer.analyze_24h_coverage(interval_minutes=params['interval_minutes'],
+                                              analysis_duration_minutes=params['analysis_duration_minutes'],
+                                              workers=params.get('workers', 1),
+                                              coarse_step_seconds=params.get('coarse_step_seconds'),
+                                              method=params.get('method', 'sampling'),
+                                              progress=_JobProgress(output_dir, n_times),
+                                              resume=params.get('resume', False),
+                                              max_memory=params.get('max_memory'))
+
+        if os.path.exists(os.path.join(output_dir, CANCEL_FILE)):
+            raise JobCancelled("工作已取消")
+        _write_status(output_dir, percent=ANALYSIS_PERCENT, message="正在生成圖表與報告")
+        analyzer.generate_visualizations(preset=params.get('render_preset'))
+        analyzer.export_html_report()
+        _write_status(output_dir, state=DONE, percent=100.0, message="分析完成", stats=stats,
+                      timeline_files=list(analyzer.timeline_files), finished_at=time.time())
+    except JobCancelled:
+        _write_status(output_dir, state=CANCELLED, message="工作已取消", finished_at=time.time())
+    except Exception as e:
+        _write_status(output_dir, state=FAILED, message=f"分析錯誤: {e}", error=str(e),
+                      finished_at=time.time())
+    finally:
+        if stop_profiling is not None:
+            stop_profiling()
+
+
+def _mp_context():
+    """取得 spawn 行程環境；在 R (reticulate) 內嵌的直譯器中需指定 Python 執行檔"""
+    context = multiprocessing.get_context('spawn')
+    executable = sys.executable
+    if not executable or not os.path.basename(executable).lower().startswith('python'):
+        candidate = os.path.join(sys.exec_prefix, 'bin', 'python')
+        if os.path.exists(candidate):
+            context.set_executable(candidate)
+    return context
+
+
+class JobRunner:
+    """管理背景分析工作：提交、排隊、查詢進度與取消"""
+
+    def __init__(self, max_concurrent=None, output_root='output'):
+        self.max_concurrent = max(1, DEFAULT_MAX_CONCURRENT if max_concurrent is None else int(max_concurrent))
+        self.output_root = output_root
+        self._context = _mp_context()
+        self._jobs = {}    # job_id -> {'output_dir', 'params', 'process'}
+        self._queue = []   # 等待中的 job_id，依提交順序
+        # 工作行程不是 daemon，呼叫端的直譯器結束時先終止仍在執行的工作，不等待其完成
+        atexit.register(self._terminate_running)
+
+    def submit(self, lat, lon, interval_minutes=1, analysis_duration_minutes=60, output_dir=None, **options):
+        """提交分析工作，立即回傳工作 ID
+
+        Args:
+            lat (float): 觀測點緯度
+            lon (float): 觀測點經度
+            interval_minutes (float): 分析間隔(分鐘)
+            analysis_duration_minutes (int): 分析持續時間(分鐘)
+            output_dir (str): 輸出目錄，預設為 output/<時間戳>_<工作 ID>
+            **options: workers、coarse_step_seconds、method、max_memory、use_cache、tle_file、
+                profile (以 cProfile 剖析，結果存為 profile.pstats)、render_preset (圖表預設組合) 等其他分析參數
+
+        Returns:
+            工作 ID 字串
+        """
+        job_id = uuid.uuid4().hex[:12]
+        if output_dir is None:
+            output_dir = os.path.join(self.output_root, f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{job_id}")
+        os.makedirs(output_dir, exist_ok=True)
+        params = dict(options, lat=float(lat), lon=float(lon), interval_minutes=float(interval_minutes),
+                      analysis_duration_minutes=int(analysis_duration_minutes))
+        self._jobs[job_id] = {'output_dir': output_dir, 'params': params, 'process': None}
+        self._queue.append(job_id)
+        _write_status(output_dir, job_id=job_id, state=QUEUED, percent=0.0, message="排隊等待中",
+                      submitted_at=time.time(), params=params)
+        self.poll()
+        return job_id
+
+    def resume(self, output_dir):
+        """由輸出目錄中的檢查點繼續先前中斷、失敗或取消的工作 (沿用原本的參數)
+
+        Returns:
+            新的工作 ID 字串
+        """
+        self.poll()
+        for job_id, job in self._jobs.items():
+            if job['output_dir'] == output_dir and (job_id in self._queue or job['process']):
+                raise ValueError(f"{output_dir} 的工作仍在執行或排隊中")
+        status = read_status(output_dir)
+        if not status or 'params' not in status:
+            raise ValueError(f"{output_dir} 沒有可繼續的工作")
+        cancel_path = os.path.join(output_dir, CANCEL_FILE)
+        if os.path.exists(cancel_path):
+            os.remove(cancel_path)
+        params = dict(status['params'], resume=True)
+        return self.submit(output_dir=output_dir, **params)
+
+    def poll(self):
+        """回收已結束的行程並啟動排隊中的工作"""
+        running = 0
+        for job_id, job in self._jobs.items():
+            process = job['process']
+            # None 表示尚未啟動，False 表示已回收
+            if not process:
+                continue
+            if process.is_alive():
+                running += 1
+                continue
+            process.join()
+            job['process'] = False
+            # 行程異常結束(例如被強制終止)時狀態檔可能仍停在執行中
+            status = read_status(job['output_dir']) or {}
+            if status.get('state') not in FINISHED_STATES:
+                cancelled = os.path.exists(os.path.join(job['output_dir'], CANCEL_FILE))
+                _write_status(job['output_dir'], state=CANCELLED if cancelled else FAILED,
+                              message="工作已取消" if cancelled else f"工作行程異常結束 (代碼 {process.exitcode})",
+                              finished_at=time.time())
+
+        while self._queue and running < self.max_concurrent:
+            job_id = self._queue.pop(0)
+            job = self._jobs[job_id]
+            # daemon 行程不能建立子行程，平行計算 (workers > 1) 需要一般行程
+            process = self._context.Process(target=_run_job, args=(job['output_dir'], job['params']))
+            process.start()
+            job['process'] = process
+            running += 1
+
+    def status(self, job_id):
+        """查詢工作狀態
+
+        Returns:
+            dict，包含 job_id、state、percent、message、output_dir、queue_position (僅排隊中)，
+            完成時另含 stats 與 timeline_files (時間線圖檔名)，失敗時含 error
+        """
+        if job_id not in self._jobs:
+            raise KeyError(f"找不到工作: {job_id}")
+        self.poll()
+        job = self._jobs[job_id]
+        status = read_status(job['output_dir']) or {'state': QUEUED, 'percent': 0.0}
+        status['job_id'] = job_id
+        status['output_dir'] = job['output_dir']
+        if job_id in self._queue:
+            status['queue_position'] = self._queue.index(job_id) + 1
+        return status
+
+    def cancel(self, job_id, force=False):
+        """取消工作；執行中的工作在下一次進度回報時停止，force=True 時立即終止行程
+
+        Returns:
+            是否已送出取消 (已結束的工作回傳 False)
+        """
+        if job_id not in self._jobs:
+            raise KeyError(f"找不到工作: {job_id}")
+        job = self._jobs[job_id]
+        if job_id in self._queue:
+            self._queue.remove(job_id)
+            _write_status(job['output_dir'], state=CANCELLED, message="工作已取消", finished_at=time.time())
+            return True
+        process = job['process']
+        if not process or not process.is_alive():
+            return False
+        with open(os.path.join(job['output_dir'], CANCEL_FILE), 'w') as f:
+            f.write(str(time.time()))
+        if force:
+            process.terminate()
+        self.poll()
+        return True
+
+    def list_jobs(self):
+        """列出所有工作的狀態"""
+        return [self.status(job_id) for job_id in list(self._jobs)]
+
+    def _terminate_running(self):
+        """終止所有執行中的工作行程 (直譯器結束時呼叫)"""
+        for job in self._jobs.values():
+            process = job['process']
+            if process and process.is_alive():
+                process.terminate()
+                process.join(5.0)
+
+    def shutdown(self, cancel=True):
+        """結束所有工作 (cancel=True 時強制終止執行中的行程)"""
+        for job_id in list(self._jobs):
+            if cancel:
+                self.cancel(job_id, force=True)
+        for job in self._jobs.values():
+            if job['process']:
+                job['process'].join()
+        self.poll()
+
+
+_default_runner = None
+
+
+def get_runner(max_concurrent=None):
+    """取得行程內共用的 JobRunner (Shiny 的所有連線共用同一個佇列)"""
+    global _default_runner
+    if _default_runner is None:
+        _default_runner = JobRunner(max_concurrent=max_concurrent)
+    return _default_runner
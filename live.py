@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+即時滑動視窗覆蓋
+
+長時間執行時保留「從現在起往後 N 分鐘」的逐衛星仰角/方位角/距離 (環狀緩衝區)，
+時間前進時只傳播新進入視窗的時間點並覆蓋已過期的欄位；
+TLE 更新後只重新計算軌道根數有變動的衛星，其餘衛星沿用已計算的結果。
+時間點對齊到 UTC 的固定間隔，同一個時間點的結果與完整重算相同。
+"""
+
+import os
+import json
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from propagation import SatelliteArray, topocentric_altaz, _empty_coverage, _reduce_coverage, DEFAULT_MIN_ELEVATION
+from time_grid import TimeGrid
+
+DEFAULT_WINDOW_MINUTES = 60
+DEFAULT_INTERVAL_SECONDS = 60
+DEFAULT_REFRESH_SECONDS = 5
+# 每隔多久檢查一次 TLE 是否更新(分鐘)
+DEFAULT_TLE_CHECK_MINUTES = 60
+
+
+class LiveCoverage:
+    """以環狀緩衝區保存滑動視窗內的逐衛星站心座標"""
+
+    def __init__(self, catalog, observer, ts, window_minutes=DEFAULT_WINDOW_MINUTES,
+                 interval_seconds=DEFAULT_INTERVAL_SECONDS, min_elevation=DEFAULT_MIN_ELEVATION):
+        """
+        Args:
+            catalog (SatelliteCatalog): 衛星目錄
+            observer: skyfield 的 wgs84 地理位置
+            ts: skyfield 時間尺度
+            window_minutes (float): 視窗長度(分鐘)
+            interval_seconds (float): 時間間隔(秒)，時間點對齊到 UTC 的此間隔
+            min_elevation (float): 最小可見仰角(度)
+        """
+        if interval_seconds <= 0:
+            raise ValueError(f"時間間隔必須大於 0，收到 {interval_seconds}")
+        self.observer = observer
+        self.ts = ts
+        self.interval_seconds = float(interval_seconds)
+        self.min_elevation = min_elevation
+        self.n_steps = max(1, int(round(window_minutes * 60.0 / self.interval_seconds)))
+        # 累計傳播的 衛星 × 時間點 數，用於比較與完整重算的成本
+        self.propagated = 0
+        self._set_catalog(catalog)
+        self._alt = np.full((len(self.satellite_array), self.n_steps), np.nan, dtype=np.float32)
+        self._az = np.full_like(self._alt, np.nan)
+        self._distance = np.full_like(self._alt, np.nan)
+        # 每個欄位目前存放的絕對時間步 (自 1970-01-01 起的第幾個間隔)，-1 表示空白
+        self._steps = np.full(self.n_steps, -1, dtype=np.int64)
+        self.first_step = None
+
+    def _set_catalog(self, catalog):
+        self.catalog = catalog
+        self.satellite_array = SatelliteArray.from_catalog(catalog)
+        # 以 TLE 兩行內容識別衛星，內容相同即可沿用已計算的結果
+        self._keys = list(zip(catalog.records['line1'].tolist(), catalog.records['line2'].tolist()))
+
+    def _step_time(self, step):
+        """絕對時間步對應的 UTC datetime"""
+        return datetime.fromtimestamp(step * self.interval_seconds, timezone.utc)
+
+    def _propagate(self, satellite_array, steps):
+        """計算 satellite_array 在絕對時間步 steps 的仰角、方位角與距離"""
+        steps = np.asarray(steps, dtype=np.int64)
+        start = self._step_time(steps[0])
+        time_grid = TimeGrid(start, (steps - steps[0]) * self.interval_seconds)
+        positions = satellite_array.itrs_positions_km(time_grid.to_skyfield(self.ts))
+        self.propagated += len(satellite_array) * len(steps)
+        return topocentric_altaz(positions, self.observer)
+
+    def advance(self, now=None):
+        """將視窗移到 now (預設為現在)，只傳播新進入視窗的時間點
+
+        Returns:
+            新計算的時間點數
+        """
+        now = now or datetime.now(timezone.utc)
+        first_step = int(np.floor(now.timestamp() / self.interval_seconds))
+        wanted = first_step + np.arange(self.n_steps)
+        columns = wanted % self.n_steps
+        missing = self._steps[columns] != wanted
+        self.first_step = first_step
+        if not missing.any() or len(self.satellite_array) == 0:
+            self._steps[columns] = wanted
+            return int(missing.sum())
+
+        alt, az, distance = self._propagate(self.satellite_array, wanted[missing])
+        self._alt[:, columns[missing]] = alt
+        self._az[:, columns[missing]] = az
+        self._distance[:, columns[missing]] = distance
+        self._steps[columns[missing]] = wanted[missing]
+        return int(missing.sum())
+
+    def update_catalog(self, catalog):
+        """換成新的衛星目錄，只重新計算 TLE 有變動或新增的衛星
+
+        Returns:
+            dict，包含 kept (沿用)、recomputed (重新計算)、removed (移除) 的衛星數
+        """
+        old_rows = {key: row for row, key in enumerate(self._keys)}
+        n_removed = len(set(self._keys) - set(zip(catalog.records['line1'].tolist(),
+                                                  catalog.records['line2'].tolist())))
+        old_alt, old_az, old_distance = self._alt, self._az, self._distance
+        self._set_catalog(catalog)
+
+        rows = np.array([old_rows.get(key, -1) for key in self._keys], dtype=np.int64)
+        kept = np.flatnonzero(rows >= 0)
+        changed = np.flatnonzero(rows < 0)
+        self._alt = np.full((len(self._keys), self.n_steps), np.nan, dtype=np.float32)
+        self._az = np.full_like(self._alt, np.nan)
+        self._distance = np.full_like(self._alt, np.nan)
+        self._alt[kept] = old_alt[rows[kept]]
+        self._az[kept] = old_az[rows[kept]]
+        self._distance[kept] = old_distance[rows[kept]]
+
+        valid = np.flatnonzero(self._steps >= 0)
+        if len(changed) and len(valid):
+            order = valid[np.argsort(self._steps[valid])]
+            alt, az, distance = self._propagate(self.satellite_array.subset(changed), self._steps[order])
+            self._alt[np.ix_(changed, order)] = alt
+            self._az[np.ix_(changed, order)] = az
+            self._distance[np.ix_(changed, order)] = distance
+        return {'kept': int(len(kept)), 'recomputed': int(len(changed)), 'removed': n_removed}
+
+    def _ordered(self):
+        """依時間順序排列的 (時間網格, 仰角, 方位角, 距離)"""
+        if self.first_step is None:
+            raise ValueError("請先呼叫 advance()")
+        columns = (self.first_step + np.arange(self.n_steps)) % self.n_steps
+        start = self._step_time(self.first_step)
+        time_grid = TimeGrid(start, np.arange(self.n_steps) * self.interval_seconds)
+        return time_grid, self._alt[:, columns], self._az[:, columns], self._distance[:, columns]
+
+    def coverage(self):
+        """視窗內每個時間點的覆蓋結果 (coverage_data.csv 格式)"""
+        time_grid, alt, az, distance = self._ordered()
+        result = _empty_coverage(self.n_steps)
+        _reduce_coverage(result, 0, self.n_steps, np.arange(len(self.satellite_array)), alt, az, distance,
+                         self.min_elevation)
+        names = self.satellite_array.names
+        return pd.DataFrame({
+            'time': time_grid.labels(),
+            'visible_satellites': result['visible_count'],
+            'best_satellite': [names[i] if i >= 0 else None for i in result['best_index']],
+            'best_alt': result['best_alt'],
+            'best_az': result['best_az'],
+            'best_distance': result['best_distance'],
+        })
+
+    def visible_now(self):
+        """目前時間點的可見衛星，依仰角由高到低排序"""
+        _, alt, az, distance = self._ordered()
+        visible = np.flatnonzero(alt[:, 0] > self.min_elevation)
+        visible = visible[np.argsort(-alt[visible, 0], kind='stable')]
+        return pd.DataFrame({
+            'satellite': [self.satellite_array.names[i] for i in visible],
+            'alt': alt[visible, 0],
+            'az': az[visible, 0],
+            'distance': distance[visible, 0],
+        })
+
+
+def _write_atomic(path, write):
+    """先寫入暫存檔再改名，儀表板不會讀到寫到一半的檔案"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _write_json(path, data):
+    with open(path, 'w') as f:
+        json.dump(data, f, ensure_ascii=False)
+
+
+def run_live(analyzer, window_minutes=DEFAULT_WINDOW_MINUTES, interval_seconds=DEFAULT_INTERVAL_SECONDS,
+             refresh_seconds=DEFAULT_REFRESH_SECONDS, tle_check_minutes=DEFAULT_TLE_CHECK_MINUTES,
+             max_iterations=None):
+    """持續更新滑動視窗，輸出 live_coverage.csv、live_visible.csv 與 live_status.json
+
+    Args:
+        analyzer (StarlinkAnalysis): 已設定觀測點的分析器 (提供衛星目錄、TLE 快取與輸出目錄)
+        window_minutes (float): 往後預測的視窗長度(分鐘)
+        interval_seconds (float): 時間間隔(秒)
+        refresh_seconds (float): 更新頻率(秒)
+        tle_check_minutes (float): 檢查 TLE 是否更新的頻率(分鐘)，TLE 快取未過期時不會重新下載
+        max_iterations (int): 更新次數上限，None 表示直到中斷 (Ctrl-C)
+    """
+    live = LiveCoverage(analyzer.catalog, analyzer.observer, analyzer.ts, window_minutes=window_minutes,
+                        interval_seconds=interval_seconds)
+    coverage_path = os.path.join(analyzer.output_dir, 'live_coverage.csv')
+    visible_path = os.path.join(analyzer.output_dir, 'live_visible.csv')
+    status_path = os.path.join(analyzer.output_dir, 'live_status.json')
+    full_cost = len(live.satellite_array) * live.n_steps
+    last_tle_check = time.time()
+    iteration = 0
+    print(f"即時模式：視窗 {window_minutes} 分鐘，間隔 {interval_seconds} 秒，每 {refresh_seconds} 秒更新 (Ctrl-C 結束)")
+
+    try:
+        while max_iterations is None or iteration < max_iterations:
+            loop_start = time.time()
+            # TLE 更新後只重新計算有變動的衛星
+            if not analyzer.tle_file and time.time() - last_tle_check >= tle_check_minutes * 60:
+                last_tle_check = time.time()
+                previous_hash = analyzer.catalog.source_hash
+                analyzer.download_tle_data()
+                if analyzer.catalog.source_hash != previous_hash:
+                    changes = live.update_catalog(analyzer.catalog)
+                    print(f"TLE 已更新：沿用 {changes['kept']} 顆，重新計算 {changes['recomputed']} 顆，"
+                          f"移除 {changes['removed']} 顆")
+
+            propagated_before = live.propagated
+            new_steps = live.advance()
+            coverage_df = live.coverage()
+            visible_df = live.visible_now()
+            _write_atomic(coverage_path, lambda path: coverage_df.to_csv(path, index=False))
+            _write_atomic(visible_path, lambda path: visible_df.to_csv(path, index=False))
+            status = {
+                'updated_at': datetime.now(timezone.utc).isoformat(),
+                'window_start': coverage_df['time'].iloc[0],
+                'window_minutes': window_minutes,
+                'interval_seconds': interval_seconds,
+                'visible_now': int(len(visible_df)),
+                'best_satellite_now': visible_df['satellite'].iloc[0] if len(visible_df) else None,
+                'coverage_percentage': float((coverage_df['visible_satellites'] > 0).mean() * 100),
+                'new_steps': new_steps,
+                # 本次更新的傳播量相對於完整重算整個視窗的比例
+                'propagation_fraction': float((live.propagated - propagated_before) / full_cost) if full_cost else 0.0,
+                'elapsed_seconds': round(time.time() - loop_start, 4),
+            }
+            _write_atomic(status_path, lambda path: _write_json(path, status))
+            iteration += 1
+            if max_iterations is not None and iteration >= max_iterations:
+                break
+            time.sleep(max(0.0, refresh_seconds - (time.time() - loop_start)))
+    except KeyboardInterrupt:
+        print("即時模式已結束")
+    return live
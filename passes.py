@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+事件式過境預測 (升起 / 最高點 / 落下)
+
+先以粗篩找出每個區間可能可見的衛星，再以較疏的取樣偵測仰角門檻的穿越點，
+最後以向量化的二分法與黃金分割搜尋精算 AOS、LOS 與最大仰角，
+產生每顆衛星的精簡過境表。任意解析度的覆蓋率與最佳衛星時間線都可由過境區間推得，
+不必對整段時間做密集取樣。
+"""
+
+import numpy as np
+import pandas as pd
+
+from propagation import (SatelliteArray, coarse_candidates, topocentric_altaz, _empty_coverage,
+                         DEFAULT_MIN_ELEVATION, DEFAULT_COARSE_STEP_SECONDS)
+from time_grid import TimeGrid
+
+# 偵測穿越點的取樣間隔(秒)
+DEFAULT_SAMPLE_STEP_SECONDS = 10.0
+# AOS / LOS / 最高點時間的求解精度(秒)
+DEFAULT_TOLERANCE_SECONDS = 0.1
+# 取樣點仰角在門檻以下此範圍內的局部最大值，會再精算以找出取樣點之間的短暫過境
+GRAZING_MARGIN_DEG = 1.0
+
+PASS_COLUMNS = ['satellite_index', 'satellite', 'aos', 'culmination', 'los',
+                'max_elevation', 'duration_seconds']
+
+_GOLDEN = (np.sqrt(5.0) - 1.0) / 2.0
+
+
+def _as_satellite_array(satellites):
+    if isinstance(satellites, SatelliteArray):
+        return satellites
+    return SatelliteArray(satellites)
+
+
+class _PairEvaluator:
+    """計算 (衛星索引, 相對起點秒數) 配對的仰角"""
+
+    def __init__(self, satellite_array, observer, ts, start):
+        self.satellite_array = satellite_array
+        self.observer = observer
+        self.ts = ts
+        self.start = start
+
+    def elevation(self, indices, offsets):
+        if len(indices) == 0:
+            return np.empty(0)
+        t = TimeGrid(self.start, offsets).to_skyfield(self.ts)
+        r_itrs = self.satellite_array.itrs_positions_at_km(indices, t)
+        return topocentric_altaz(r_itrs, self.observer)[0]
+
+
+def _bisect_crossings(evaluator, indices, low, high, rising, min_elevation, tolerance):
+    """以二分法求仰角穿越門檻的時間 (向量化)"""
+    low = low.copy()
+    high = high.copy()
+    while len(low) and np.max(high - low) > tolerance:
+        middle = (low + high) / 2.0
+        above = evaluator.elevation(indices, middle) > min_elevation
+        # 升起時門檻以上表示根在左半邊；落下時相反
+        go_left = above == rising
+        high = np.where(go_left, middle, high)
+        low = np.where(go_left, low, middle)
+    return (low + high) / 2.0
+
+
+def _golden_maximum(evaluator, indices, low, high, tolerance):
+    """以黃金分割搜尋求區間內的最大仰角與其時間 (向量化)"""
+    a = low.copy()
+    b = high.copy()
+    c = b - _GOLDEN * (b - a)
+    d = a + _GOLDEN * (b - a)
+    fc = evaluator.elevation(indices, c)
+    fd = evaluator.elevation(indices, d)
+    while len(a) and np.max(b - a) > tolerance:
+        left = fc >= fd
+        # 最大值在左側時保留 [a, d]，否則保留 [c, b]；每輪只需計算一個新點
+        b = np.where(left, d, b)
+        a = np.where(left, a, c)
+        new_point = np.where(left, b - _GOLDEN * (b - a), a + _GOLDEN * (b - a))
+        new_value = evaluator.elevation(indices, new_point)
+        c, d, fc, fd = (np.where(left, new_point, d), np.where(left, c, new_point),
+                        np.where(left, new_value, fd), np.where(left, fc, new_value))
+    best = np.where(fc >= fd, c, d)
+    return best, evaluator.elevation(indices, best)
+
+
+def predict_passes(satellites, observer, ts, start, duration_minutes, min_elevation=DEFAULT_MIN_ELEVATION,
+                   sample_step_seconds=DEFAULT_SAMPLE_STEP_SECONDS,
+                   coarse_step_seconds=DEFAULT_COARSE_STEP_SECONDS,
+                   tolerance_seconds=DEFAULT_TOLERANCE_SECONDS):
+    """預測時間窗內每顆衛星高於仰角門檻的過境
+
+    Args:
+        satellites: SatelliteArray 或 EarthSatellite 列表
+        observer: skyfield 的 wgs84 地理位置
+        ts: skyfield 時間尺度
+        start (datetime): 帶時區(UTC)的起始時間
+        duration_minutes (float): 時間窗長度(分鐘)
+        min_elevation (float): 仰角門檻(度)
+        sample_step_seconds (float): 偵測穿越點的取樣間隔(秒)
+        coarse_step_seconds (float): 粗篩網格間隔(秒)
+        tolerance_seconds (float): 事件時間的求解精度(秒)
+
+    Returns:
+        DataFrame，欄位為 satellite_index、satellite、aos、culmination、los、
+        max_elevation、duration_seconds；在時間窗起點或終點仍可見的過境，其 AOS/LOS 取時間窗邊界
+    """
+    satellite_array = _as_satellite_array(satellites)
+    span = float(duration_minutes) * 60.0
+    if len(satellite_array) == 0 or span <= 0:
+        return pd.DataFrame(columns=PASS_COLUMNS)
+
+    # 粗網格與取樣網格都恰好結束於時間窗終點，且每個粗網格區間含整數個取樣間隔
+    n_intervals = max(1, int(np.ceil(span / coarse_step_seconds)))
+    interval_seconds = span / n_intervals
+    samples_per_interval = max(1, int(np.ceil(interval_seconds / sample_step_seconds)))
+    sample_seconds = interval_seconds / samples_per_interval
+    coarse_t = TimeGrid(start, np.arange(n_intervals + 1) * interval_seconds).to_skyfield(ts)
+    candidates = coarse_candidates(satellite_array, observer, coarse_t, min_elevation)
+
+    crossing_parts = []   # (衛星, 區間左端, 區間右端, 是否升起)
+    grazing_parts = []    # (衛星, 區間左端, 區間右端)
+    above_at_start = np.empty(0, dtype=np.int64)
+    above_at_end = np.empty(0, dtype=np.int64)
+    local_offsets = np.arange(samples_per_interval + 1) * sample_seconds
+
+    for k in range(n_intervals):
+        indices = np.nonzero(candidates[:, k])[0]
+        if len(indices) == 0:
+            continue
+        offsets = k * interval_seconds + local_offsets
+        t = TimeGrid(start, offsets).to_skyfield(ts)
+        alt = topocentric_altaz(satellite_array.subset(indices).itrs_positions_km(t), observer)[0]
+        above = alt > min_elevation
+
+        if k == 0:
+            above_at_start = indices[above[:, 0]]
+        if k == n_intervals - 1:
+            above_at_end = indices[above[:, -1]]
+
+        # 相鄰取樣點的門檻穿越 (任一端為 NaN 的區間略過)
+        valid = ~np.isnan(alt[:, :-1]) & ~np.isnan(alt[:, 1:])
+        rows, cols = np.nonzero((above[:, :-1] != above[:, 1:]) & valid)
+        crossing_parts.append((indices[rows], offsets[cols], offsets[cols + 1], ~above[rows, cols]))
+
+        # 門檻以下的局部最大值：過境可能短暫發生在兩個取樣點之間
+        padded = np.pad(alt, ((0, 0), (1, 1)), constant_values=-np.inf)
+        center = padded[:, 1:-1]
+        is_peak = (center >= padded[:, :-2]) & (center >= padded[:, 2:]) & ~above
+        is_peak &= center > min_elevation - GRAZING_MARGIN_DEG
+        # 鄰近取樣點已高於門檻時，該過境已由穿越點偵測到
+        neighbor_above = np.pad(above, ((0, 0), (1, 1)), constant_values=False)
+        is_peak &= ~neighbor_above[:, :-2] & ~neighbor_above[:, 2:]
+        rows, cols = np.nonzero(is_peak)
+        grazing_parts.append((indices[rows],
+                              np.maximum(offsets[cols] - sample_seconds, 0.0),
+                              np.minimum(offsets[cols] + sample_seconds, span)))
+
+    evaluator = _PairEvaluator(satellite_array, observer, ts, start)
+    events = []  # (衛星, 時間, 是否升起)
+
+    if crossing_parts:
+        sat_idx = np.concatenate([part[0] for part in crossing_parts])
+        low = np.concatenate([part[1] for part in crossing_parts])
+        high = np.concatenate([part[2] for part in crossing_parts])
+        rising = np.concatenate([part[3] for part in crossing_parts])
+        roots = _bisect_crossings(evaluator, sat_idx, low, high, rising, min_elevation, tolerance_seconds)
+        events.append((sat_idx, roots, rising))
+
+    if grazing_parts:
+        sat_idx = np.concatenate([part[0] for part in grazing_parts])
+        low = np.concatenate([part[1] for part in grazing_parts])
+        high = np.concatenate([part[2] for part in grazing_parts])
+        # 相鄰區間共用的端點可能重複偵測同一個峰值
+        if len(sat_idx):
+            _, unique_rows = np.unique(np.stack([sat_idx, np.round(low, 6)]), axis=1, return_index=True)
+            sat_idx, low, high = sat_idx[unique_rows], low[unique_rows], high[unique_rows]
+        peak_time, peak_alt = _golden_maximum(evaluator, sat_idx, low, high, tolerance_seconds)
+        # 只保留完整落在搜尋區間內的過境；端點已高於門檻者屬於穿越點偵測的範圍
+        graze = ((peak_alt > min_elevation)
+                 & (evaluator.elevation(sat_idx, low) <= min_elevation)
+                 & (evaluator.elevation(sat_idx, high) <= min_elevation))
+        sat_idx, low, high, peak_time = sat_idx[graze], low[graze], high[graze], peak_time[graze]
+        rise = _bisect_crossings(evaluator, sat_idx, low, peak_time,
+                                 np.ones(len(sat_idx), dtype=bool), min_elevation, tolerance_seconds)
+        fall = _bisect_crossings(evaluator, sat_idx, peak_time, high,
+                                 np.zeros(len(sat_idx), dtype=bool), min_elevation, tolerance_seconds)
+        events.append((sat_idx, rise, np.ones(len(sat_idx), dtype=bool)))
+        events.append((sat_idx, fall, np.zeros(len(sat_idx), dtype=bool)))
+
+    # 時間窗起點已可見視為在起點升起，終點仍可見視為在終點落下
+    events.append((above_at_start, np.zeros(len(above_at_start)), np.ones(len(above_at_start), dtype=bool)))
+    events.append((above_at_end, np.full(len(above_at_end), span), np.zeros(len(above_at_end), dtype=bool)))
+
+    sat_idx = np.concatenate([e[0] for e in events]).astype(np.int64)
+    times = np.concatenate([e[1] for e in events])
+    rising = np.concatenate([e[2] for e in events])
+
+    # 依衛星、時間排序後，依序配對升起與落下
+    order = np.lexsort((~rising, times, sat_idx))
+    sat_idx, times, rising = sat_idx[order], times[order], rising[order]
+    aos_list, los_list, pass_sat = [], [], []
+    open_rise = {}
+    for satellite_index, event_time, is_rise in zip(sat_idx.tolist(), times.tolist(), rising.tolist()):
+        if is_rise:
+            open_rise.setdefault(satellite_index, event_time)
+        elif satellite_index in open_rise:
+            pass_sat.append(satellite_index)
+            aos_list.append(open_rise.pop(satellite_index))
+            los_list.append(event_time)
+
+    if not pass_sat:
+        return pd.DataFrame(columns=PASS_COLUMNS)
+
+    pass_sat = np.array(pass_sat, dtype=np.int64)
+    aos = np.array(aos_list)
+    los = np.array(los_list)
+    culmination, max_elevation = _golden_maximum(evaluator, pass_sat, aos, los, tolerance_seconds)
+
+    base = pd.Timestamp(start)
+    names = np.array(satellite_array.names, dtype=object)
+    passes = pd.DataFrame({
+        'satellite_index': pass_sat,
+        'satellite': names[pass_sat],
+        'aos': base + pd.to_timedelta(aos, unit='s'),
+        'culmination': base + pd.to_timedelta(culmination, unit='s'),
+        'los': base + pd.to_timedelta(los, unit='s'),
+        'max_elevation': max_elevation,
+        'duration_seconds': los - aos,
+    })
+    return passes.sort_values(['aos', 'satellite_index'], kind='stable').reset_index(drop=True)
+
+
+def coverage_from_passes(satellites, observer, ts, passes, time_grid, min_elevation=DEFAULT_MIN_ELEVATION,
+                         tolerance_seconds=DEFAULT_TOLERANCE_SECONDS):
+    """由過境表推得任意解析度的覆蓋結果
+
+    只計算每個時間點落在過境區間內的衛星仰角，其餘衛星必定不可見。
+
+    Returns:
+        與 propagation.propagate_coverage 相同格式的 dict
+    """
+    satellite_array = _as_satellite_array(satellites)
+    n_times = len(time_grid)
+    offsets = time_grid.offsets_seconds
+    base = pd.Timestamp(time_grid.start)
+
+    result = _empty_coverage(n_times)
+    if len(passes) == 0 or n_times == 0:
+        return result
+
+    # 過境區間向外放寬一個求解精度，再以實際仰角判斷可見與否
+    aos = (pd.to_datetime(passes['aos']) - base).dt.total_seconds().to_numpy() - tolerance_seconds
+    los = (pd.to_datetime(passes['los']) - base).dt.total_seconds().to_numpy() + tolerance_seconds
+    first = np.searchsorted(offsets, aos, side='left')
+    last = np.searchsorted(offsets, los, side='right')
+    lengths = np.maximum(last - first, 0)
+    pair_time = np.concatenate([np.arange(a, b) for a, b in zip(first, last)]) if lengths.sum() else np.empty(0, int)
+    pair_sat = np.repeat(passes['satellite_index'].to_numpy(dtype=np.int64), lengths)
+    if len(pair_time) == 0:
+        return result
+
+    t = TimeGrid(time_grid.start, offsets[pair_time]).to_skyfield(ts)
+    alt, az, distance = topocentric_altaz(satellite_array.itrs_positions_at_km(pair_sat, t), observer)
+    np.add.at(result['evaluated_count'], pair_time, 1)
+
+    visible = alt > min_elevation
+    pair_time, pair_sat = pair_time[visible], pair_sat[visible]
+    alt, az, distance = alt[visible], az[visible], distance[visible]
+    np.add.at(result['visible_count'], pair_time, 1)
+
+    # 每個時間點取仰角最高者，同仰角時取衛星索引較小者 (與逐顆掃描的結果一致)
+    order = np.lexsort((pair_sat, -alt, pair_time))
+    sorted_time = pair_time[order]
+    rows = order[np.r_[True, sorted_time[1:] != sorted_time[:-1]]]
+    result['best_index'][pair_time[rows]] = pair_sat[rows]
+    result['best_alt'][pair_time[rows]] = alt[rows]
+    result['best_az'][pair_time[rows]] = az[rows]
+    result['best_distance'][pair_time[rows]] = distance[rows]
+    return result
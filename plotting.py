@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+繪圖後端 (matplotlib、plotly) 與中文字體設定
+
+只在第一次繪圖時由 satellite_analysis 載入；只做計算的呼叫端 (Shiny 的背景工作、
+命令列的分析模式) 不需要付出載入 matplotlib 與 plotly 的成本。
+"""
+
+import logging
+# Suppress Matplotlib font warnings early
+logging.getLogger('matplotlib.font_manager').setLevel(logging.ERROR)
+import matplotlib.pyplot as plt
+import matplotlib.font_manager as fm
+import plotly.express as px
+import plotly.graph_objects as go
+
+# 設定中文字體，嘗試使用文泉驛微米黑，如果沒有，matplotlib會回退到預設字體
+# 指定中文字體路徑
+chinese_font_path = '/usr/share/fonts/truetype/wqy/wqy-microhei.ttc'  # 文泉驛微米黑字體路徑
+chinese_font_prop = fm.FontProperties(fname=chinese_font_path)
+
+# 更新字體設定
+plt.rcParams['font.sans-serif'] = ['Noto Sans CJK TC', 'WenQuanYi Micro Hei', 'WenQuanYi Zen Hei']
+plt.rcParams['axes.unicode_minus'] = False  # 解決負號顯示問題
+
+# 定義中文文字繪製函數，將在需要中文文字的地方使用
+def plot_with_chinese_font(title, xlabel, ylabel):
+    plt.title(title, fontproperties=chinese_font_prop)
+    plt.xlabel(xlabel, fontproperties=chinese_font_prop)
+    plt.ylabel(ylabel, fontproperties=chinese_font_prop)
@@ -0,0 +1,721 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+向量化衛星傳播引擎
+
+以 sgp4 的 SatrecArray 一次傳播所有衛星與整段時間陣列，
+再用 NumPy 在地固座標系(ITRS)中完成站心轉換，取代逐顆、逐時間點呼叫
+skyfield `(sat - observer).at(t).altaz()` 的純量迴圈。
+"""
+
+import os
+import re
+import itertools
+import functools
+import concurrent.futures
+import numpy as np
+from sgp4.api import SatrecArray
+from skyfield.api import load, wgs84
+from skyfield.sgp4lib import theta_GMST1982
+from skyfield.constants import DAY_S
+from catalog import load_catalog
+
+# 預設最小可見仰角(度)
+DEFAULT_MIN_ELEVATION = 25.0
+# 每批傳播的時間點數量，用於限制 (衛星數 × 時間點數 × 3) 陣列的記憶體用量
+DEFAULT_TIME_CHUNK = 64
+# 粗篩階段的預設取樣間隔(秒)
+DEFAULT_COARSE_STEP_SECONDS = 60.0
+# 粗篩的仰角保守餘量(度)：涵蓋大地垂線與地心垂線的差異(台灣約 0.17°)及取樣間的高度變化
+PRUNING_ELEVATION_MARGIN_DEG = 0.5
+# 粗篩的角速度保守倍率：涵蓋相鄰取樣點之間速度的變化
+PRUNING_RATE_MARGIN = 1.05
+# 地球自轉角速度(rad/s)
+EARTH_ROTATION_RAD_S = 7.2921150e-5
+# 平行模式下每個行程分配的時間分片數，分片較多可平衡各行程的負載
+SHARDS_PER_WORKER = 4
+
+# 記憶體預算模式下每個 衛星 × 時間點 的工作緩衝區大小(位元組)：sgp4 輸出的錯誤碼(1)、
+# 位置與速度(float64，48)、站心座標與仰角/方位角/距離(float32，24)，以及彙整時的暫存陣列(約 12)
+BUDGET_BYTES_PER_CELL = 85
+# 記憶體預算模式下每批時間點數的上下限
+MIN_BUDGET_TIME_CHUNK = 8
+MAX_BUDGET_TIME_CHUNK = 1024
+
+# 子行程內的衛星資料，由 _init_coverage_worker 在每個行程建立一次，避免每個任務重新序列化
+_worker_state = {}
+
+
+@functools.lru_cache(maxsize=None)
+def shared_timescale():
+    """行程內共用的 skyfield 時間尺度 (閏秒與 ΔT 資料只載入一次)"""
+    return load.timescale()
+
+
+def _teme_to_itrs(r_teme, jd_ut1, fraction_ut1):
+    """TEME -> ITRS：繞 z 軸旋轉 -GMST(1982)，極移視為零(與 skyfield 預設一致)
+
+    r_teme 的最後一軸為 xyz，倒數第二軸(或唯一的配對軸)對應 jd_ut1 的時間點。
+    """
+    theta, _ = theta_GMST1982(jd_ut1, fraction_ut1)
+    cos_theta = np.cos(theta)
+    sin_theta = np.sin(theta)
+    r_itrs = np.empty_like(r_teme)
+    r_itrs[..., 0] = cos_theta * r_teme[..., 0] + sin_theta * r_teme[..., 1]
+    r_itrs[..., 1] = -sin_theta * r_teme[..., 0] + cos_theta * r_teme[..., 1]
+    r_itrs[..., 2] = r_teme[..., 2]
+    return r_itrs
+
+
+class SatelliteArray:
+    """將一組 EarthSatellite 打包為可向量化傳播的衛星陣列"""
+
+    def __init__(self, satellites):
+        satellites = list(satellites)
+        self.names = [sat.name for sat in satellites]
+        self._satrecs = [sat.model for sat in satellites]
+        self._satrec_array = SatrecArray(self._satrecs)
+
+    @classmethod
+    def _from_satrecs(cls, satrecs, names):
+        satellite_array = cls.__new__(cls)
+        satellite_array.names = list(names)
+        satellite_array._satrecs = list(satrecs)
+        satellite_array._satrec_array = SatrecArray(satellite_array._satrecs)
+        return satellite_array
+
+    @classmethod
+    def from_catalog(cls, catalog):
+        """直接由二進位衛星目錄建立，不必先建立 EarthSatellite 物件"""
+        return cls._from_satrecs(catalog.satrecs(), catalog.names)
+
+    def subset(self, indices):
+        """取出部分衛星組成新的衛星陣列 (順序與 indices 相同)"""
+        return SatelliteArray._from_satrecs([self._satrecs[i] for i in indices],
+                                            [self.names[i] for i in indices])
+
+    def __len__(self):
+        return len(self.names)
+
+    def itrs_state_km(self, t):
+        """計算所有衛星在時間陣列 t 的地固座標(ITRS)位置與慣性速度大小
+
+        Args:
+            t: skyfield 時間陣列
+
+        Returns:
+            (位置, 速率)：位置形狀為 (衛星數, 時間點數, 3)(公里)，
+            速率為 TEME 慣性速度大小 (衛星數, 時間點數)(公里/秒)，傳播失敗處為 NaN
+        """
+        jd = np.atleast_1d(t.whole)
+        # 與 skyfield 相同，將 TLE 紀元視為 UTC
+        fraction = np.atleast_1d(t.tai_fraction - t._leap_seconds() / DAY_S)
+        error, r_teme, v_teme = self._satrec_array.sgp4(jd, fraction)
+        r_teme[error != 0] = np.nan
+        speed = np.linalg.norm(v_teme, axis=-1)
+        speed[error != 0] = np.nan
+
+        return _teme_to_itrs(r_teme, jd, np.atleast_1d(t.ut1_fraction)), speed
+
+    def sgp4_into(self, jd, fraction, error, r_teme, v_teme):
+        """以 sgp4 計算 TEME 位置與速度，寫入呼叫端提供的緩衝區 (形狀為 (衛星數, 時間點數[, 3]))"""
+        jd = np.ascontiguousarray(jd, dtype=np.float64)
+        fraction = np.ascontiguousarray(fraction, dtype=np.float64)
+        if hasattr(self._satrec_array, '_sgp4'):
+            # C 擴充的 SatrecArray 可直接寫入既有的陣列，不必每批重新配置
+            self._satrec_array._sgp4(jd, fraction, error, r_teme, v_teme)
+        else:
+            error[...], r_teme[...], v_teme[...] = self._satrec_array.sgp4(jd, fraction)
+
+    def itrs_positions_km(self, t):
+        """計算所有衛星在時間陣列 t 的地固座標(ITRS)位置，形狀為 (衛星數, 時間點數, 3)(公里)"""
+        return self.itrs_state_km(t)[0]
+
+    def itrs_positions_at_km(self, indices, t):
+        """計算 衛星 indices[i] 在時間 t[i] 的地固座標位置 (逐對計算，而非 衛星 × 時間 的外積)
+
+        Args:
+            indices: 衛星索引陣列
+            t: 與 indices 等長的 skyfield 時間陣列
+
+        Returns:
+            形狀為 (配對數, 3) 的位置陣列(公里)，傳播失敗處為 NaN
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        jd = np.atleast_1d(t.whole)
+        fraction = np.atleast_1d(t.tai_fraction - t._leap_seconds() / DAY_S)
+        r_teme = np.full((len(indices), 3), np.nan)
+
+        # 依衛星分組，每顆衛星以一次 sgp4_array 計算其所有時間點
+        order = np.argsort(indices, kind='stable')
+        unique, starts = np.unique(indices[order], return_index=True)
+        stops = np.append(starts[1:], len(order))
+        for satellite_index, start, stop in zip(unique.tolist(), starts, stops):
+            rows = order[start:stop]
+            error, r, _ = self._satrecs[satellite_index].sgp4_array(jd[rows], fraction[rows])
+            r[error != 0] = np.nan
+            r_teme[rows] = r
+
+        return _teme_to_itrs(r_teme, jd, np.atleast_1d(t.ut1_fraction))
+
+
+def enu_rotation(latitude_deg, longitude_deg):
+    """回傳將 ITRS 向量轉為站心 東/北/天頂 分量的 3x3 旋轉矩陣"""
+    lat = np.radians(latitude_deg)
+    lon = np.radians(longitude_deg)
+    sin_lat, cos_lat = np.sin(lat), np.cos(lat)
+    sin_lon, cos_lon = np.sin(lon), np.cos(lon)
+    return np.array([
+        [-sin_lon, cos_lon, 0.0],
+        [-sin_lat * cos_lon, -sin_lat * sin_lon, cos_lat],
+        [cos_lat * cos_lon, cos_lat * sin_lon, sin_lat],
+    ])
+
+
+def topocentric_altaz(r_itrs_km, observer):
+    """將衛星地固位置轉換為觀察者的仰角、方位角與距離
+
+    Args:
+        r_itrs_km: 形狀為 (..., 3) 的衛星 ITRS 位置(公里)
+        observer: skyfield 的 wgs84 地理位置
+
+    Returns:
+        (仰角(度), 方位角(度), 距離(公里)) 三個陣列
+    """
+    rotation = enu_rotation(observer.latitude.degrees, observer.longitude.degrees)
+    delta = r_itrs_km - observer.itrs_xyz.km
+    enu = delta @ rotation.T
+    east, north, up = enu[..., 0], enu[..., 1], enu[..., 2]
+    horizontal = np.hypot(east, north)
+    alt = np.degrees(np.arctan2(up, horizontal))
+    az = np.degrees(np.arctan2(east, north)) % 360.0
+    distance = np.sqrt(horizontal * horizontal + up * up)
+    return alt, az, distance
+
+
+def parse_memory_size(value):
+    """將 '2G'、'512M'、'1.5GB' 或位元組數轉換為位元組數 (None 表示不限制)"""
+    if value is None or isinstance(value, (int, np.integer)):
+        return None if value is None else int(value)
+    if isinstance(value, float):
+        return int(value)
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([KMGT]?)(?:I?B)?\s*', str(value).upper())
+    if match is None:
+        raise ValueError(f"無法解析記憶體大小: {value}")
+    number, unit = match.groups()
+    return int(float(number) * 1024 ** ' KMGT'.index(unit or ' '))
+
+
+def plan_chunks(n_satellites, n_times, max_memory):
+    """依記憶體預算決定每批的時間點數與每個衛星區塊的衛星數
+
+    優先讓所有衛星在同一個區塊 (時間批次盡量大)；預算不足以容納所有衛星 × MIN_BUDGET_TIME_CHUNK 時，
+    固定時間批次並將衛星切分為多個區塊。
+
+    Returns:
+        (time_chunk, satellite_block)
+    """
+    cells = int(max_memory) // BUDGET_BYTES_PER_CELL
+    if cells < 1:
+        raise ValueError(f"記憶體預算過小: {max_memory} 位元組")
+    n_satellites = max(1, int(n_satellites))
+    n_times = max(1, int(n_times))
+    min_chunk = min(MIN_BUDGET_TIME_CHUNK, n_times)
+    if cells >= n_satellites * min_chunk:
+        return min(cells // n_satellites, MAX_BUDGET_TIME_CHUNK, n_times), n_satellites
+    return min_chunk, max(1, cells // min_chunk)
+
+
+class PropagationWorkspace:
+    """記憶體預算模式的傳播工作區
+
+    依預算決定 衛星區塊 × 時間批次 的大小，sgp4 輸出與站心座標的緩衝區只配置一次並在各批次間重複使用；
+    站心座標、仰角、方位角與距離以 float32 保存 (與 float64 計算的仰角差異約 1e-5 度)。
+    """
+
+    def __init__(self, observer, n_satellites, n_times, max_memory):
+        """
+        Args:
+            observer: skyfield 的 wgs84 地理位置
+            n_satellites (int): 最多同時計算的衛星數
+            n_times (int): 整段分析的時間點數
+            max_memory: 記憶體預算 (位元組數或 '2G' 之類的字串)
+        """
+        self.max_memory = parse_memory_size(max_memory)
+        self.time_chunk, self.satellite_block = plan_chunks(n_satellites, n_times, self.max_memory)
+        cells = self.time_chunk * min(self.satellite_block, max(1, int(n_satellites)))
+        self._error = np.empty(cells, dtype=np.uint8)
+        self._r = np.empty(cells * 3, dtype=np.float64)
+        self._v = np.empty(cells * 3, dtype=np.float64)
+        self._enu = np.empty(cells * 3, dtype=np.float32)
+        self._alt = np.empty(cells, dtype=np.float32)
+        self._az = np.empty(cells, dtype=np.float32)
+        self._distance = np.empty(cells, dtype=np.float32)
+        self._rotation = enu_rotation(observer.latitude.degrees, observer.longitude.degrees)
+        self._observer_itrs = observer.itrs_xyz.km
+        self._blocks = (None, None)
+
+    def coarse_time_chunk(self, n_satellites):
+        """粗篩 (float64 計算，每格約為精算的 3 倍) 在預算內每批可用的粗網格時間點數"""
+        return max(2, min(MAX_BUDGET_TIME_CHUNK,
+                          self.max_memory // (3 * BUDGET_BYTES_PER_CELL * max(1, int(n_satellites)))))
+
+    def _satellite_blocks(self, satellite_array):
+        """將衛星陣列切分為不超過 satellite_block 顆的區塊 (同一個衛星陣列只切分一次)"""
+        if len(satellite_array) <= self.satellite_block:
+            return [(0, satellite_array)]
+        if self._blocks[0] is not satellite_array:
+            blocks = [(lo, satellite_array.subset(range(lo, min(lo + self.satellite_block, len(satellite_array)))))
+                      for lo in range(0, len(satellite_array), self.satellite_block)]
+            self._blocks = (satellite_array, blocks)
+        return self._blocks[1]
+
+    def iter_blocks(self, satellite_array, indices, t):
+        """逐個衛星區塊產生 (衛星索引, 仰角, 方位角, 距離)
+
+        回傳的陣列為工作區緩衝區的視圖，下一個區塊會覆寫其內容，呼叫端需在取下一個區塊前用完。
+        """
+        for lo, block in self._satellite_blocks(satellite_array):
+            yield (indices[lo:lo + len(block)],) + self.altaz(block, t)
+
+    def altaz(self, satellite_array, t):
+        """計算一個衛星區塊在時間陣列 t 的仰角、方位角與距離 (float32，形狀為 (衛星數, 時間點數))"""
+        n, m = len(satellite_array), len(t)
+        error = self._error[:n * m].reshape(n, m)
+        r = self._r[:n * m * 3].reshape(n, m, 3)
+        v = self._v[:n * m * 3].reshape(n, m, 3)
+        jd = np.atleast_1d(t.whole)
+        # 與 itrs_state_km 相同，將 TLE 紀元視為 UTC
+        satellite_array.sgp4_into(jd, np.atleast_1d(t.tai_fraction - t._leap_seconds() / DAY_S), error, r, v)
+        r[error != 0] = np.nan
+
+        # 觀察者位置轉到 TEME 後以 float64 相減，再以 (ENU ← ITRS ← TEME) 的合成旋轉寫入 float32 緩衝區
+        theta, _ = theta_GMST1982(jd, np.atleast_1d(t.ut1_fraction))
+        cos_theta, sin_theta = np.cos(theta), np.sin(theta)
+        teme_to_itrs = np.zeros((m, 3, 3))
+        teme_to_itrs[:, 0, 0] = cos_theta
+        teme_to_itrs[:, 0, 1] = sin_theta
+        teme_to_itrs[:, 1, 0] = -sin_theta
+        teme_to_itrs[:, 1, 1] = cos_theta
+        teme_to_itrs[:, 2, 2] = 1.0
+        r -= np.einsum('tji,j->ti', teme_to_itrs, self._observer_itrs)
+        enu = self._enu[:n * m * 3].reshape(n, m, 3)
+        np.einsum('tij,stj->sti', self._rotation @ teme_to_itrs, r, out=enu, casting='same_kind')
+
+        east, north, up = enu[..., 0], enu[..., 1], enu[..., 2]
+        alt = self._alt[:n * m].reshape(n, m)
+        az = self._az[:n * m].reshape(n, m)
+        distance = self._distance[:n * m].reshape(n, m)
+        horizontal = np.hypot(east, north, out=distance)
+        np.arctan2(up, horizontal, out=alt)
+        np.degrees(alt, out=alt)
+        np.hypot(horizontal, up, out=distance)
+        np.arctan2(east, north, out=az)
+        np.degrees(az, out=az)
+        np.mod(az, 360.0, out=az)
+        return alt, az, distance
+
+
+def coarse_candidates(satellite_array, observer, coarse_t, min_elevation=DEFAULT_MIN_ELEVATION,
+                      time_chunk=DEFAULT_TIME_CHUNK):
+    """粗篩：找出每個粗網格區間內「可能」高於仰角門檻的衛星
+
+    以衛星與觀察者的地心夾角 ψ 對照仰角門檻對應的覆蓋半角 λ(r)，
+    並以衛星方向的最大角速度 ω (|v|/|r| + 地球自轉) 推得區間內 ψ 的下界
+    (ψ_k + ψ_{k+1} - ωΔt) / 2。下界大於 λ 的衛星在該區間內必定不可見，可安全略過。
+
+    Args:
+        satellite_array (SatelliteArray): 衛星陣列
+        observer: skyfield 的 wgs84 地理位置
+        coarse_t: 粗網格的 skyfield 時間陣列 (至少兩個時間點，等間隔)
+        min_elevation (float): 最小可見仰角(度)
+        time_chunk (int): 每批傳播的粗網格時間點數量
+
+    Returns:
+        形狀為 (衛星數, 區間數) 的布林陣列，True 表示該區間內需精算
+    """
+    n_coarse = len(coarse_t)
+    step_seconds = (coarse_t[1].tt - coarse_t[0].tt) * DAY_S
+    observer_xyz = observer.itrs_xyz.km
+    observer_radius = np.linalg.norm(observer_xyz)
+    observer_unit = observer_xyz / observer_radius
+    mask = np.radians(min_elevation - PRUNING_ELEVATION_MARGIN_DEG)
+
+    candidates = np.empty((len(satellite_array), n_coarse - 1), dtype=bool)
+    time_chunk = max(2, int(time_chunk))
+    # 相鄰批次重疊一個時間點，使每個區間的兩端點位於同一批
+    for start in range(0, n_coarse - 1, time_chunk - 1):
+        stop = min(start + time_chunk, n_coarse)
+        r_itrs, speed = satellite_array.itrs_state_km(coarse_t[start:stop])
+        radius = np.linalg.norm(r_itrs, axis=-1)
+        psi = np.arccos(np.clip((r_itrs @ observer_unit) / radius, -1.0, 1.0))
+        rate = speed / radius * PRUNING_RATE_MARGIN + EARTH_ROTATION_RAD_S
+
+        # 區間內的高度與角速度取兩端點的較大值
+        radius_max = np.fmax(radius[:, :-1], radius[:, 1:])
+        rate_max = np.fmax(rate[:, :-1], rate[:, 1:])
+        footprint = np.arccos(np.clip(observer_radius * np.cos(mask) / radius_max, -1.0, 1.0)) - mask
+        lower_bound = (psi[:, :-1] + psi[:, 1:] - rate_max * step_seconds) / 2.0
+        # 傳播失敗(NaN)的區間一律保留，交給精算階段判斷
+        candidates[:, start:stop - 1] = ~(lower_bound > footprint)
+    return candidates
+
+
+def _iter_altaz(satellite_array, observer, t, min_elevation, time_chunk, coarse_step_seconds, first_index=0,
+                workspace=None):
+    """逐批產生 (start, stop, 衛星索引, 仰角, 方位角, 距離)
+
+    未啟用粗篩時每批計算所有衛星；啟用時先以粗網格篩選，
+    每個粗網格區間只精算可能可見的衛星，衛星索引為遞增的全域索引。
+    first_index 之前的時間點略過 (粗網格仍涵蓋整段時間，篩選結果與完整執行相同)。
+    指定 workspace (PropagationWorkspace) 時依其預算決定批次大小，同一批時間點可能依衛星區塊
+    連續產生多組 (衛星索引遞增)，仰角等陣列為工作區緩衝區的視圖。
+    """
+    n_times = len(t)
+    n_satellites = len(satellite_array)
+    if workspace is not None:
+        time_chunk = workspace.time_chunk
+    time_chunk = max(1, int(time_chunk))
+
+    def altaz(subset, indices, t_chunk):
+        if workspace is not None:
+            yield from workspace.iter_blocks(subset, indices, t_chunk)
+        else:
+            yield (indices,) + topocentric_altaz(subset.itrs_positions_km(t_chunk), observer)
+
+    if not coarse_step_seconds or n_times == 0:
+        all_indices = np.arange(n_satellites)
+        for start in range(first_index, n_times, time_chunk):
+            stop = min(start + time_chunk, n_times)
+            for indices, alt, az, distance in altaz(satellite_array, all_indices, t[start:stop]):
+                yield start, stop, indices, alt, az, distance
+        return
+
+    # 建立涵蓋整段時間的粗網格
+    offsets = (t.tt - t[0].tt) * DAY_S
+    n_intervals = max(1, int(np.ceil(offsets[-1] / coarse_step_seconds)))
+    coarse_t = t.ts.tt_jd(t[0].whole, t[0].tt_fraction + np.arange(n_intervals + 1) * coarse_step_seconds / DAY_S)
+    coarse_chunk = time_chunk if workspace is None else workspace.coarse_time_chunk(n_satellites)
+    candidates = coarse_candidates(satellite_array, observer, coarse_t, min_elevation, coarse_chunk)
+
+    # 依粗網格區間分組精算；時間需為遞增排列
+    interval_index = np.clip((offsets // coarse_step_seconds).astype(int), 0, n_intervals - 1)
+    boundaries = np.searchsorted(interval_index, np.arange(n_intervals + 1))
+    for k in range(n_intervals):
+        if boundaries[k + 1] <= first_index:
+            continue
+        indices = np.nonzero(candidates[:, k])[0]
+        subset = satellite_array.subset(indices) if len(indices) else None
+        for start in range(max(boundaries[k], first_index), boundaries[k + 1], time_chunk):
+            stop = min(start + time_chunk, boundaries[k + 1])
+            if subset is None:
+                empty = np.empty((0, stop - start))
+                yield start, stop, indices, empty, empty, empty
+                continue
+            for block_indices, alt, az, distance in altaz(subset, indices, t[start:stop]):
+                yield start, stop, block_indices, alt, az, distance
+
+
+def _group_time_chunks(chunks):
+    """將 _iter_altaz 的輸出依時間批次分組 (記憶體預算模式下同一批次可能有多個衛星區塊)
+
+    Yields:
+        (start, stop, 區塊迭代器)，每個區塊為 (衛星索引, 仰角, 方位角, 距離)
+    """
+    for (start, stop), blocks in itertools.groupby(chunks, key=lambda chunk: (chunk[0], chunk[1])):
+        yield start, stop, (block[2:] for block in blocks)
+
+
+def propagate_coverage(satellite_array, observer, t, min_elevation=DEFAULT_MIN_ELEVATION,
+                       time_chunk=DEFAULT_TIME_CHUNK, progress=None, coarse_step_seconds=None, max_memory=None):
+    """計算每個時間點的可見衛星數與最佳(仰角最高)衛星
+
+    Args:
+        satellite_array (SatelliteArray): 要傳播的衛星陣列
+        observer: skyfield 的 wgs84 地理位置
+        t: skyfield 時間陣列 (遞增)
+        min_elevation (float): 最小可見仰角(度)
+        time_chunk (int): 每批傳播的時間點數量
+        progress: 可選的 tqdm 類進度條，每批完成後以時間點數呼叫 update()
+        coarse_step_seconds (float): 粗篩網格間隔(秒)，None 表示不篩選、逐一精算所有衛星
+        max_memory: 傳播工作緩衝區的記憶體預算 (位元組數或 '2G' 之類的字串)，指定時依預算自動決定
+            時間批次與衛星區塊的大小並以 float32 計算 (忽略 time_chunk)；None 表示使用 time_chunk
+
+    Returns:
+        dict，包含 visible_count、best_index(無可見衛星時為 -1)、
+        best_alt、best_az、best_distance(無可見衛星時為 NaN)，
+        以及 evaluated_count (每個時間點實際精算的衛星數) 等長度為時間點數的陣列
+    """
+    result = _empty_coverage(len(t))
+    for start, stop, chunk in iter_coverage(satellite_array, observer, t, min_elevation, time_chunk,
+                                            progress, coarse_step_seconds, max_memory=max_memory):
+        for key, values in chunk.items():
+            result[key][start:stop] = values
+    return result
+
+
+def iter_coverage(satellite_array, observer, t, min_elevation=DEFAULT_MIN_ELEVATION,
+                  time_chunk=DEFAULT_TIME_CHUNK, progress=None, coarse_step_seconds=None, first_index=0,
+                  max_memory=None):
+    """逐批產生覆蓋結果，呼叫端可邊計算邊寫出，不必保留整段時間的結果
+
+    參數與 propagate_coverage 相同；first_index 為開始產生的時間索引 (由檢查點繼續時使用)。
+
+    Yields:
+        (start, stop, coverage)，coverage 為 propagate_coverage 格式、長度為 stop - start 的 dict，
+        依時間順序產生
+    """
+    if len(satellite_array) == 0:
+        if len(t) > first_index:
+            if progress is not None:
+                progress.update(len(t) - first_index)
+            yield first_index, len(t), _empty_coverage(len(t) - first_index)
+        return
+    workspace = None if max_memory is None else PropagationWorkspace(observer, len(satellite_array), len(t),
+                                                                     max_memory)
+    chunks = _iter_altaz(satellite_array, observer, t, min_elevation, time_chunk, coarse_step_seconds,
+                         first_index, workspace)
+    for start, stop, blocks in _group_time_chunks(chunks):
+        chunk = _empty_coverage(stop - start)
+        for indices, alt, az, distance in blocks:
+            _reduce_coverage(chunk, 0, stop - start, indices, alt, az, distance, min_elevation, accumulate=True)
+        if progress is not None:
+            progress.update(stop - start)
+        yield start, stop, chunk
+
+
+def _empty_coverage(n_times):
+    """建立 propagate_coverage 格式的空白結果"""
+    return {
+        'visible_count': np.zeros(n_times, dtype=np.int64),
+        'evaluated_count': np.zeros(n_times, dtype=np.int64),
+        'best_index': np.full(n_times, -1, dtype=np.int64),
+        'best_alt': np.full(n_times, np.nan),
+        'best_az': np.full(n_times, np.nan),
+        'best_distance': np.full(n_times, np.nan),
+    }
+
+
+def _reduce_coverage(result, start, stop, indices, alt, az, distance, min_elevation, accumulate=False):
+    """將一批 (衛星, 時間點) 的仰角結果彙整為可見數與最佳衛星，寫入 result 的 [start, stop) 區段
+
+    accumulate=True 時與該區段既有的結果合併 (依衛星索引遞增的順序傳入各衛星區塊，
+    仰角相同時保留先前區塊的衛星，與一次彙整的 argmax 結果相同)。
+    """
+    if accumulate:
+        block = _empty_coverage(stop - start)
+        _reduce_coverage(block, 0, stop - start, indices, alt, az, distance, min_elevation)
+        target = {key: values[start:stop] for key, values in result.items()}
+        target['evaluated_count'] += block['evaluated_count']
+        target['visible_count'] += block['visible_count']
+        better = (block['best_index'] >= 0) & ((target['best_index'] < 0) | (block['best_alt'] > target['best_alt']))
+        for key in ('best_index', 'best_alt', 'best_az', 'best_distance'):
+            target[key][better] = block[key][better]
+        return
+    result['evaluated_count'][start:stop] = len(indices)
+    if not len(indices):
+        return
+    # NaN(傳播失敗)的比較結果為 False，自然被排除
+    visible = alt > min_elevation
+    masked_alt = np.where(visible, alt, -np.inf)
+    # argmax 取第一個最大值，與逐顆掃描時 max() 的結果一致
+    chunk_best = np.argmax(masked_alt, axis=0)
+    columns = np.arange(stop - start)
+    has_visible = visible.any(axis=0)
+
+    result['visible_count'][start:stop] = visible.sum(axis=0)
+    result['best_index'][start:stop] = np.where(has_visible, indices[chunk_best], -1)
+    result['best_alt'][start:stop] = np.where(has_visible, alt[chunk_best, columns], np.nan)
+    result['best_az'][start:stop] = np.where(has_visible, az[chunk_best, columns], np.nan)
+    result['best_distance'][start:stop] = np.where(has_visible, distance[chunk_best, columns], np.nan)
+
+
+def propagate_coverage_sites(satellite_array, observers, t, min_elevation=DEFAULT_MIN_ELEVATION,
+                             time_chunk=DEFAULT_TIME_CHUNK, progress=None):
+    """一次傳播，計算多個觀察者的覆蓋結果
+
+    衛星的地固位置與觀察者無關，每批時間點只傳播一次，
+    再分別旋轉到各觀察者的站心座標；每多一個觀察者只增加一次矩陣乘法的成本。
+
+    Args:
+        satellite_array (SatelliteArray): 要傳播的衛星陣列
+        observers: skyfield wgs84 地理位置的列表
+        t: skyfield 時間陣列 (遞增)
+        min_elevation (float): 最小可見仰角(度)
+        time_chunk (int): 每批傳播的時間點數量
+        progress: 可選的 tqdm 類進度條，每批完成後以時間點數呼叫 update()
+
+    Returns:
+        與 observers 順序相同、propagate_coverage 格式的 dict 列表
+    """
+    n_times = len(t)
+    results = [_empty_coverage(n_times) for _ in observers]
+    if len(satellite_array) == 0 or not observers:
+        return results
+
+    all_indices = np.arange(len(satellite_array))
+    time_chunk = max(1, int(time_chunk))
+    for start in range(0, n_times, time_chunk):
+        stop = min(start + time_chunk, n_times)
+        r_itrs = satellite_array.itrs_positions_km(t[start:stop])
+        for result, observer in zip(results, observers):
+            alt, az, distance = topocentric_altaz(r_itrs, observer)
+            _reduce_coverage(result, start, stop, all_indices, alt, az, distance, min_elevation)
+        if progress is not None:
+            progress.update(stop - start)
+    return results
+
+
+def pruning_stats(evaluated_count, n_satellites, n_times=None):
+    """由每個時間點的精算衛星數計算篩選統計
+
+    evaluated_count 也可以是已加總的精算數，此時需以 n_times 指定時間點數。
+    """
+    if n_times is None:
+        n_times = len(evaluated_count)
+    total = int(n_satellites) * int(n_times)
+    evaluated = int(np.sum(evaluated_count))
+    return {
+        'satellite_steps_total': total,
+        'satellite_steps_evaluated': evaluated,
+        'pruning_rate': float(1.0 - evaluated / total) if total else 0.0,
+    }
+
+
+def iter_visible(satellite_array, observer, t, min_elevation=DEFAULT_MIN_ELEVATION,
+                 time_chunk=DEFAULT_TIME_CHUNK, coarse_step_seconds=None, max_memory=None):
+    """逐批產生可見(仰角大於門檻)的 衛星 × 時間點 紀錄
+
+    max_memory 為傳播工作緩衝區的記憶體預算 (見 propagate_coverage)。
+
+    Yields:
+        (time_index, satellite_index, alt, az, distance) 陣列組，依時間、再依衛星順序排列；
+        time_index 為相對整個時間陣列的索引
+    """
+    if len(satellite_array) == 0:
+        return
+    workspace = None if max_memory is None else PropagationWorkspace(observer, len(satellite_array), len(t),
+                                                                     max_memory)
+    chunks = _iter_altaz(satellite_array, observer, t, min_elevation, time_chunk, coarse_step_seconds,
+                         workspace=workspace)
+    for start, stop, blocks in _group_time_chunks(chunks):
+        records = []
+        for indices, alt, az, distance in blocks:
+            # 轉置為 (時間, 衛星)，使 nonzero 的輸出依時間排序
+            time_index, row = np.nonzero((alt > min_elevation).T)
+            records.append((time_index + start, indices[row],
+                            alt[row, time_index], az[row, time_index], distance[row, time_index]))
+        if len(records) == 1:
+            yield records[0]
+            continue
+        # 多個衛星區塊時合併後重新依時間、再依衛星排序
+        time_index, satellite_index, alt, az, distance = (np.concatenate(column) for column in zip(*records))
+        order = np.lexsort((satellite_index, time_index))
+        yield time_index[order], satellite_index[order], alt[order], az[order], distance[order]
+
+
+def resolve_worker_count(cpu):
+    """將 --cpu 參數轉換為實際的行程數 (0 或負數表示使用所有可用CPU)"""
+    if cpu is None or cpu <= 0:
+        return os.cpu_count() or 1
+    return int(cpu)
+
+
+def _init_coverage_worker(tle_triples, observer_lat, observer_lon, observer_elevation_m,
+                          min_elevation, time_chunk, coarse_step_seconds, max_memory=None):
+    """子行程初始化：由衛星目錄建立衛星陣列與觀察者位置"""
+    tle_lines = [line for triple in tle_triples for line in triple]
+    _worker_state.update({
+        'ts': shared_timescale(),
+        'satellite_array': SatelliteArray.from_catalog(load_catalog(tle_lines)),
+        'observer': wgs84.latlon(observer_lat, observer_lon, elevation_m=observer_elevation_m),
+        'min_elevation': min_elevation,
+        'time_chunk': time_chunk,
+        'coarse_step_seconds': coarse_step_seconds,
+        'max_memory': max_memory,
+    })
+
+
+def _coverage_shard_worker(shard_index, time_grid):
+    """子行程任務：計算一個時間分片的覆蓋結果"""
+    state = _worker_state
+    t = time_grid.to_skyfield(state['ts'])
+    coverage = propagate_coverage(state['satellite_array'], state['observer'], t,
+                                  min_elevation=state['min_elevation'],
+                                  time_chunk=state['time_chunk'],
+                                  coarse_step_seconds=state['coarse_step_seconds'],
+                                  max_memory=state['max_memory'])
+    return shard_index, coverage
+
+
+def propagate_coverage_parallel(tle_triples, observer, time_grid, workers,
+                                min_elevation=DEFAULT_MIN_ELEVATION,
+                                time_chunk=DEFAULT_TIME_CHUNK, progress=None, coarse_step_seconds=None,
+                                max_memory=None):
+    """以多行程將時間序列分片後計算覆蓋結果
+
+    每個行程只在初始化時載入一次衛星資料，各分片依時間順序合併，
+    因此結果與單行程的 propagate_coverage 完全相同。
+
+    Args:
+        tle_triples: (名稱, 第一行, 第二行) 的 TLE 列表，順序決定 best_index
+        observer: skyfield 的 wgs84 地理位置
+        time_grid (TimeGrid): 分析時間網格
+        workers (int): 行程數量
+        min_elevation (float): 最小可見仰角(度)
+        time_chunk (int): 每批傳播的時間點數量
+        progress: 可選的 tqdm 類進度條
+        coarse_step_seconds (float): 粗篩網格間隔(秒)，None 表示不篩選
+        max_memory: 所有行程合計的傳播記憶體預算，平均分配給各行程 (見 propagate_coverage)
+
+    Returns:
+        與 propagate_coverage 相同格式的 dict
+    """
+    results = [coverage for _, _, coverage in
+               iter_coverage_parallel(tle_triples, observer, time_grid, workers, min_elevation,
+                                      time_chunk, progress, coarse_step_seconds, max_memory=max_memory)]
+    return {key: np.concatenate([coverage[key] for coverage in results]) for key in results[0]}
+
+
+def iter_coverage_parallel(tle_triples, observer, time_grid, workers, min_elevation=DEFAULT_MIN_ELEVATION,
+                           time_chunk=DEFAULT_TIME_CHUNK, progress=None, coarse_step_seconds=None, first_index=0,
+                           max_memory=None):
+    """以多行程計算，並依時間順序逐個分片產生覆蓋結果
+
+    參數與 propagate_coverage_parallel 相同；先完成的後段分片會暫存到前段分片完成為止。
+    first_index 之前的分片略過 (分片切分方式不變，由檢查點繼續時與完整執行相同)。
+
+    Yields:
+        (start, stop, coverage)，coverage 為該分片的 propagate_coverage 格式 dict
+    """
+    n_times = len(time_grid)
+    n_shards = max(1, min(n_times, workers * SHARDS_PER_WORKER))
+    bounds = np.linspace(0, n_times, n_shards + 1).astype(int)
+    shards = [(max(bounds[i], first_index), bounds[i + 1]) for i in range(n_shards)
+              if bounds[i + 1] > max(bounds[i], first_index)]
+    if not shards:
+        return
+
+    n_processes = min(workers, len(shards))
+    max_memory = parse_memory_size(max_memory)
+    initargs = (list(tle_triples), observer.latitude.degrees, observer.longitude.degrees,
+                observer.elevation.m, min_elevation, time_chunk, coarse_step_seconds,
+                None if max_memory is None else max_memory // n_processes)
+    pending = {}
+    next_shard = 0
+    with concurrent.futures.ProcessPoolExecutor(max_workers=n_processes,
+                                                initializer=_init_coverage_worker,
+                                                initargs=initargs) as executor:
+        futures = [executor.submit(_coverage_shard_worker, i, time_grid[start:stop])
+                   for i, (start, stop) in enumerate(shards)]
+        for future in concurrent.futures.as_completed(futures):
+            shard_index, coverage = future.result()
+            pending[shard_index] = coverage
+            if progress is not None:
+                start, stop = shards[shard_index]
+                progress.update(stop - start)
+            # 依分片順序輸出，確保輸出順序固定
+            while next_shard in pending:
+                start, stop = shards[next_shard]
+                yield start, stop, pending.pop(next_shard)
+                next_shard += 1
@@ -1,31 +1,35 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import os
+import sys
 import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
-from skyfield.api import load, wgs84, EarthSatellite
+from datetime import datetime, timedelta, timezone
+from skyfield.api import wgs84
 from itertools import groupby
 
-def parse_tle_data(tle_lines):
+# 與 satellite_analysis.py 共用專案根目錄下的衛星目錄載入器
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from catalog import load_catalog
+from propagation import SatelliteArray, iter_visible, shared_timescale, parse_memory_size
+from passes import predict_passes
+from result_writer import ChunkedResultWriter, batch_rows_for_budget, DEFAULT_FORMATS
+from visibility_store import VisibilityStoreWriter, DIRECTIONS, direction_codes
+from handover import HandoverTracker, best_per_step
+from visibility_partitions import VisibilityPartitions, aligned_start
+from time_grid import TimeGrid
+
+def parse_tle_data(tle_lines, ts=None):
     """
-    解析多行TLE數據
+    解析多行TLE數據 (經由二進位衛星目錄，已編譯過的 TLE 直接以記憶體映射讀取)
     """
-    satellites = []
-    
-    # 每三行一組解析TLE
-    for i in range(0, len(tle_lines), 3):
-        if i+2 < len(tle_lines):
-            name = tle_lines[i].strip()
-            line1 = tle_lines[i+1].strip()
-            line2 = tle_lines[i+2].strip()
-            
-            if line1.startswith('1 ') and line2.startswith('2 '):
-                satellites.append(EarthSatellite(line1, line2, name))
-    
-    return satellites
+    if ts is None:
+        ts = shared_timescale()
+    return load_catalog(list(tle_lines)).earth_satellites(ts)
 
-def compute_visibility(tle_lines, lat, lon, elevation=0, interval_minutes=1, duration_hours=24, min_elevation=25):
+def compute_visibility(tle_lines, lat, lon, elevation=0, interval_minutes=1, duration_hours=24, min_elevation=25,
+                       coarse_step_seconds=None, max_memory=None, start=None):
     """
     計算特定位置的衛星可見度
     
@@ -34,70 +38,191 @@ def compute_visibility(tle_lines, lat, lon, elevation=0, interval_minutes=1, dur
     lat -- 觀測點緯度
     lon -- 觀測點經度
     elevation -- 觀測點海拔(公尺)
-    interval_minutes -- 時間間隔(分鐘)
+    interval_minutes -- 時間間隔(分鐘，可為小數以取得秒級解析度)
     duration_hours -- 總時長(小時)
     min_elevation -- 最小可見仰角(度)
+    coarse_step_seconds -- 兩階段粗篩的粗網格間隔(秒)，None 表示逐一精算所有衛星
+    max_memory -- 傳播計算的記憶體預算 (位元組數或 '2G' 之類的字串)，依預算自動決定批次大小；
+                  None 表示使用固定的批次大小
+    start -- 帶時區(UTC)的起始時間，預設為現在 (取整到分鐘)
     
     返回:
     包含可見性數據的DataFrame
     """
     # 加載天體資料
-    ts = load.timescale()
+    ts = shared_timescale()
     
     # 解析TLE數據
-    satellites = parse_tle_data(tle_lines)
-    print(f"已加載 {len(satellites)} 顆衛星")
+    catalog = load_catalog(list(tle_lines))
+    satellite_array = SatelliteArray.from_catalog(catalog)
+    print(f"已加載 {len(satellite_array)} 顆衛星")
     
     # 設定觀測點
     observer = wgs84.latlon(lat, lon, elevation)
     
-    # 設定時間範圍
-    now = datetime.utcnow()
-    start_time = ts.utc(now.year, now.month, now.day, now.hour, now.minute)
-    
-    # 創建時間點列表
-    time_points = []
-    for i in range(int(duration_hours * 60 / interval_minutes) + 1):
-        time_points.append(start_time + i * (interval_minutes / 1440))
-    
-    # 初始化結果列表
-    results = []
-    
-    # 追蹤每個時間點每顆衛星
-    for t in time_points:
-        # 轉換為datetime格式，便於pd.DataFrame
-        dt = t.utc_datetime()
-        
-        for sat in satellites:
-            # 計算衛星位置
-            difference = sat - observer
-            topocentric = difference.at(t)
-            alt, az, distance = topocentric.altaz()
+    # 設定時間範圍 (含結束時間點)，一次轉換為 skyfield 時間陣列
+    if start is None:
+        start = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+    time_grid = TimeGrid.from_interval(start, duration_hours * 60, interval_minutes, include_end=True)
+    t = time_grid.to_skyfield(ts)
+    
+    # 以向量化引擎逐批計算可見衛星
+    frames = list(_iter_visibility_frames(satellite_array, observer, t, time_grid, min_elevation,
+                                          coarse_step_seconds, max_memory))
+    if frames:
+        return pd.concat(frames, ignore_index=True)
+    return _visibility_frame(time_grid, satellite_array.names, np.array([], dtype=int),
+                             np.array([], dtype=int), np.array([]), np.array([]), np.array([]))
+
+def write_visibility(tle_lines, lat, lon, output_dir, elevation=0, interval_minutes=1, duration_hours=24,
+                     min_elevation=25, coarse_step_seconds=None, name='visibility', formats=DEFAULT_FORMATS,
+                     max_memory=None):
+    """
+    計算可見度並分批寫入磁碟，不在記憶體中建立完整的DataFrame
+    
+    參數與 compute_visibility 相同，另外:
+    output_dir -- 輸出目錄
+    name -- 檔名主體 (輸出 <name>.csv、<name>.parquet/ 等)
+    formats -- 輸出格式 ('csv'、'parquet'、'arrow')
+    
+    返回:
+    輸出檔案路徑列表 (分析進行中即可讀取已寫出的部分)
+    """
+    ts = shared_timescale()
+    satellite_array = SatelliteArray.from_catalog(load_catalog(list(tle_lines)))
+    observer = wgs84.latlon(lat, lon, elevation)
+    now = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+    time_grid = TimeGrid.from_interval(now, duration_hours * 60, interval_minutes, include_end=True)
+    t = time_grid.to_skyfield(ts)
+    
+    rows_per_batch = batch_rows_for_budget(parse_memory_size(max_memory))
+    with ChunkedResultWriter(output_dir, name, formats=formats, rows_per_batch=rows_per_batch) as writer:
+        for frame in _iter_visibility_frames(satellite_array, observer, t, time_grid, min_elevation,
+                                             coarse_step_seconds, max_memory):
+            writer.write(frame)
+    print(f"已寫出 {writer.rows_written} 筆可見記錄")
+    return writer.paths
+
+def write_visibility_store(tle_lines, lat, lon, output_path, elevation=0, interval_minutes=1, duration_hours=24,
+                           min_elevation=25, coarse_step_seconds=None, partition_dir=None, max_memory=None):
+    """
+    計算可見度並寫入精簡的欄式存放目錄 (整數衛星 ID、int32 時間索引、float32 數值、方向代碼)
+    
+    參數與 compute_visibility 相同，另外:
+    output_path -- 存放目錄 (例如 output/visibility.store)，R 端以 R/read_visibility_store.R 讀取
+    partition_dir -- 增量計算的分區目錄 (例如 data/visibility_partitions)；指定時只計算
+                     TLE 有變動或新增的衛星與新進入時段的時間區塊，其餘沿用先前的結果
+                     (此時不使用 max_memory)
+    
+    傳播的同時求得每個時間點的最佳衛星與切換事件，
+    一併寫出 best_satellites.csv 與 handover_data.csv 到存放目錄 (R/compute_handover.R 直接讀取)
+    
+    返回:
+    存放目錄路徑
+    """
+    ts = shared_timescale()
+    catalog = load_catalog(list(tle_lines))
+    satellite_array = SatelliteArray.from_catalog(catalog)
+    
+    if partition_dir is not None:
+        # 時間點對齊到固定間隔，各次執行才能共用分區
+        partitions = VisibilityPartitions(lat, lon, elevation, interval_minutes, min_elevation,
+                                          partition_dir=partition_dir, coarse_step_seconds=coarse_step_seconds)
+        start = aligned_start(datetime.now(timezone.utc), partitions.step_seconds)
+        time_grid = TimeGrid.from_interval(start, duration_hours * 60, interval_minutes, include_end=True)
+        chunks = partitions.iter_visible(catalog, ts, time_grid, satellite_array)
+    else:
+        observer = wgs84.latlon(lat, lon, elevation)
+        now = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+        time_grid = TimeGrid.from_interval(now, duration_hours * 60, interval_minutes, include_end=True)
+        chunks = iter_visible(satellite_array, observer, time_grid.to_skyfield(ts), min_elevation=min_elevation,
+                              coarse_step_seconds=coarse_step_seconds, max_memory=max_memory)
+    
+    handovers = HandoverTracker(satellite_array.names, time_grid)
+    best_frames = []
+    with VisibilityStoreWriter(output_path, satellite_array.names, time_grid, min_elevation) as writer:
+        for time_index, satellite_index, alt, az, distance in chunks:
+            # 增加天氣模擬數據 (與 compute_visibility 相同的分佈)
+            rain = np.random.choice([0, 1], size=len(time_index), p=[0.8, 0.2])
+            writer.append(time_index, satellite_index, alt, az, distance, rain)
             
-            # 若仰角 > 最小可見仰角，記錄結果
-            if alt.degrees > min_elevation:
-                results.append({
-                    'time': dt,
-                    'satellite': sat.name,
-                    'elev': alt.degrees,  # 仰角
-                    'az': az.degrees,     # 方位角
-                    'distance': distance.km,
-                    'direction': get_direction(az.degrees)
-                })
-    
-    # 轉換為DataFrame
-    df = pd.DataFrame(results)
+            # 每個時間點的最佳衛星 (仰角最高)
+            best = best_per_step(time_index, satellite_index, alt, az, rain)
+            handovers.update(*best)
+            best_frames.append(best)
+    
+    step_index, best_index, best_alt, best_az, best_rain = (
+        [np.concatenate(column) for column in zip(*best_frames)] if best_frames
+        else best_per_step([], [], [], [], []))
+    best_satellites = pd.DataFrame({
+        'time': np.asarray(time_grid.labels(), dtype=object)[step_index],
+        'satellite': np.array(satellite_array.names, dtype=object)[best_index],
+        'elev': best_alt,
+        'az': best_az,
+        'direction': np.array(DIRECTIONS, dtype=object)[direction_codes(best_az)],
+        'rain': best_rain,
+    })
+    best_satellites.to_csv(os.path.join(output_path, 'best_satellites.csv'), index=False)
+    handovers.events().to_csv(os.path.join(output_path, 'handover_data.csv'), index=False)
+    if partition_dir is not None:
+        print(f"增量計算: 沿用 {partitions.stats['reused']} 個分區，計算 {partitions.stats['computed']} 個，"
+              f"移除 {partitions.stats['dropped']} 個 ({partitions.stats['blocks']} 個時間區塊)")
+    print(f"已寫出 {writer.n_rows} 筆可見記錄與 {handovers.summary()['handover_count']} 次切換到 {output_path}")
+    return output_path
+
+def _iter_visibility_frames(satellite_array, observer, t, time_grid, min_elevation, coarse_step_seconds,
+                            max_memory=None):
+    """逐批產生可見記錄的DataFrame"""
+    chunks = iter_visible(satellite_array, observer, t, min_elevation=min_elevation,
+                          coarse_step_seconds=coarse_step_seconds, max_memory=max_memory)
+    for time_index, satellite_index, alt, az, distance in chunks:
+        if len(time_index):
+            yield _visibility_frame(time_grid, satellite_array.names, time_index, satellite_index,
+                                    alt, az, distance)
+
+def _visibility_frame(time_grid, names, time_index, satellite_index, alt, az, distance):
+    """將一批可見記錄轉換為DataFrame"""
+    names = np.array(names, dtype=object)
+    df = pd.DataFrame({
+        'time': time_grid.to_datetime_index()[time_index],
+        'satellite': names[satellite_index],
+        'elev': alt,  # 仰角
+        'az': az,     # 方位角
+        'distance': distance,
+        'direction': np.array(DIRECTIONS, dtype=object)[direction_codes(az)]
+    })
     
     # 增加天氣模擬數據
     df['rain'] = np.random.choice([0, 1], size=len(df), p=[0.8, 0.2])  # 80%無雨，20%有雨
     
     return df
 
+def compute_passes(tle_lines, lat, lon, elevation=0, duration_hours=24, min_elevation=25):
+    """
+    預測特定位置的衛星過境 (事件式，不做固定間隔取樣)
+    
+    參數:
+    tle_lines -- TLE數據行列表
+    lat -- 觀測點緯度
+    lon -- 觀測點經度
+    elevation -- 觀測點海拔(公尺)
+    duration_hours -- 總時長(小時)
+    min_elevation -- 最小可見仰角(度)
+    
+    返回:
+    每次過境一列的DataFrame (satellite, aos, culmination, los, max_elevation, duration_seconds)
+    """
+    ts = shared_timescale()
+    satellite_array = SatelliteArray.from_catalog(load_catalog(list(tle_lines)))
+    observer = wgs84.latlon(lat, lon, elevation)
+    now = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+    passes = predict_passes(satellite_array, observer, ts, now, duration_hours * 60, min_elevation=min_elevation)
+    return passes.drop(columns=['satellite_index'])
+
 def get_direction(azimuth):
     """將方位角轉換為方向名稱"""
-    directions = ["北", "東北", "東", "東南", "南", "西南", "西", "西北"]
     index = round(azimuth / 45) % 8
-    return directions[index]
+    return DIRECTIONS[index]
 
 # 測試用主函數
 if __name__ == "__main__":
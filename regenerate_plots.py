@@ -14,9 +14,9 @@ def main():
     # 創建分析器但不執行數據分析
     analyzer = StarlinkAnalysis(output_dir=output_dir)
     
-    # 只生成可視化圖表
+    # 只生成可視化圖表；本腳本的用途就是重畫，忽略產物清單 (artifacts.json) 強制重新繪製
     print("使用既有數據生成圖表...")
-    analyzer.generate_visualizations()
+    analyzer.generate_visualizations(force=True)
     
     print("圖表生成完成！請檢查目錄：" + output_dir)
 
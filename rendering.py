@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+圖表輸出
+
+由分析結果 (記憶體中的覆蓋數據) 建立各圖表的繪製工作，在行程池中同時繪製：
+可見衛星數與最大仰角時間線圖 (matplotlib) 與互動式熱力圖 (plotly)。
+熱力圖矩陣以 reshape 一次建立，不逐列走訪 DataFrame。
+
+解析度與檔案格式以預設組合選擇：
+    preview  72 dpi PNG   快速預覽 (儀表板即時顯示)
+    screen   150 dpi PNG  一般螢幕顯示
+    print    300 dpi PNG  列印品質 (預設，與先前的輸出相同)
+    vector   SVG          向量圖，可任意縮放
+"""
+
+import os
+import time
+import importlib
+import multiprocessing
+import concurrent.futures
+
+import numpy as np
+
+RENDER_PRESETS = {
+    'preview': {'dpi': 72, 'format': 'png'},
+    'screen': {'dpi': 150, 'format': 'png'},
+    'print': {'dpi': 300, 'format': 'png'},
+    'vector': {'dpi': 300, 'format': 'svg'},
+}
+DEFAULT_RENDER_PRESET = os.environ.get('STARLINK_RENDER_PRESET', 'print')
+# 繪圖行程數，0 表示依圖表數與 CPU 數決定，1 表示在本行程依序繪製
+DEFAULT_RENDER_WORKERS = int(os.environ.get('STARLINK_RENDER_WORKERS', '0'))
+
+TIMELINE_FILES = ('visible_satellites_timeline', 'elevation_timeline')
+HEATMAP_FILE = 'coverage_heatmap.html'
+
+
+def resolve_preset(preset=None, dpi=None, fmt=None):
+    """取得預設組合的 (dpi, 格式)，dpi、fmt 可個別覆寫"""
+    preset = preset or DEFAULT_RENDER_PRESET
+    if preset not in RENDER_PRESETS:
+        raise ValueError(f"未知的圖表預設: {preset} (可用: {', '.join(RENDER_PRESETS)})")
+    settings = RENDER_PRESETS[preset]
+    return int(dpi or settings['dpi']), (fmt or settings['format']).lower()
+
+
+def heatmap_matrix(visible_counts):
+    """將逐分鐘的可見衛星數排成 小時 × 分鐘 的熱力圖矩陣
+
+    Returns:
+        (矩陣, 列標籤, 欄標籤, 標題)；不足一小時時只有一列，欄數為分鐘數
+    """
+    values = np.asarray(visible_counts, dtype=float)
+    duration_minutes = len(values)
+    hours, minutes = divmod(duration_minutes, 60)
+    if hours == 0:
+        data = values[:minutes].reshape(1, minutes)
+        return data, ["00:00"], [f"{m:02d}" for m in range(minutes)], f"衛星覆蓋熱力圖 ({minutes}分鐘分析)"
+    # 補零到整數小時後 reshape，最後一列為不足一小時的部分
+    data = np.zeros((hours + 1) * 60)
+    data[:duration_minutes] = values
+    return (data.reshape(hours + 1, 60), [f"{h:02d}:00" for h in range(hours + 1)],
+            [f"{m:02d}" for m in range(60)], f"衛星覆蓋熱力圖 ({hours}小時{minutes}分鐘分析)")
+
+
+def timeline_filenames(fmt):
+    """時間線圖的檔名 (TIMELINE_FILES 加上實際繪製的格式)，報告與 Shiny 應用程式依此顯示圖片"""
+    return tuple(f"{name}.{fmt}" for name in TIMELINE_FILES)
+
+
+def timeline_tasks(output_dir, visible_counts, best_alt, dpi, fmt):
+    """可見衛星數與最大仰角時間線圖的繪製工作；值為 None 或全為 NaN 時繪製無數據的圖"""
+    visible_file, elevation_file = timeline_filenames(fmt)
+    return [
+        (render_timeline, dict(
+            path=os.path.join(output_dir, visible_file), values=visible_counts,
+            title='台北市區可見 Starlink 衛星數量變化', xlabel='時間 (分鐘)', ylabel='可見衛星數量 (個)',
+            empty_xlabel='時間點', empty_message='缺少可見衛星數量數據', dpi=dpi, fmt=fmt)),
+        (render_timeline, dict(
+            path=os.path.join(output_dir, elevation_file), values=best_alt,
+            title='衛星最大仰角隨時間變化', xlabel='時間 (分鐘)', ylabel='最大仰角 (度)',
+            empty_xlabel='時間', empty_message='缺少仰角數據', dpi=dpi, fmt=fmt)),
+    ]
+
+
+def render_timeline(path, values, title, xlabel, ylabel, empty_xlabel, empty_message, dpi=300, fmt='png'):
+    """繪製一張時間線圖"""
+    from plotting import plt, plot_with_chinese_font
+
+    plt.figure(figsize=(12, 6))
+    if values is not None and len(values) and not np.isnan(values).all():
+        time_indices = range(len(values))
+        plt.plot(time_indices, values)
+        plot_with_chinese_font(title, xlabel, ylabel)
+        plt.grid(True, linestyle='--', alpha=0.7)
+        # 設置X軸刻度，不超過10個刻度
+        if len(values) > 20:
+            step = max(1, len(values) // 10)
+            plt.xticks(time_indices[::step])
+    else:
+        print(f"警告：{empty_message}，繪製無數據的圖表")
+        plot_with_chinese_font(f"{title} (無數據)", empty_xlabel, ylabel)
+        plt.text(0.5, 0.5, empty_message, horizontalalignment='center', verticalalignment='center',
+                 transform=plt.gca().transAxes)
+    plt.tight_layout()
+    plt.savefig(path, dpi=dpi, format=fmt)
+    plt.close()
+    return path
+
+
+def render_empty(path, dpi=300, fmt='png'):
+    """資料為空時的佔位圖，確保R應用程式不會出錯"""
+    from plotting import plt
+
+    plt.figure(figsize=(12, 6))
+    plt.title('無數據可顯示')
+    plt.text(0.5, 0.5, '沒有可用的衛星數據', horizontalalignment='center', verticalalignment='center',
+             transform=plt.gca().transAxes)
+    plt.tight_layout()
+    plt.savefig(path, dpi=dpi, format=fmt)
+    plt.close()
+    return path
+
+
+def render_empty_heatmap(path):
+    """資料為空時的熱力圖頁面，取代先前結果留下的熱力圖"""
+    with open(path, 'w') as f:
+        f.write(HEATMAP_ERROR_PAGE.replace('{error}', '沒有可用的衛星數據'))
+    return path
+
+
+def render_heatmap(path, visible_counts):
+    """生成互動式熱力圖；失敗時寫入錯誤頁面"""
+    try:
+        from plotting import px
+
+        data, hour_labels, minute_labels, title = heatmap_matrix(visible_counts)
+        fig = px.imshow(data,
+                        labels=dict(x="分鐘", y="小時" if len(hour_labels) > 1 else "", color="可見衛星數"),
+                        x=minute_labels,
+                        y=hour_labels,
+                        title=title,
+                        color_continuous_scale="Viridis",
+                        aspect="auto")
+        # 增加交互元素
+        fig.update_traces(hovertemplate="時間: %{y}:%{x}<br>可見衛星數: %{z}<extra></extra>")
+        fig.update_layout(
+            autosize=True,
+            height=800,
+            margin=dict(t=50, l=50, b=50, r=50),
+            font=dict(family="Arial", size=12),
+        )
+        fig.write_html(path)
+        print(f"熱力圖已保存至 {path}")
+    except Exception as e:
+        print(f"生成熱力圖時出錯: {e}")
+        with open(path, 'w') as f:
+            f.write(HEATMAP_ERROR_PAGE.replace('{error}', str(e)))
+    return path
+
+
+def _run_task(func, kwargs):
+    """執行一個繪製工作，回傳 (輸出路徑, 牆鐘秒數, CPU 秒數)"""
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    path = func(**kwargs)
+    return path, time.perf_counter() - wall_start, time.process_time() - cpu_start
+
+
+def render_all(tasks, workers=DEFAULT_RENDER_WORKERS):
+    """同時執行多個繪製工作
+
+    Args:
+        tasks: (繪製函式, 參數 dict) 列表，函式需為模組層級以便傳給子行程
+        workers (int): 行程數，0 表示依工作數與 CPU 數決定，1 表示在本行程依序繪製
+
+    Returns:
+        與 tasks 對應的 (輸出路徑, 牆鐘秒數, CPU 秒數) 列表；任一工作失敗時在所有工作結束後拋出其例外
+    """
+    if workers is None or workers <= 0:
+        workers = min(len(tasks), os.cpu_count() or 1)
+    # daemon 行程不能再建立子行程，改在本行程繪製
+    if workers <= 1 or len(tasks) <= 1 or multiprocessing.current_process().daemon:
+        return [_run_task(func, kwargs) for func, kwargs in tasks]
+    if multiprocessing.get_start_method() == 'fork':
+        # 先在本行程載入繪圖後端，子行程複製後不必各自重新載入 matplotlib 與 plotly
+        importlib.import_module('plotting')
+    with concurrent.futures.ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+        futures = [executor.submit(_run_task, func, kwargs) for func, kwargs in tasks]
+        concurrent.futures.wait(futures)
+    return [future.result() for future in futures]
+
+
+HEATMAP_ERROR_PAGE = """
+                <!DOCTYPE html>
+                <html>
+                <head>
+                    <title>覆蓋率熱力圖</title>
+                    <style>
+                        body {
+                            font-family: 'Noto Sans TC', Arial, sans-serif;
+                            text-align: center;
+                            margin-top: 50px;
+                            background-color: #f8f9fa;
+                        }
+                        .error-box {
+                            max-width: 600px;
+                            margin: 0 auto;
+                            background: white;
+                            border-radius: 8px;
+                            padding: 30px;
+                            box-shadow: 0 2px 10px rgba(0,0,0,0.1);
+                        }
+                        h2 {
+                            color: #e74c3c;
+                        }
+                    </style>
+                </head>
+                <body>
+                    <div class="error-box">
+                        <h2>覆蓋率熱力圖</h2>
+                        <p>生成熱力圖時發生錯誤。請檢查日誌了解詳情。</p>
+                        <p>錯誤信息: {error}</p>
+                    </div>
+                </body>
+                </html>
+                """
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HTML 報告模板
+
+報告與空報告的模板在載入模組時建立一次 (string.Template)，產生報告時只做欄位代換，
+不必每次重新組合整份 HTML 字串。
+"""
+
+from string import Template
+
+REPORT_TEMPLATE = Template("""
+        <!DOCTYPE html>
+        <html lang="zh-TW">
+        <head>
+            <meta charset="UTF-8">
+            <meta name="viewport" content="width=device-width, initial-scale=1.0">
+            <title>台北市 Starlink 衛星覆蓋分析報告</title>
+            <link href="https://fonts.googleapis.com/css2?family=Noto+Sans+TC:wght@300;400;500;700&display=swap" rel="stylesheet">
+            <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/5.15.3/css/all.min.css">
+            <style>
+                body {
+                    font-family: 'Noto Sans TC', sans-serif;
+                    line-height: 1.6;
+                    margin: 0;
+                    padding: 0;
+                    color: #333;
+                    background-color: #f5f7fa;
+                }
+                .container {
+                    max-width: 1200px;
+                    margin: 0 auto;
+                    padding: 20px;
+                }
+                header {
+                    background-color: #3498db;
+                    color: white;
+                    padding: 20px 0;
+                    margin-bottom: 30px;
+                    border-radius: 8px;
+                    box-shadow: 0 4px 6px rgba(0,0,0,0.1);
+                    text-align: center;
+                }
+                h1 {
+                    margin: 0;
+                    font-size: 2.5em;
+                    font-weight: 700;
+                }
+                .analysis-time {
+                    margin-top: 10px;
+                    font-style: italic;
+                    opacity: 0.8;
+                }
+                h2 {
+                    color: #2980b9;
+                    padding-bottom: 10px;
+                    border-bottom: 2px solid #eee;
+                    margin-top: 40px;
+                    margin-bottom: 30px;
+                }
+                h3 {
+                    color: #3498db;
+                    margin-top: 30px;
+                }
+                .stats-container {
+                    display: flex;
+                    flex-wrap: wrap;
+                    gap: 20px;
+                    margin-bottom: 40px;
+                }
+                .stat-card {
+                    background-color: white;
+                    border-radius: 8px;
+                    padding: 20px;
+                    flex: 1 1 220px;
+                    box-shadow: 0 2px 10px rgba(0,0,0,0.05);
+                    transition: transform 0.3s, box-shadow 0.3s;
+                }
+                .stat-card:hover {
+                    transform: translateY(-5px);
+                    box-shadow: 0 5px 15px rgba(0,0,0,0.1);
+                }
+                .stat-title {
+                    font-size: 1em;
+                    color: #7f8c8d;
+                    margin-bottom: 10px;
+                    display: flex;
+                    align-items: center;
+                }
+                .stat-title i {
+                    margin-right: 8px;
+                    color: #3498db;
+                }
+                .stat-value {
+                    font-size: 2.2em;
+                    font-weight: 700;
+                    color: #2980b9;
+                }
+                .visualization-container {
+                    background-color: white;
+                    border-radius: 8px;
+                    padding: 20px;
+                    margin-bottom: 30px;
+                    box-shadow: 0 2px 10px rgba(0,0,0,0.05);
+                }
+                img {
+                    max-width: 100%;
+                    height: auto;
+                    border-radius: 8px;
+                    display: block;
+                    margin: 20px auto;
+                    border: 1px solid #eee;
+                }
+                iframe {
+                    width: 100%;
+                    border: none;
+                    border-radius: 8px;
+                    box-shadow: 0 2px 10px rgba(0,0,0,0.05);
+                }
+                .analysis-params {
+                    background-color: #eef2f5;
+                    border-radius: 8px;
+                    padding: 15px;
+                    margin-top: 20px;
+                    margin-bottom: 30px;
+                }
+                .param-title {
+                    font-weight: 700;
+                    color: #34495e;
+                    display: inline-block;
+                    width: 180px;
+                }
+                footer {
+                    text-align: center;
+                    margin-top: 50px;
+                    padding: 20px;
+                    color: #7f8c8d;
+                    font-size: 0.9em;
+                }
+            </style>
+        </head>
+        <body>
+            <div class="container">
+                <header>
+                    <h1>台北市 Starlink 衛星覆蓋分析報告</h1>
+                    <div class="analysis-time">分析時間: $generated_at UTC</div>
+                </header>
+                
+                <div class="analysis-params">
+                    <div><span class="param-title">分析持續時間:</span> $duration_minutes 分鐘</div>
+                    <div><span class="param-title">觀測位置:</span> 緯度 $latitude°, 經度 $longitude°</div>
+                </div>
+                
+                <h2><i class="fas fa-chart-bar"></i> 主要統計數據</h2>
+                <div class="stats-container">
+                    <div class="stat-card">
+                        <div class="stat-title"><i class="fas fa-satellite"></i> 平均可見衛星數</div>
+                        <div class="stat-value">$avg_visible_satellites</div>
+                    </div>
+                    <div class="stat-card">
+                        <div class="stat-title"><i class="fas fa-satellite-dish"></i> 最大可見衛星數</div>
+                        <div class="stat-value">$max_visible_satellites</div>
+                    </div>
+                    <div class="stat-card">
+                        <div class="stat-title"><i class="fas fa-satellite"></i> 最小可見衛星數</div>
+                        <div class="stat-value">$min_visible_satellites</div>
+                    </div>
+                    <div class="stat-card">
+                        <div class="stat-title"><i class="fas fa-angle-up"></i> 平均最佳仰角</div>
+                        <div class="stat-value">$avg_elevation°</div>
+                    </div>
+                    <div class="stat-card">
+                        <div class="stat-title"><i class="fas fa-angle-double-up"></i> 最大仰角</div>
+                        <div class="stat-value">$max_elevation°</div>
+                    </div>
+                    <div class="stat-card">
+                        <div class="stat-title"><i class="fas fa-signal"></i> 衛星覆蓋率</div>
+                        <div class="stat-value">$coverage_percentage%</div>
+                    </div>
+                </div>
+                
+                <h2><i class="fas fa-chart-line"></i> 視覺化結果</h2>
+                
+                <div class="visualization-container">
+                    <h3><i class="fas fa-satellite"></i> 可見衛星數量時間線</h3>
+                    <img src="./$visible_timeline" alt="可見衛星數量時間線">
+                </div>
+                
+                <div class="visualization-container">
+                    <h3><i class="fas fa-angle-up"></i> 最佳衛星仰角時間線</h3>
+                    <img src="./$elevation_timeline" alt="最佳衛星仰角時間線">
+                </div>
+                
+                <div class="visualization-container">
+                    <h3><i class="fas fa-fire"></i> 衛星覆蓋熱力圖</h3>
+                    <iframe src="./coverage_heatmap.html" width="100%" height="600px"></iframe>
+                </div>
+                
+                <footer>
+                    生成於 $generated_at · 台北市 Starlink 衛星分析系統
+                </footer>
+            </div>
+        </body>
+        </html>
+        """)
+
+EMPTY_REPORT_TEMPLATE = Template("""
+        <!DOCTYPE html>
+        <html lang="zh-TW">
+        <head>
+            <meta charset="UTF-8">
+            <meta name="viewport" content="width=device-width, initial-scale=1.0">
+            <title>台北市 Starlink 衛星覆蓋分析報告</title>
+            <link href="https://fonts.googleapis.com/css2?family=Noto+Sans+TC:wght@300;400;500;700&display=swap" rel="stylesheet">
+            <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/5.15.3/css/all.min.css">
+            <style>
+                body {
+                    font-family: 'Noto Sans TC', sans-serif;
+                    line-height: 1.6;
+                    margin: 0;
+                    padding: 0;
+                    color: #333;
+                    background-color: #f5f7fa;
+                }
+                .container {
+                    max-width: 1200px;
+                    margin: 0 auto;
+                    padding: 20px;
+                }
+                header {
+                    background-color: #e74c3c;
+                    color: white;
+                    padding: 20px 0;
+                    margin-bottom: 30px;
+                    border-radius: 8px;
+                    box-shadow: 0 4px 6px rgba(0,0,0,0.1);
+                    text-align: center;
+                }
+                h1 {
+                    margin: 0;
+                    font-size: 2.5em;
+                    font-weight: 700;
+                }
+                .warning-box {
+                    background-color: white;
+                    border-radius: 8px;
+                    padding: 30px;
+                    margin: 40px auto;
+                    box-shadow: 0 2px 10px rgba(0,0,0,0.05);
+                    text-align: center;
+                    max-width: 600px;
+                }
+                .warning-icon {
+                    font-size: 60px;
+                    color: #e74c3c;
+                    margin-bottom: 20px;
+                }
+                .warning {
+                    color: #e74c3c;
+                    font-size: 1.5em;
+                    font-weight: 700;
+                    margin-bottom: 20px;
+                }
+                .message {
+                    font-size: 1.1em;
+                    color: #7f8c8d;
+                }
+                footer {
+                    text-align: center;
+                    margin-top: 50px;
+                    padding: 20px;
+                    color: #7f8c8d;
+                    font-size: 0.9em;
+                }
+            </style>
+        </head>
+        <body>
+            <div class="container">
+                <header>
+                    <h1>台北市 Starlink 衛星覆蓋分析報告</h1>
+                </header>
+
+                <div class="warning-box">
+                    <div class="warning-icon">
+                        <i class="fas fa-exclamation-triangle"></i>
+                    </div>
+                    <div class="warning">無法生成報告</div>
+                    <div class="message">分析結果為空，請檢查日誌以獲取更多信息</div>
+                </div>
+
+                <footer>
+                    生成於 $generated_at · 台北市 Starlink 衛星分析系統
+                </footer>
+            </div>
+        </body>
+        </html>
+        """)
+
+
+def _number(value, digits=1):
+    """數值欄位的顯示格式 (缺值顯示為 0)"""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        value = 0.0
+    return f"{value:.{digits}f}" if digits else f"{value:.0f}"
+
+
+def render_report(stats, latitude, longitude, generated_at, timeline_files):
+    """產生分析報告的 HTML
+
+    Args:
+        stats (dict): 統計數據 (coverage_stats.json 的內容)
+        latitude (float): 觀測點緯度(度)
+        longitude (float): 觀測點經度(度)
+        generated_at (str): 顯示的產生時間
+        timeline_files (tuple): 可見衛星數與仰角時間線圖的檔名 (rendering.timeline_filenames)
+    """
+    visible_timeline, elevation_timeline = timeline_files
+    return REPORT_TEMPLATE.substitute(
+        generated_at=generated_at,
+        visible_timeline=visible_timeline,
+        elevation_timeline=elevation_timeline,
+        duration_minutes=stats.get('analysis_duration_minutes', 60),
+        latitude=f"{latitude:.4f}",
+        longitude=f"{longitude:.4f}",
+        avg_visible_satellites=_number(stats.get('avg_visible_satellites', 0)),
+        max_visible_satellites=stats.get('max_visible_satellites', 0),
+        min_visible_satellites=stats.get('min_visible_satellites', 0),
+        avg_elevation=_number(stats.get('avg_elevation', 0)),
+        max_elevation=_number(stats.get('max_elevation', 0)),
+        coverage_percentage=_number(stats.get('coverage_percentage', 0)),
+    )
+
+
+def render_empty_report(generated_at):
+    """產生沒有分析結果時的報告 HTML"""
+    return EMPTY_REPORT_TEMPLATE.substitute(generated_at=generated_at)
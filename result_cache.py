@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+以分析參數為鍵的結果快取
+
+鍵由 TLE 內容雜湊、觀測點、時間網格、仰角門檻與程式版本組成，
+參數完全相同的分析直接取回先前的覆蓋數據與統計，不必重新計算。
+快取項目以最近使用時間排序，超過項目數或總大小上限時淘汰最久未使用者。
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import argparse
+from datetime import datetime, timezone
+
+import pandas as pd
+
+DEFAULT_RESULT_CACHE_DIR = os.environ.get(
+    'STARLINK_RESULT_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'result_cache'))
+DEFAULT_MAX_ENTRIES = int(os.environ.get('STARLINK_RESULT_CACHE_MAX_ENTRIES', '64'))
+DEFAULT_MAX_MB = float(os.environ.get('STARLINK_RESULT_CACHE_MAX_MB', '256'))
+# 啟用快取時，分析起始時間向下取整到此間隔(秒)，同一時段內的重複分析才會命中
+DEFAULT_TIME_QUANTUM_SECONDS = int(os.environ.get('STARLINK_RESULT_CACHE_QUANTUM_SECONDS', '300'))
+
+# 影響計算結果的模組，內容變更時快取自動失效
+_ENGINE_MODULES = ('propagation.py', 'passes.py', 'time_grid.py', 'catalog.py', 'handover.py',
+                   'coverage_stats.py', 'result_cache.py', 'result_writer.py', 'satellite_analysis.py')
+
+_code_version = None
+
+
+def code_version():
+    """計算引擎原始碼的雜湊值，作為快取鍵的一部分"""
+    global _code_version
+    if _code_version is None:
+        digest = hashlib.sha256()
+        root = os.path.dirname(os.path.abspath(__file__))
+        for name in _ENGINE_MODULES:
+            path = os.path.join(root, name)
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    digest.update(f.read())
+        _code_version = digest.hexdigest()[:16]
+    return _code_version
+
+
+def quantize_start(moment=None, quantum_seconds=DEFAULT_TIME_QUANTUM_SECONDS):
+    """將起始時間向下取整到固定間隔 (UTC)"""
+    moment = moment or datetime.now(timezone.utc)
+    if quantum_seconds <= 0:
+        return moment
+    timestamp = int(moment.timestamp()) // int(quantum_seconds) * int(quantum_seconds)
+    return datetime.fromtimestamp(timestamp, timezone.utc)
+
+
+class ResultCache:
+    """以參數雜湊為目錄名稱的磁碟結果快取，具 LRU 與總大小淘汰"""
+
+    def __init__(self, cache_dir=None, max_entries=None, max_mb=None,
+                 time_quantum_seconds=DEFAULT_TIME_QUANTUM_SECONDS):
+        self.cache_dir = cache_dir or DEFAULT_RESULT_CACHE_DIR
+        self.max_entries = DEFAULT_MAX_ENTRIES if max_entries is None else int(max_entries)
+        self.max_bytes = (DEFAULT_MAX_MB if max_mb is None else float(max_mb)) * 1024 * 1024
+        self.time_quantum_seconds = time_quantum_seconds
+
+    @staticmethod
+    def make_key(**params):
+        """由分析參數產生快取鍵 (自動加入程式版本)"""
+        params = dict(params, code_version=code_version())
+        text = json.dumps(params, sort_keys=True, default=str)
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()[:24]
+
+    def _entry_dir(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def get(self, key):
+        """取得快取結果，未命中時回傳 None
+
+        Returns:
+            (coverage_df, stats) 或 None
+        """
+        entry_dir = self._entry_dir(key)
+        try:
+            coverage_df = pd.read_pickle(os.path.join(entry_dir, 'coverage.pkl'))
+            with open(os.path.join(entry_dir, 'stats.json'), 'r') as f:
+                stats = json.load(f)
+        except (OSError, ValueError, EOFError):
+            return None
+        # 更新目錄時間作為最近使用時間
+        try:
+            os.utime(entry_dir)
+        except OSError:
+            pass
+        return coverage_df, stats
+
+    def put(self, key, coverage_df, stats, params=None):
+        """保存結果並依上限淘汰最久未使用的項目"""
+        entry_dir = self._entry_dir(key)
+        tmp_dir = f"{entry_dir}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(tmp_dir, exist_ok=True)
+            coverage_df.to_pickle(os.path.join(tmp_dir, 'coverage.pkl'))
+            with open(os.path.join(tmp_dir, 'stats.json'), 'w') as f:
+                json.dump(stats, f)
+            with open(os.path.join(tmp_dir, 'params.json'), 'w') as f:
+                json.dump(dict(params or {}, code_version=code_version(), created_at=time.time()),
+                          f, default=str)
+            if os.path.exists(entry_dir):
+                shutil.rmtree(entry_dir, ignore_errors=True)
+            os.replace(tmp_dir, entry_dir)
+        except OSError as e:
+            print(f"無法保存結果快取 {entry_dir}: {e}")
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return
+        self.evict()
+
+    def entries(self):
+        """回傳 (最近使用時間, 大小(bytes), 目錄) 列表，由舊到新排序"""
+        if not os.path.isdir(self.cache_dir):
+            return []
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if not os.path.isdir(path) or name.endswith('.tmp'):
+                continue
+            size = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+            entries.append((os.path.getmtime(path), size, path))
+        return sorted(entries)
+
+    def evict(self):
+        """淘汰最久未使用的項目，直到項目數與總大小都在上限內"""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        while entries and (len(entries) > self.max_entries or total > self.max_bytes):
+            _, size, path = entries.pop(0)
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        """清除所有快取項目"""
+        for _, _, path in self.entries():
+            shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Starlink 分析結果快取工具')
+    parser.add_argument('--clear', action='store_true', help='清除所有快取項目')
+    parser.add_argument('--cache-dir', default=None, help='快取目錄')
+    args = parser.parse_args()
+
+    cache = ResultCache(cache_dir=args.cache_dir)
+    if args.clear:
+        cache.clear()
+    entries = cache.entries()
+    total_mb = sum(size for _, size, _ in entries) / 1024 / 1024
+    print(f"結果快取: {cache.cache_dir} ({len(entries)} 個項目, {total_mb:.1f} MB)")
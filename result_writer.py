@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分批串流寫入分析結果
+
+分析過程中逐批把 DataFrame 附加到磁碟：CSV 每批附加並立即寫出，
+Parquet 每批寫成資料夾中的一個分片檔，Arrow IPC 以串流格式逐批附加，
+因此記憶體用量與分析時長無關，分析進行中也能讀取已完成的部分。
+Parquet 與 Arrow 需要 pyarrow；未安裝時只輸出 CSV。
+"""
+
+import os
+import glob
+
+import pandas as pd
+
+SUPPORTED_FORMATS = ('csv', 'parquet', 'arrow')
+# 預設只輸出 CSV；Parquet / Arrow 以 --parquet、--arrow (或 --format、STARLINK_RESULT_FORMATS) 另外開啟
+DEFAULT_FORMATS = tuple(
+    fmt.strip() for fmt in os.environ.get('STARLINK_RESULT_FORMATS', 'csv').split(',') if fmt.strip())
+# 未指定記憶體預算時，累積到此列數才寫出一批，避免產生過多小分片
+DEFAULT_ROWS_PER_BATCH = 4096
+# 指定記憶體預算時，待寫出的資料最多使用預算的此比例；每列的估計大小含時間與衛星名稱字串
+WRITE_BUFFER_FRACTION = 0.125
+ESTIMATED_ROW_BYTES = 256
+MIN_ROWS_PER_BATCH = 64
+
+_pyarrow_warned = False
+
+
+def _import_pyarrow():
+    """延遲載入 pyarrow，未安裝時回傳 None"""
+    global _pyarrow_warned
+    try:
+        import pyarrow
+        import pyarrow.parquet
+        import pyarrow.ipc
+        return pyarrow
+    except ImportError:
+        if not _pyarrow_warned:
+            print("未安裝 pyarrow，Parquet / Arrow 輸出已停用，只輸出 CSV")
+            _pyarrow_warned = True
+        return None
+
+
+def batch_rows_for_budget(max_memory=None):
+    """每批寫出的列數：未指定記憶體預算 (位元組數) 時為 DEFAULT_ROWS_PER_BATCH，否則由預算推得"""
+    if max_memory is None:
+        return DEFAULT_ROWS_PER_BATCH
+    return max(MIN_ROWS_PER_BATCH, int(int(max_memory) * WRITE_BUFFER_FRACTION) // ESTIMATED_ROW_BYTES)
+
+
+def parse_formats(formats):
+    """將 'csv,parquet' 之類的字串或序列轉換為格式 tuple"""
+    if isinstance(formats, str):
+        formats = formats.split(',')
+    formats = tuple(fmt.strip().lower() for fmt in formats if fmt and fmt.strip())
+    unknown = [fmt for fmt in formats if fmt not in SUPPORTED_FORMATS]
+    if unknown:
+        raise ValueError(f"不支援的輸出格式: {', '.join(unknown)}")
+    return formats
+
+
+class ChunkedResultWriter:
+    """將 DataFrame 分批附加寫入 CSV / Parquet 資料夾 / Arrow IPC 串流"""
+
+    def __init__(self, output_dir, name, formats=DEFAULT_FORMATS, timestamp_columns=(),
+                 rows_per_batch=DEFAULT_ROWS_PER_BATCH):
+        """
+        Args:
+            output_dir (str): 輸出目錄
+            name (str): 檔名主體，輸出 <name>.csv、<name>.parquet/、<name>.arrows
+            formats: 輸出格式序列或逗號分隔字串
+            timestamp_columns: 在欄式格式中轉換為 UTC 時間戳記型別的字串欄位
+            rows_per_batch (int): 累積到此列數時寫出一批
+        """
+        self.output_dir = output_dir
+        self.name = name
+        self.formats = parse_formats(formats)
+        self.timestamp_columns = tuple(timestamp_columns)
+        self.rows_per_batch = max(1, int(rows_per_batch))
+
+        if any(fmt != 'csv' for fmt in self.formats) and _import_pyarrow() is None:
+            self.formats = tuple(fmt for fmt in self.formats if fmt == 'csv') or ('csv',)
+
+        self.csv_path = os.path.join(output_dir, f"{name}.csv")
+        self.parquet_dir = os.path.join(output_dir, f"{name}.parquet")
+        self.arrow_path = os.path.join(output_dir, f"{name}.arrows")
+
+        self._pending = []
+        self._pending_rows = 0
+        self._rows_written = 0
+        self._parts = 0
+        self._csv_file = None
+        self._arrow_file = None
+        self._arrow_writer = None
+        self._schema = None
+        self._arrow_rows = 0
+        self._started = False
+        self._closed = False
+
+    @property
+    def paths(self):
+        """實際輸出的檔案路徑列表"""
+        paths = {'csv': self.csv_path, 'parquet': self.parquet_dir, 'arrow': self.arrow_path}
+        return [paths[fmt] for fmt in self.formats]
+
+    @property
+    def rows_written(self):
+        return self._rows_written
+
+    def _start(self):
+        """清除同名的舊結果並開啟輸出檔案"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        if 'csv' in self.formats:
+            self._csv_file = open(self.csv_path, 'w', newline='')
+        if 'parquet' in self.formats:
+            os.makedirs(self.parquet_dir, exist_ok=True)
+            for path in glob.glob(os.path.join(self.parquet_dir, 'part-*.parquet')):
+                os.remove(path)
+        self._started = True
+
+    def state(self):
+        """目前已寫出的進度 (呼叫前應先 flush)，供檢查點保存"""
+        return {
+            'rows_written': self._rows_written,
+            'parts': self._parts,
+            'csv_bytes': self._csv_file.tell() if self._csv_file is not None else 0,
+            'arrow_rows': self._arrow_rows,
+        }
+
+    def resume(self, state):
+        """從檢查點繼續寫入：捨棄檢查點之後寫出的部分，之後的資料接續附加"""
+        if self._started:
+            raise ValueError("寫入器已開始寫入，無法續寫")
+        os.makedirs(self.output_dir, exist_ok=True)
+        self._rows_written = int(state['rows_written'])
+        self._parts = int(state['parts'])
+        if 'csv' in self.formats:
+            with open(self.csv_path, 'a') as f:
+                f.truncate(int(state['csv_bytes']))
+            self._csv_file = open(self.csv_path, 'a', newline='')
+        if 'parquet' in self.formats:
+            os.makedirs(self.parquet_dir, exist_ok=True)
+            for path in glob.glob(os.path.join(self.parquet_dir, 'part-*.parquet')):
+                if int(os.path.basename(path)[len('part-'):-len('.parquet')]) >= self._parts:
+                    os.remove(path)
+        if 'arrow' in self.formats and state.get('arrow_rows'):
+            self._resume_arrow(int(state['arrow_rows']))
+        self._started = True
+
+    def _resume_arrow(self, rows):
+        """IPC 串流無法續寫，將檢查點前的批次複製到新的串流"""
+        pa = _import_pyarrow()
+        table = _read_arrow_stream(pa, self.arrow_path)
+        if table is None:
+            raise ValueError(f"無法讀取 {self.arrow_path}，無法由檢查點續寫")
+        self._schema = table.schema
+        table = table.slice(0, rows)
+        self._arrow_file = pa.OSFile(self.arrow_path, 'wb')
+        self._arrow_writer = pa.ipc.new_stream(self._arrow_file, self._schema)
+        self._arrow_writer.write_table(table)
+        self._arrow_file.flush()
+        self._arrow_rows = table.num_rows
+
+    def write(self, df):
+        """附加一批資料 (欄位需與先前相同)，累積到 rows_per_batch 列時寫出"""
+        if self._closed:
+            raise ValueError("寫入器已關閉")
+        if not self._started:
+            self._start()
+        if len(df) == 0 and self._schema is not None:
+            return
+        self._pending.append(df)
+        self._pending_rows += len(df)
+        if self._pending_rows >= self.rows_per_batch:
+            self.flush()
+
+    def flush(self):
+        """立即寫出累積的資料"""
+        if not self._pending:
+            return
+        batch = pd.concat(self._pending, ignore_index=True) if len(self._pending) > 1 else self._pending[0]
+        self._pending = []
+        self._pending_rows = 0
+
+        if self._csv_file is not None:
+            batch.to_csv(self._csv_file, index=False, header=self._rows_written == 0 and self._parts == 0)
+            self._csv_file.flush()
+        if 'parquet' in self.formats or 'arrow' in self.formats:
+            self._write_columnar(batch)
+        self._rows_written += len(batch)
+        self._parts += 1
+
+    def _write_columnar(self, batch):
+        pa = _import_pyarrow()
+        columnar = batch
+        if self.timestamp_columns:
+            columnar = batch.copy()
+            for column in self.timestamp_columns:
+                if column in columnar.columns:
+                    columnar[column] = pd.to_datetime(columnar[column], utc=True)
+        table = pa.Table.from_pandas(columnar, schema=self._schema, preserve_index=False)
+        if self._schema is None:
+            self._schema = table.schema
+
+        if 'parquet' in self.formats:
+            # 先寫入暫存檔再改名，讀取端只會看到完整的分片
+            part_path = os.path.join(self.parquet_dir, f"part-{self._parts:05d}.parquet")
+            tmp_path = f"{part_path}.tmp"
+            pa.parquet.write_table(table, tmp_path)
+            os.replace(tmp_path, part_path)
+        if 'arrow' in self.formats:
+            if self._arrow_writer is None:
+                self._arrow_file = pa.OSFile(self.arrow_path, 'wb')
+                self._arrow_writer = pa.ipc.new_stream(self._arrow_file, self._schema)
+            self._arrow_writer.write_table(table)
+            self._arrow_file.flush()
+            self._arrow_rows += table.num_rows
+
+    def close(self):
+        """寫出剩餘資料並關閉檔案"""
+        if self._closed:
+            return
+        if not self._started:
+            self._start()
+        self.flush()
+        if self._csv_file is not None:
+            self._csv_file.close()
+        if self._arrow_writer is not None:
+            self._arrow_writer.close()
+            self._arrow_file.close()
+        self._closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+
+
+def write_frame(output_dir, name, df, formats=DEFAULT_FORMATS, timestamp_columns=()):
+    """一次寫入整個 DataFrame (與串流寫入相同的格式)"""
+    with ChunkedResultWriter(output_dir, name, formats=formats, timestamp_columns=timestamp_columns,
+                             rows_per_batch=max(len(df), 1)) as writer:
+        writer.write(df)
+    return writer.paths
+
+
+def _read_arrow_stream(pa, path):
+    """讀取 Arrow IPC 串流；中斷時最後一批可能不完整，只保留可讀取的批次 (連結構描述都無法讀取時回傳 None)"""
+    schema, batches = None, []
+    try:
+        with pa.OSFile(path, 'rb') as source:
+            reader = pa.ipc.open_stream(source)
+            schema = reader.schema
+            for batch in reader:
+                batches.append(batch)
+    except (OSError, pa.ArrowInvalid):
+        pass
+    return None if schema is None else pa.Table.from_batches(batches, schema=schema)
+
+
+def read_results(output_dir, name):
+    """讀取目前已寫出的結果 (分析進行中也可呼叫)，依序讀取 Parquet 分片、Arrow 串流或 CSV"""
+    parquet_dir = os.path.join(output_dir, f"{name}.parquet")
+    parts = sorted(glob.glob(os.path.join(parquet_dir, 'part-*.parquet')))
+    if parts and _import_pyarrow() is not None:
+        return pd.concat([pd.read_parquet(path) for path in parts], ignore_index=True)
+    arrow_path = os.path.join(output_dir, f"{name}.arrows")
+    if os.path.exists(arrow_path) and os.path.getsize(arrow_path) > 0:
+        pa = _import_pyarrow()
+        table = _read_arrow_stream(pa, arrow_path) if pa is not None else None
+        if table is not None:
+            return table.to_pandas()
+    csv_path = os.path.join(output_dir, f"{name}.csv")
+    if os.path.exists(csv_path) and os.path.getsize(csv_path) > 0:
+        # round_trip 解析與寫出時的 repr 完全互逆，讀回的浮點數與記憶體中的結果逐位元相同
+        return pd.read_csv(csv_path, float_precision='round_trip')
+    return pd.DataFrame()
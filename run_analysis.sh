@@ -172,9 +172,9 @@ main() {
   
   if [ "$UPDATE_TLE" = true ]; then
     print_message "更新TLE數據..."
-    # 假設您有一個 update_tle.py 腳本
-    # python update_tle.py
-    print_warning "TLE更新功能暫未實現 (update_tle.py 未找到)"
+    if ! python tle_store.py --refresh; then
+      print_warning "TLE更新失敗，將使用既有的本地快取"
+    fi
   fi
   
   if [ "$ANALYZE" = true ]; then
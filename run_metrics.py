@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+執行指標與效能剖析
+
+分析過程中逐階段記錄牆鐘時間、CPU 時間 (含子行程)、精算的 衛星 × 時間點 數、寫出的位元組數
+與行程的峰值常駐記憶體，寫入輸出目錄的 run_metrics.json，儀表板可據此顯示時間花在哪個階段
+(TLE 下載、解析、傳播、寫出、PNG、熱力圖、報告)。
+
+同名階段重複執行時累加；階段可以巢狀 (例如 analyze 內的 propagation 與 write_coverage)。
+設定 STARLINK_PROFILE=1 或命令列 --profile 時另以 cProfile 剖析整個執行，
+結果存為 profile.pstats (可用 `python -m pstats` 或 snakeviz 檢視)。
+"""
+
+import os
+import sys
+import json
+import time
+import atexit
+import cProfile
+import pstats
+import functools
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+RUN_METRICS_FILE = 'run_metrics.json'
+PROFILE_FILE = 'profile.pstats'
+# 是否預設啟用 cProfile 剖析 (Shiny 背景工作可用環境變數開啟)
+DEFAULT_PROFILE = os.environ.get('STARLINK_PROFILE', '0').lower() in ('1', 'true', 'yes')
+
+
+def peak_rss_mb():
+    """行程至今的峰值常駐記憶體(MB)，無法取得時為 None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KB 回報，macOS 以位元組回報
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def path_size(paths):
+    """檔案或資料夾 (遞迴) 的總位元組數，不存在的路徑計為 0"""
+    if isinstance(paths, str):
+        paths = [paths]
+    total = 0
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+        elif os.path.exists(path):
+            total += os.path.getsize(path)
+    return total
+
+
+def _cpu_seconds():
+    """本行程與已結束子行程的 CPU 時間(秒)"""
+    times = os.times()
+    return time.process_time(), times.children_user + times.children_system
+
+
+class RunMetrics:
+    """逐階段累計的執行指標"""
+
+    def __init__(self):
+        self.started_at = datetime.now(timezone.utc).isoformat()
+        self.phases = {}
+        self.counters = {}
+
+    def _phase_record(self, name):
+        return self.phases.setdefault(name, {
+            'calls': 0,
+            'wall_seconds': 0.0,
+            'cpu_seconds': 0.0,
+            'children_cpu_seconds': 0.0,
+            'satellite_steps': 0,
+            'bytes_written': 0,
+            'peak_rss_mb': None,
+        })
+
+    @contextmanager
+    def phase(self, name):
+        """記錄一個階段的時間與記憶體
+
+        Yields:
+            該階段的紀錄 dict，可在階段內以 add() 累加 satellite_steps、bytes_written
+        """
+        record = self._phase_record(name)
+        wall_start = time.perf_counter()
+        cpu_start, children_start = _cpu_seconds()
+        try:
+            yield record
+        finally:
+            cpu_end, children_end = _cpu_seconds()
+            record['calls'] += 1
+            record['wall_seconds'] += time.perf_counter() - wall_start
+            record['cpu_seconds'] += cpu_end - cpu_start
+            record['children_cpu_seconds'] += children_end - children_start
+            record['peak_rss_mb'] = peak_rss_mb()
+
+    def record(self, name, wall_seconds, cpu_seconds=0.0, satellite_steps=0, bytes_written=0):
+        """記錄在其他地方 (例如子行程) 量測的一次階段執行"""
+        record = self._phase_record(name)
+        record['calls'] += 1
+        record['wall_seconds'] += float(wall_seconds)
+        record['cpu_seconds'] += float(cpu_seconds)
+        self.add(name, satellite_steps, bytes_written)
+
+    def add(self, name, satellite_steps=0, bytes_written=0):
+        """累加某階段精算的 衛星 × 時間點 數與寫出的位元組數"""
+        record = self._phase_record(name)
+        record['satellite_steps'] += int(satellite_steps)
+        record['bytes_written'] += int(bytes_written)
+
+    def timed_iter(self, name, iterable):
+        """逐項產生 iterable 的元素，並將產生每一項所花的時間計入 name 階段
+
+        用於區分生成器內的計算 (例如傳播) 與呼叫端處理每一項的時間 (例如寫出)。
+        """
+        iterator = iter(iterable)
+        while True:
+            with self.phase(name) as record:
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    record['calls'] -= 1
+                    return
+            yield item
+
+    def count(self, name, value):
+        """設定其他計數指標 (例如衛星數、時間點數)"""
+        self.counters[name] = value
+
+    def to_dict(self):
+        """run_metrics.json 的內容 (Python 原生類型)"""
+        phases = {}
+        for name, record in self.phases.items():
+            record = dict(record)
+            record['wall_seconds'] = round(record['wall_seconds'], 4)
+            record['cpu_seconds'] = round(record['cpu_seconds'], 4)
+            record['children_cpu_seconds'] = round(record['children_cpu_seconds'], 4)
+            record['throughput'] = (round(record['satellite_steps'] / record['wall_seconds'])
+                                    if record['satellite_steps'] and record['wall_seconds'] > 0 else None)
+            phases[name] = record
+        return {
+            'started_at': self.started_at,
+            'updated_at': datetime.now(timezone.utc).isoformat(),
+            'pid': os.getpid(),
+            'peak_rss_mb': peak_rss_mb(),
+            'counters': dict(self.counters),
+            'phases': phases,
+        }
+
+    def write(self, output_dir):
+        """寫入 output_dir/run_metrics.json (先寫暫存檔再改名)"""
+        path = os.path.join(output_dir, RUN_METRICS_FILE)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        os.makedirs(output_dir, exist_ok=True)
+        with open(tmp_path, 'w') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+        return path
+
+    def format_table(self):
+        """各階段耗時的文字摘要，依牆鐘時間排序"""
+        lines = [f"{'階段':20s} {'次數':>4s} {'牆鐘(秒)':>9s} {'CPU(秒)':>9s} {'衛星×時間點':>12s} {'寫出(MB)':>9s}"]
+        phases = self.to_dict()['phases']
+        for name, record in sorted(phases.items(), key=lambda item: -item[1]['wall_seconds']):
+            lines.append(f"{name:22s} {record['calls']:4d} {record['wall_seconds']:10.3f} "
+                         f"{record['cpu_seconds'] + record['children_cpu_seconds']:10.3f} "
+                         f"{record['satellite_steps']:14,d} {record['bytes_written'] / 1e6:10.2f}")
+        return '\n'.join(lines)
+
+
+def timed_phase(name):
+    """方法裝飾器：以 name 階段記錄整個方法，結束 (含發生例外) 後寫出 run_metrics.json
+
+    被裝飾的物件需有 metrics (RunMetrics) 與 output_dir 屬性。
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            try:
+                with self.metrics.phase(name):
+                    return method(self, *args, **kwargs)
+            finally:
+                try:
+                    self.metrics.write(self.output_dir)
+                except OSError as e:
+                    print(f"無法寫入 {RUN_METRICS_FILE}: {e}")
+        return wrapper
+    return decorator
+
+
+def start_profiling(output_dir, top=25):
+    """開始以 cProfile 剖析本行程
+
+    停止時 (呼叫回傳的函式，或行程正常結束時自動呼叫) 將結果存為 output_dir/profile.pstats，
+    並列出累計耗時最多的 top 個函式。平行模式的子行程不在剖析範圍內，需要時以 --cpu 1 執行；
+    也可改用 `py-spy record -o profile.svg -- python satellite_analysis.py ...` 取樣剖析 (不需修改程式)。
+
+    Returns:
+        停止剖析並保存結果的函式 (重複呼叫無作用)
+    """
+    profiler = cProfile.Profile()
+    stopped = []
+
+    def stop():
+        if stopped:
+            return
+        stopped.append(True)
+        profiler.disable()
+        os.makedirs(output_dir, exist_ok=True)
+        path = os.path.join(output_dir, PROFILE_FILE)
+        profiler.dump_stats(path)
+        print(f"效能剖析結果已保存至 {path}")
+        pstats.Stats(profiler).sort_stats('cumulative').print_stats(top)
+
+    atexit.register(stop)
+    profiler.enable()
+    return stop
@@ -3,626 +3,746 @@
 
 import os
 import json
+import importlib
 import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
-import matplotlib # Import matplotlib
-# Suppress Matplotlib font warnings early
-import logging
-logging.getLogger('matplotlib.font_manager').setLevel(logging.ERROR)
-import matplotlib.pyplot as plt
+from datetime import datetime
 import argparse
-import requests
-from skyfield.api import load, wgs84, EarthSatellite, utc
-from tqdm import tqdm
-import plotly.express as px
-import plotly.graph_objects as go
-import concurrent.futures
-import matplotlib.font_manager as fm
+from contextlib import nullcontext
+from skyfield.api import wgs84, utc
+from tle_store import TLEStore
+from result_cache import ResultCache, quantize_start
+from result_writer import (ChunkedResultWriter, write_frame, read_results, parse_formats, batch_rows_for_budget,
+                           DEFAULT_FORMATS)
+from checkpoint import AnalysisCheckpoint, DEFAULT_CHECKPOINT_SECONDS
+from coverage_stats import CoverageStats
+from run_metrics import RunMetrics, timed_phase, path_size, start_profiling, DEFAULT_PROFILE
+from analysis_result import AnalysisResult, load_result, remember_result
+from artifact_manifest import ArtifactManifest, render_version
+from report_templates import render_report, render_empty_report
+from rendering import (render_all, render_empty, render_empty_heatmap, render_heatmap, timeline_tasks, resolve_preset,
+                       RENDER_PRESETS, DEFAULT_RENDER_PRESET, DEFAULT_RENDER_WORKERS, HEATMAP_FILE,
+                       timeline_filenames)
+from catalog import load_catalog
+from time_grid import TimeGrid
+from passes import predict_passes, coverage_from_passes
+from handover import HandoverTracker, handovers_from_coverage
+from live import run_live, DEFAULT_WINDOW_MINUTES, DEFAULT_REFRESH_SECONDS
+from handover_policy import VisibilityCube, simulate_policies, policy_grid
+from grid_coverage import RegionGrid, run_grid_analysis, TAIWAN_BOUNDS, DEFAULT_GRID_STEP_DEG
+from propagation import (SatelliteArray, iter_coverage, iter_coverage_parallel, propagate_coverage_sites,
+                         resolve_worker_count, pruning_stats, parse_memory_size, shared_timescale,
+                         DEFAULT_COARSE_STEP_SECONDS, DEFAULT_MIN_ELEVATION)
 
 # 定義台北市的經緯度常數
 TAIPEI_LAT = 25.0330  # 台北市緯度
 TAIPEI_LON = 121.5654  # 台北市經度
 ELEVATION = 10.0  # 假設高度(公尺)
 
-# 設定中文字體，嘗試使用文泉驛微米黑，如果沒有，matplotlib會回退到預設字體
-# 指定中文字體路徑
-chinese_font_path = '/usr/share/fonts/truetype/wqy/wqy-microhei.ttc'  # 文泉驛微米黑字體路徑
-chinese_font_prop = fm.FontProperties(fname=chinese_font_path)
+# 繪圖後端 (matplotlib、plotly 與中文字體) 在第一次使用時才由 plotting.py 載入，
+# 只做計算時不需要付出載入成本；仍可以 satellite_analysis.plt 等名稱取用
+_PLOTTING_NAMES = ('plt', 'fm', 'px', 'go', 'chinese_font_path', 'chinese_font_prop', 'plot_with_chinese_font')
 
-# 更新字體設定
-plt.rcParams['font.sans-serif'] = ['Noto Sans CJK TC', 'WenQuanYi Micro Hei', 'WenQuanYi Zen Hei']
-plt.rcParams['axes.unicode_minus'] = False  # 解決負號顯示問題
+def __getattr__(name):
+    if name in _PLOTTING_NAMES:
+        return getattr(importlib.import_module('plotting'), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-# 定義中文文字繪製函數，將在需要中文文字的地方使用
-def plot_with_chinese_font(title, xlabel, ylabel):
-    plt.title(title, fontproperties=chinese_font_prop)
-    plt.xlabel(xlabel, fontproperties=chinese_font_prop)
-    plt.ylabel(ylabel, fontproperties=chinese_font_prop)
+def load_sites(path):
+    """讀取站點 CSV (欄位 name、lat、lon，可選 elevation_m)，回傳 analyze_sites 使用的站點列表"""
+    sites_df = pd.read_csv(path)
+    missing = {'name', 'lat', 'lon'} - set(sites_df.columns)
+    if missing:
+        raise ValueError(f"站點文件缺少欄位: {', '.join(sorted(missing))}")
+    return sites_df.to_dict('records')
 
-# 將 process_time_point_worker 移至頂層
-def process_time_point_worker(time_data_tuple, worker_sats_list, worker_observer_lat, worker_observer_lon, worker_observer_elev, worker_ts):
-    t_skyfield, time_point_datetime = time_data_tuple # 解包時間元組
-    visible_satellites = []
-    
-    # 從傳入的經緯度和高度重新創建觀測者位置
-    observer_pos = wgs84.latlon(worker_observer_lat, worker_observer_lon, elevation_m=worker_observer_elev)
-
-    if not isinstance(worker_sats_list, list):
-        print(f"警告: 預期 worker_sats_list 為列表，但收到 {type(worker_sats_list)}。跳過此時間點的衛星處理。")
-    else:
-        for sat_obj in worker_sats_list:
-            try:
-                # 修正衛星位置計算方法
-                geocentric = sat_obj.at(t_skyfield)
-                subpoint = wgs84.subpoint(geocentric)
-                difference = sat_obj - observer_pos
-                topocentric = difference.at(t_skyfield)
-                alt, az, distance = topocentric.altaz()
-                
-                if alt.degrees > 25: # 仰角閾值
-                    sat_name = getattr(sat_obj, 'name', f"UnknownSatellite-{id(sat_obj)}")
-                    visible_satellites.append({
-                        'name': sat_name,
-                        'distance_km': distance.km,
-                        'elevation': alt.degrees,
-                        'azimuth': az.degrees,
-                        'timestamp': time_point_datetime.strftime('%Y-%m-%d %H:%M:%S')
-                    })
-            except Exception as e:
-                sat_name = getattr(sat_obj, 'name', f"UnknownSatellite-{id(sat_obj)}")
-                print(f"處理衛星 {sat_name} 在時間點 {time_point_datetime} 時發生錯誤: {e}")
-                continue
-    
-    best_satellite_info = None
-    max_elevation = -90
-    
-    if visible_satellites:
-        for sat_info in visible_satellites:
-            if sat_info['elevation'] > max_elevation:
-                max_elevation = sat_info['elevation']
-                best_satellite_info = sat_info
-    
-    result = {
-        'timestamp': time_point_datetime.strftime('%Y-%m-%d %H:%M:%S'),
-        'visible_count': len(visible_satellites),
-        'visible_satellites': visible_satellites
-    }
-    
-    if best_satellite_info:
-        result['elevation'] = best_satellite_info['elevation']
-        result['best_satellite'] = best_satellite_info['name']
-        result['distance_km'] = best_satellite_info['distance_km']
-    else:
-        result['elevation'] = 0
-        result['best_satellite'] = None
-        result['distance_km'] = 0
-            
-    return result
+# coverage_data.csv 的欄位
+COVERAGE_COLUMNS = ['time', 'visible_satellites', 'best_satellite', 'best_alt', 'best_az', 'best_distance']
 
 class StarlinkAnalysis:
-    def __init__(self, output_dir="output"):
-        """初始化分析類別並下載最新的 TLE 數據"""
+    def __init__(self, output_dir="output", tle_store=None, tle_file=None, result_cache=None,
+                 result_formats=DEFAULT_FORMATS):
+        """初始化分析類別，TLE 數據在第一次使用衛星時才載入
+        
+        Args:
+            output_dir (str): 輸出目錄
+            tle_store (TLEStore): 共用的 TLE 快取，未指定時使用預設快取
+            tle_file (str): 指定的 TLE 文件路徑，指定時不使用快取
+            result_cache (ResultCache): 分析結果快取，None 表示每次都重新計算
+            result_formats: 覆蓋數據的輸出格式 ('csv'、'parquet'、'arrow')，Parquet / Arrow 需要 pyarrow
+        """
         self.output_dir = output_dir
         os.makedirs(output_dir, exist_ok=True)
         
-        # 初始化 skyfield 的時間尺度
-        self.ts = load.timescale()
+        # skyfield 的時間尺度在行程內共用，只載入一次
+        self.ts = shared_timescale()
         
         # 設置觀察者位置（預設為台北市）
         self.observer = wgs84.latlon(TAIPEI_LAT, TAIPEI_LON, elevation_m=ELEVATION)
         
-        # 初始化衛星列表並下載 TLE 數據
-        self.satellites = []
-        self.download_tle_data()
+        # 衛星列表延遲載入，只繪圖的呼叫端不會觸發網路連線
+        self.tle_store = tle_store if tle_store is not None else TLEStore()
+        self.tle_file = tle_file
+        self._catalog = None
+        self._satellites = None
+        self.result_cache = result_cache
+        self.result_formats = parse_formats(result_formats)
+        
+        # 各階段的時間、記憶體與寫出量，寫入 run_metrics.json
+        self.metrics = RunMetrics()
+        
+        # 最近一次分析的結果 (AnalysisResult)，直接交給繪圖與報告使用
+        self.result = None
+        # 最近一次繪製時間線圖的格式，報告依此引用圖檔
+        self.render_format = None
+        
+    @property
+    def timeline_files(self):
+        """時間線圖的檔名 (最近一次繪製的格式，尚未繪製時為預設組合的格式)"""
+        return timeline_filenames(self.render_format or resolve_preset()[1])
+        
+    @property
+    def catalog(self):
+        """預先解析的二進位衛星目錄 (SatelliteCatalog)"""
+        if self._catalog is None:
+            self.download_tle_data()
+        return self._catalog
+    
+    @property
+    def satellites(self):
+        """skyfield EarthSatellite 列表，第一次使用時才由衛星目錄建立"""
+        if self._satellites is None:
+            self._satellites = self.catalog.earth_satellites(self.ts)
+        return self._satellites
+    
+    @property
+    def tle_triples(self):
+        """與 self.satellites 對應的 (名稱, 第一行, 第二行)，供平行模式的子行程重建衛星"""
+        return self.catalog.tle_triples()
         
     def set_observer_location(self, lat, lon, elevation_m=10.0):
         """設置觀察者位置"""
         self.observer = wgs84.latlon(lat, lon, elevation_m=elevation_m)
     
-    def download_tle_data(self):
-        """下載最新的 Starlink TLE 數據"""
-        print("正在下載 Starlink TLE 數據...")
+    def download_tle_data(self, force_refresh=False):
+        """從本地快取載入 Starlink TLE 數據，快取過期時才重新下載
+        
+        Args:
+            force_refresh (bool): 忽略快取有效期限，立即向來源重新驗證
+        """
         try:
-            response = requests.get('https://celestrak.org/NORAD/elements/gp.php?GROUP=starlink&FORMAT=tle')
-            if response.status_code != 200:
-                raise Exception(f"下載失敗，狀態碼：{response.status_code}")
-                
-            tle_data = response.text.strip().split('\n')
+            with self.metrics.phase('tle_download'):
+                if self.tle_file:
+                    print(f"從 {self.tle_file} 載入 TLE 數據...")
+                    with open(self.tle_file, 'r') as f:
+                        tle_data = f.read().strip().split('\n')
+                else:
+                    tle_data = self.tle_store.get_lines(force_refresh=force_refresh)
             if len(tle_data) < 3:
                 raise Exception("TLE 數據格式錯誤")
             
             # 解析 TLE 數據
-            self.satellites = []
-            for i in range(0, len(tle_data), 3):
-                if i + 2 < len(tle_data):
-                    name = tle_data[i].strip()
-                    line1 = tle_data[i + 1]
-                    line2 = tle_data[i + 2]
-                    try:
-                        satellite = EarthSatellite(line1, line2, name, self.ts)
-                        self.satellites.append(satellite)
-                    except Exception as e:
-                        print(f"無法解析衛星 {name}: {str(e)}")
+            self._parse_tle_data(tle_data)
             
-            print(f"成功下載並解析 {len(self.satellites)} 顆 Starlink 衛星的 TLE 數據")
+            print(f"成功載入並解析 {len(self._catalog)} 顆 Starlink 衛星的 TLE 數據")
             
             # 保存 TLE 數據到文件
             tle_file = os.path.join(self.output_dir, 'starlink.tle')
             with open(tle_file, 'w') as f:
-                for i in range(0, len(tle_data), 3):
-                    if i + 2 < len(tle_data):
-                        f.write(f"{tle_data[i]}\n{tle_data[i+1]}\n{tle_data[i+2]}\n")
+                for name, line1, line2 in self._catalog.tle_triples():
+                    f.write(f"{name}\n{line1}\n{line2}\n")
             print(f"TLE 數據已保存到 {tle_file}")
             
         except Exception as e:
-            print(f"下載 TLE 數據時發生錯誤: {str(e)}")
-            # 嘗試從本地文件載入
+            print(f"載入 TLE 數據時發生錯誤: {str(e)}")
+            # 嘗試從輸出目錄中先前保存的文件載入
             tle_file = os.path.join(self.output_dir, 'starlink.tle')
             if os.path.exists(tle_file):
                 print("嘗試從本地文件載入 TLE 數據...")
                 with open(tle_file, 'r') as f:
                     tle_data = f.read().strip().split('\n')
-                for i in range(0, len(tle_data), 3):
-                    if i + 2 < len(tle_data):
-                        name = tle_data[i].strip()
-                        line1 = tle_data[i + 1]
-                        line2 = tle_data[i + 2]
-                        try:
-                            satellite = EarthSatellite(line1, line2, name, self.ts)
-                            self.satellites.append(satellite)
-                        except Exception as e:
-                            print(f"無法解析衛星 {name}: {str(e)}")
-                print(f"從本地文件載入了 {len(self.satellites)} 顆衛星的 TLE 數據")
+                self._parse_tle_data(tle_data)
+                print(f"從本地文件載入了 {len(self._catalog)} 顆衛星的 TLE 數據")
             else:
                 raise Exception("無法下載或載入 TLE 數據")
     
-    def analyze_24h_coverage(self, interval_minutes=1, analysis_duration_minutes=60):
+    def _parse_tle_data(self, tle_data):
+        """將 TLE 文字行載入為二進位衛星目錄 (已編譯過的 TLE 直接以記憶體映射讀取)"""
+        with self.metrics.phase('tle_parse'):
+            self._catalog = load_catalog(tle_data)
+        self._satellites = None
+    
+    @timed_phase('analyze')
+    def analyze_24h_coverage(self, interval_minutes=1, analysis_duration_minutes=60, workers=1,
+                             coarse_step_seconds=None, method='sampling', start=None, progress=None,
+                             keep_in_memory=True, resume=False, checkpoint_seconds=DEFAULT_CHECKPOINT_SECONDS,
+                             max_memory=None):
         """分析衛星覆蓋情況
         
         Args:
-            interval_minutes (int): 分析間隔（分鐘）
+            interval_minutes (float): 分析間隔（分鐘），可為小數以取得秒級解析度（例如 0.1 分鐘 = 6 秒）
             analysis_duration_minutes (int): 分析持續時間（分鐘），預設為60分鐘
+            workers (int): 平行計算的行程數，1 表示單行程，0 表示使用所有可用CPU
+            coarse_step_seconds (float): 啟用兩階段粗篩的粗網格間隔（秒），None 表示逐一精算所有衛星；
+                粗篩為保守估計，結果與逐一精算完全相同
+            method (str): 'sampling' 在每個時間點計算所有衛星；'passes' 先預測過境事件，
+                只在過境區間內計算，並另存 passes.csv
+            start (datetime): 帶時區(UTC)的起始時間；預設為現在，啟用結果快取時向下取整到快取的時間間隔
+            progress: tqdm 類進度條 (需有 update(n) 方法，總量為時間點數)，None 表示在終端顯示 tqdm
+            keep_in_memory (bool): 是否在記憶體中保留完整的 coverage_df；False 時只分批寫入磁碟，
+                記憶體用量與分析時長無關 (此時不寫入結果快取)
+            resume (bool): 輸出目錄中有未完成的檢查點時，由最後完成的批次繼續；
+                分析參數、觀測點與 TLE 沿用檢查點保存的設定，結果與不中斷的執行相同
+            checkpoint_seconds (float): 保存檢查點的最短間隔（秒），None 表示不保存檢查點
+            max_memory: 傳播計算的記憶體預算（位元組數或 '2G' 之類的字串，平行模式為所有行程合計），
+                依預算自動決定時間批次與衛星區塊的大小；None 表示使用固定的批次大小
         """
-        if not self.satellites:
+        checkpoint = AnalysisCheckpoint(self.output_dir, checkpoint_seconds or 0)
+        resumed = checkpoint.load() if resume else None
+        if resumed is not None:
+            config, tle_lines, first_index, _ = resumed
+            self._parse_tle_data(tle_lines)
+            self.set_observer_location(config['lat'], config['lon'], config['elevation_m'])
+            self.result_formats = parse_formats(config['result_formats'])
+            interval_minutes = config['interval_minutes']
+            analysis_duration_minutes = config['analysis_duration_minutes']
+            workers = config['workers']
+            coarse_step_seconds = config['coarse_step_seconds']
+            method = config['method']
+            max_memory = config.get('max_memory')
+            start = datetime.fromisoformat(config['start'])
+            print(f"由檢查點繼續分析：已完成 {first_index} 個時間點")
+        else:
+            if resume:
+                print("沒有可繼續的檢查點，重新開始分析")
+            # 舊的檢查點對應先前的輸出，新的分析開始後即失效
+            checkpoint.clear()
+        
+        if method not in ('sampling', 'passes'):
+            raise ValueError(f"未知的分析方法: {method}")
+        if not len(self.catalog):
             raise ValueError("沒有衛星數據可供分析")
             
-        # 創建時間序列
-        now = datetime.now(utc)
-        times = []
-        # 確保 interval_minutes 是整數
-        interval_minutes = int(interval_minutes)
-        if interval_minutes < 1:
-            interval_minutes = 1
-            
         # 限制分析時間範圍
         max_minutes = min(24 * 60, analysis_duration_minutes)
         print(f"分析時間範圍設定為 {max_minutes} 分鐘")
+        
+        # 結果快取：參數完全相同時直接取回先前的結果
+        start_quantized = start is None and self.result_cache is not None and self.result_cache.time_quantum_seconds > 0
+        if start is None:
+            start = (quantize_start(quantum_seconds=self.result_cache.time_quantum_seconds)
+                     if start_quantized else datetime.now(utc))
+        if start_quantized:
+            print(f"已啟用結果快取，分析起始時間向下取整為 {start.isoformat()} "
+                  f"(每 {self.result_cache.time_quantum_seconds} 秒)")
+        # 實際使用的起始時間記錄在統計數據中，取整後的時間偏移可由此得知
+        start_info = {'analysis_start': start.isoformat(), 'start_quantized': start_quantized}
+        # 分析參數同時作為結果快取的鍵與分析結果的輸入指紋
+        result_params = {
+            'tle_hash': self.catalog.source_hash,
+            'lat': round(float(self.observer.latitude.degrees), 6),
+            'lon': round(float(self.observer.longitude.degrees), 6),
+            'elevation_m': round(float(self.observer.elevation.m), 3),
+            'start': start.isoformat(),
+            'duration_minutes': max_minutes,
+            'interval_minutes': float(interval_minutes),
+            'min_elevation': DEFAULT_MIN_ELEVATION,
+            'method': method,
+            # 設定記憶體預算時傳播改用 float32 工作區，仰角可能差約 1e-5 度，需與 float64 的結果分開快取
+            'max_memory': parse_memory_size(max_memory),
+        }
+        cache_key = None
+        if self.result_cache is not None and resumed is None:
+            cache_key = self.result_cache.make_key(**result_params)
+            with self.metrics.phase('result_cache'):
+                cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                print(f"使用快取的分析結果 ({cache_key})")
+                self.coverage_df, stats = cached
+                # 切換事件由快取的最佳衛星欄位重建 (不需重新傳播)
+                time_grid = TimeGrid.from_interval(start, max_minutes, interval_minutes)
+                self.handovers_df, handover_stats = handovers_from_coverage(
+                    self.coverage_df, SatelliteArray.from_catalog(self.catalog).names, time_grid)
+                stats.update(handover_stats)
+                stats.update(start_info)
+                self.save_results(self.coverage_df, stats, self.handovers_df)
+                self._set_result(self.coverage_df, stats, result_params)
+                return stats
+        
+        # 創建時間網格，並一次轉換為 skyfield 時間陣列
+        time_grid = TimeGrid.from_interval(start, max_minutes, interval_minutes)
+        t = time_grid.to_skyfield(self.ts)
+        
+        # 以向量化引擎分批傳播所有衛星；多行程時依時間分片平行計算。
+        # 每批結果直接附加寫入磁碟，分析進行中即可讀取已完成的部分
+        satellite_array = SatelliteArray.from_catalog(self.catalog)
+        workers = resolve_worker_count(workers)
+        subsecond = time_grid.has_subsecond
+        totals = CoverageStats()
+        handovers = HandoverTracker(satellite_array.names, time_grid, subsecond)
+        frames = []
+        # 每批寫出的列數由記憶體預算推得 (未指定預算時為固定大小)
+        rows_per_batch = batch_rows_for_budget(parse_memory_size(max_memory))
+        writer = ChunkedResultWriter(self.output_dir, 'coverage_data', formats=self.result_formats,
+                                     timestamp_columns=('time',), rows_per_batch=rows_per_batch)
+        # 由檢查點繼續時還原累計狀態，並捨棄檢查點之後寫出的部分結果
+        first_index = 0
+        if resumed is not None:
+            _, _, first_index, state = resumed
+            totals, handovers = state['totals'], state['handovers']
+            writer.resume(state['writer'])
+        elif checkpoint_seconds is not None:
+            checkpoint.begin({
+                'start': time_grid.start.isoformat(),
+                'interval_minutes': float(interval_minutes),
+                'analysis_duration_minutes': analysis_duration_minutes,
+                'workers': workers,
+                'coarse_step_seconds': coarse_step_seconds,
+                'method': method,
+                'lat': float(self.observer.latitude.degrees),
+                'lon': float(self.observer.longitude.degrees),
+                'elevation_m': float(self.observer.elevation.m),
+                'min_elevation': DEFAULT_MIN_ELEVATION,
+                'result_formats': list(self.result_formats),
+                'max_memory': parse_memory_size(max_memory),
+            }, self.tle_triples)
+        if progress is None:
+            from tqdm import tqdm
+        progress_bar = tqdm(total=len(t), desc="分析衛星覆蓋") if progress is None else nullcontext(progress)
+        with progress_bar as progress, writer:
+            if first_index:
+                progress.update(first_index)
+            if method == 'passes':
+                # 事件式：先求各衛星的升起/落下時間，再由過境區間推得每個時間點的結果
+                passes = self.predict_passes(max_minutes, start=time_grid.start,
+                                             coarse_step_seconds=coarse_step_seconds)
+                chunks = self._iter_pass_coverage(satellite_array, passes, time_grid, progress, first_index,
+                                                  rows_per_batch)
+            elif workers > 1 and len(time_grid) > 1:
+                print(f"使用 {workers} 個行程平行計算")
+                chunks = iter_coverage_parallel(self.tle_triples, self.observer, time_grid, workers,
+                                                progress=progress, coarse_step_seconds=coarse_step_seconds,
+                                                first_index=first_index, max_memory=max_memory)
+            else:
+                chunks = iter_coverage(satellite_array, self.observer, t, progress=progress,
+                                       coarse_step_seconds=coarse_step_seconds, first_index=first_index,
+                                       max_memory=max_memory)
             
-        for minutes in range(0, max_minutes, interval_minutes):
-            times.append(now + timedelta(minutes=minutes))
-            
-        # 轉換為 skyfield 時間
-        t = self.ts.from_datetimes(times)
-        
-        # 初始化結果列表
-        results = []
-        
-        # 對每個時間點進行分析
-        for time_point in tqdm(t, desc="分析衛星覆蓋"):
-            visible_sats = []
-            for sat in self.satellites:
-                try:
-                    difference = sat - self.observer
-                    topocentric = difference.at(time_point)
-                    alt, az, distance = topocentric.altaz()
-                    
-                    if alt.degrees > 25:  # 僅考慮仰角大於25度的衛星
-                        visible_sats.append({
-                            'name': sat.name,
-                            'alt': float(alt.degrees),  # 轉換為 Python float
-                            'az': float(az.degrees),    # 轉換為 Python float
-                            'distance': float(distance.km)  # 轉換為 Python float
-                        })
-                except Exception as e:
-                    print(f"計算衛星 {sat.name} 位置時出錯: {str(e)}")
-                    continue
+            # 傳播 (產生每批結果) 與寫出、統計分別計時
+            for start, stop, chunk in self.metrics.timed_iter('propagation', chunks):
+                self.metrics.add('propagation', satellite_steps=np.sum(chunk['evaluated_count']))
+                with self.metrics.phase('write_coverage'):
+                    chunk_df = self._coverage_frame(time_grid[start:stop], chunk, satellite_array.names, subsecond)
+                    writer.write(chunk_df)
+                with self.metrics.phase('stats'):
+                    totals.add(chunk['visible_count'], chunk['evaluated_count'], chunk['best_alt'])
+                    # 每個時間點的最佳衛星已由引擎以 argmax 求得，切換事件在同一次掃描中累計
+                    handovers.update_coverage(start, stop, chunk)
+                if keep_in_memory:
+                    frames.append(chunk_df)
+                if checkpoint_seconds is not None and checkpoint.due():
+                    with self.metrics.phase('checkpoint'):
+                        writer.flush()
+                        checkpoint.save(stop, {'totals': totals, 'handovers': handovers, 'writer': writer.state()})
+            with self.metrics.phase('write_coverage'):
+                writer.close()
+        self.metrics.add('write_coverage', bytes_written=path_size(writer.paths))
+        self.metrics.count('satellites', len(satellite_array))
+        self.metrics.count('time_steps', len(time_grid))
+        self.metrics.count('workers', workers)
+        self.metrics.count('method', method)
+        checkpoint.clear()
+        
+        # 統計數據已在傳播過程中逐批累計（確保使用 Python 原生類型）
+        with self.metrics.phase('stats'):
+            stats = totals.summary(analysis_duration_minutes, interval_minutes)
+            # 粗篩統計：實際精算的 衛星 × 時間點 數與被略過的比例
+            stats.update(pruning_stats(totals.evaluated, len(satellite_array), totals.n_times))
+            stats.update(handovers.summary())
+            stats.update(start_info)
+            self.handovers_df = handovers.events()
+        if coarse_step_seconds:
+            print(f"粗篩略過了 {stats['pruning_rate'] * 100:.1f}% 的 衛星 × 時間點 計算")
+        print(f"共 {stats['handover_count']} 次衛星切換")
+        
+        # 保存結果 (覆蓋數據已分批寫出)
+        self.save_results(stats=stats, handovers_df=self.handovers_df)
+        if keep_in_memory:
+            if first_index:
+                frames.insert(0, self._read_coverage_prefix(time_grid[:first_index], subsecond))
+            coverage_df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=COVERAGE_COLUMNS)
+            self.coverage_df = coverage_df
+            if cache_key is not None:
+                self.result_cache.put(cache_key, coverage_df, stats, result_params)
+            self._set_result(coverage_df, stats, result_params)
+        else:
+            self.coverage_df = None
+            self.result = None
+        
+        return stats
+    
+    def _set_result(self, coverage_df, stats, params):
+        """保存記憶體中的分析結果，繪圖、報告與同一行程內的 Shiny 直接使用，不重新讀取文件"""
+        self.result = AnalysisResult(coverage_df, stats, self.handovers_df, self.output_dir, params=params)
+        remember_result(self.result)
+    
+    def _current_result(self, coverage_df=None):
+        """取得要繪圖或產生報告的分析結果
+        
+        依序使用：指定的覆蓋數據、剛完成的分析結果、輸出目錄中的結果文件 (檔案未變更時不重新解析)。
+        
+        Returns:
+            AnalysisResult；都沒有時為 None
+        """
+        if coverage_df is not None:
+            return AnalysisResult(coverage_df, output_dir=self.output_dir)
+        if self.result is not None:
+            return self.result
+        with self.metrics.phase('load_results'):
+            return load_result(self.output_dir)
+    
+    def _iter_pass_coverage(self, satellite_array, passes, time_grid, progress, first_index=0, rows_per_batch=None):
+        """由過境表分批推得覆蓋結果，格式與 propagation.iter_coverage 相同"""
+        rows_per_batch = rows_per_batch or batch_rows_for_budget()
+        for start in range(first_index, len(time_grid), rows_per_batch):
+            stop = min(start + rows_per_batch, len(time_grid))
+            chunk = coverage_from_passes(satellite_array, self.observer, self.ts, passes, time_grid[start:stop])
+            progress.update(stop - start)
+            yield start, stop, chunk
+    
+    def _read_coverage_prefix(self, time_grid, subsecond=None):
+        """讀回檢查點之前已寫出的覆蓋數據 (由檢查點繼續且需保留完整 coverage_df 時)"""
+        prefix = read_results(self.output_dir, 'coverage_data').head(len(time_grid)).reset_index(drop=True)
+        # 時間欄位以時間網格重建，與直接計算時的字串完全相同；沒有可見衛星時為 None
+        prefix['time'] = time_grid.labels(subsecond)
+        prefix['best_satellite'] = [str(name) if pd.notna(name) else None for name in prefix['best_satellite']]
+        # 數值欄位轉回引擎輸出的型別，不論由 CSV、Parquet 或 Arrow 讀回，都與不中斷的執行相同
+        prefix = prefix.astype({'visible_satellites': np.int64, 'best_alt': np.float64, 'best_az': np.float64,
+                                'best_distance': np.float64})
+        return prefix[COVERAGE_COLUMNS]
+    
+    @staticmethod
+    def _coverage_frame(time_grid, coverage, names, subsecond=None):
+        """將引擎輸出的覆蓋結果轉換為 coverage_data.csv 格式的 DataFrame"""
+        best_index = coverage['best_index']
+        has_best = best_index >= 0
+        return pd.DataFrame({
+            'time': time_grid.labels(subsecond),  # 轉換為字符串
+            'visible_satellites': coverage['visible_count'],
+            'best_satellite': [names[i] if ok else None for i, ok in zip(best_index, has_best)],
+            'best_alt': coverage['best_alt'],
+            'best_az': coverage['best_az'],
+            'best_distance': coverage['best_distance']
+        })
+    
+    @staticmethod
+    def _coverage_summary(coverage_df, analysis_duration_minutes, interval_minutes):
+        """計算 coverage_stats.json 的基本統計數據"""
+        return CoverageStats.from_frame(coverage_df).summary(analysis_duration_minutes, interval_minutes)
+    
+    @timed_phase('analyze_sites')
+    def analyze_sites(self, sites, interval_minutes=1, analysis_duration_minutes=60):
+        """一次傳播，分析多個觀測站點的覆蓋情況
+        
+        衛星位置只計算一次，各站點只做座標轉換，每多一個站點的成本很小。
+        結果保存在 output_dir/sites/<站點名稱>/ 下 (格式與單一站點相同)，
+        並將各站點的統計摘要保存為 sites_summary.csv。
+        
+        Args:
+            sites: 站點列表，每個元素為含 name、lat、lon、elevation_m(可省略) 的 dict
+            interval_minutes (float): 分析間隔（分鐘）
+            analysis_duration_minutes (int): 分析持續時間（分鐘）
+        
+        Returns:
+            dict，站點名稱 -> {'coverage_df': DataFrame, 'stats': dict, 'handovers_df': DataFrame}
+        """
+        if not len(self.catalog):
+            raise ValueError("沒有衛星數據可供分析")
+        if not sites:
+            raise ValueError("沒有指定任何站點")
+        names = [str(site['name']) for site in sites]
+        if len(set(names)) != len(names):
+            raise ValueError("站點名稱不可重複")
+        
+        max_minutes = min(24 * 60, analysis_duration_minutes)
+        time_grid = TimeGrid.from_interval(datetime.now(utc), max_minutes, interval_minutes)
+        t = time_grid.to_skyfield(self.ts)
+        observers = [wgs84.latlon(float(site['lat']), float(site['lon']),
+                                  elevation_m=float(site.get('elevation_m', ELEVATION))) for site in sites]
+        
+        satellite_array = SatelliteArray.from_catalog(self.catalog)
+        from tqdm import tqdm
+        with tqdm(total=len(t), desc=f"分析 {len(sites)} 個站點的覆蓋") as progress:
+            coverages = propagate_coverage_sites(satellite_array, observers, t, progress=progress)
+        
+        results = {}
+        summary = []
+        for site, name, coverage in zip(sites, names, coverages):
+            coverage_df = self._coverage_frame(time_grid, coverage, satellite_array.names)
+            stats = self._coverage_summary(coverage_df, analysis_duration_minutes, interval_minutes)
+            handovers = HandoverTracker(satellite_array.names, time_grid)
+            handovers.update_coverage(0, len(time_grid), coverage)
+            stats.update(handovers.summary())
+            stats.update({'site': name, 'lat': float(site['lat']), 'lon': float(site['lon'])})
             
-            # 找出最佳衛星（仰角最高的）
-            best_sat = max(visible_sats, key=lambda x: x['alt']) if visible_sats else None
+            site_dir = os.path.join(self.output_dir, 'sites', name)
+            os.makedirs(site_dir, exist_ok=True)
+            coverage_df.to_csv(os.path.join(site_dir, 'coverage_data.csv'), index=False)
+            with open(os.path.join(site_dir, 'coverage_stats.json'), 'w') as f:
+                json.dump(stats, f, allow_nan=False)
+            handovers_df = handovers.events()
+            handovers_df.to_csv(os.path.join(site_dir, 'handover_data.csv'), index=False)
             
-            results.append({
-                'time': time_point.utc_datetime().strftime('%Y-%m-%d %H:%M:%S'),  # 轉換為字符串
-                'visible_satellites': len(visible_sats),
-                'best_satellite': best_sat['name'] if best_sat else None,
-                'best_alt': float(best_sat['alt']) if best_sat else None,  # 轉換為 Python float
-                'best_az': float(best_sat['az']) if best_sat else None,    # 轉換為 Python float
-                'best_distance': float(best_sat['distance']) if best_sat else None  # 轉換為 Python float
-            })
-        
-        # 轉換為 DataFrame
-        coverage_df = pd.DataFrame(results)
-        
-        # 計算統計數據（確保使用 Python 原生類型）
-        stats = {
-            'avg_visible_satellites': float(coverage_df['visible_satellites'].mean()),
-            'max_visible_satellites': int(coverage_df['visible_satellites'].max()),
-            'min_visible_satellites': int(coverage_df['visible_satellites'].min()),
-            'coverage_percentage': float((coverage_df['visible_satellites'] > 0).mean() * 100),
-            'analysis_duration_minutes': analysis_duration_minutes
-        }
+            results[name] = {'coverage_df': coverage_df, 'stats': stats, 'handovers_df': handovers_df}
+            summary.append(stats)
         
-        # 保存結果
-        self.save_results(coverage_df, stats)
+        summary_columns = ['site', 'lat', 'lon', 'avg_visible_satellites', 'max_visible_satellites',
+                           'min_visible_satellites', 'coverage_percentage', 'handover_count']
+        pd.DataFrame(summary)[summary_columns].to_csv(os.path.join(self.output_dir, 'sites_summary.csv'),
+                                                      index=False)
+        self.site_results = results
+        return results
+    
+    @timed_phase('analyze_grid')
+    def analyze_grid(self, step_deg=DEFAULT_GRID_STEP_DEG, bounds=TAIWAN_BOUNDS, interval_minutes=1,
+                     analysis_duration_minutes=60, min_elevation=25.0):
+        """分析經緯度網格(預設為台灣本島)上每個時間點的可見衛星數與最高仰角
         
+        結果保存為 grid_coverage.npz (時間 × 緯度 × 經度)、grid_summary.csv、
+        grid_stats.json 與互動式熱力圖 grid_heatmap.html。
+        
+        Args:
+            step_deg (float): 網格間隔（度）
+            bounds (tuple): (最小緯度, 最大緯度, 最小經度, 最大經度)
+            interval_minutes (float): 分析間隔（分鐘）
+            analysis_duration_minutes (int): 分析持續時間（分鐘）
+            min_elevation (float): 最小可見仰角（度）
+        
+        Returns:
+            網格統計數據 dict
+        """
+        if not len(self.catalog):
+            raise ValueError("沒有衛星數據可供分析")
+        
+        max_minutes = min(24 * 60, analysis_duration_minutes)
+        time_grid = TimeGrid.from_interval(datetime.now(utc), max_minutes, interval_minutes)
+        region_grid = RegionGrid.from_bounds(bounds, step_deg)
+        print(f"網格大小: {region_grid.shape[0]} x {region_grid.shape[1]} ({len(region_grid)} 個網格點)")
+        
+        satellite_array = SatelliteArray.from_catalog(self.catalog)
+        from tqdm import tqdm
+        with tqdm(total=len(time_grid), desc="分析網格覆蓋") as progress:
+            grid_coverage, stats = run_grid_analysis(satellite_array, self.ts, time_grid, region_grid,
+                                                     self.output_dir, min_elevation=min_elevation,
+                                                     progress=progress)
+        self.grid_coverage = grid_coverage
         return stats
     
-    def save_results(self, coverage_df=None, stats=None):
-        """保存分析結果"""
-        # 保存覆蓋率數據
-        if coverage_df is not None:
-            coverage_df.to_csv(os.path.join(self.output_dir, 'coverage_data.csv'), index=False)
+    @timed_phase('predict_passes')
+    def predict_passes(self, analysis_duration_minutes=60, start=None, min_elevation=25.0,
+                       coarse_step_seconds=None):
+        """預測時間窗內每顆衛星的過境 (AOS、最高點、LOS)，並保存為 passes.csv
+        
+        Args:
+            analysis_duration_minutes (float): 預測時間窗長度（分鐘）
+            start (datetime): 帶時區(UTC)的起始時間，預設為現在
+            min_elevation (float): 最小可見仰角（度）
+            coarse_step_seconds (float): 粗篩網格間隔（秒），None 表示使用預設值
         
-        # 保存統計數據
-        if stats is not None:
-            with open(os.path.join(self.output_dir, 'coverage_stats.json'), 'w') as f:
-                json.dump(stats, f)
+        Returns:
+            過境表 DataFrame
+        """
+        if not len(self.catalog):
+            raise ValueError("沒有衛星數據可供分析")
+        start = start or datetime.now(utc)
+        passes = predict_passes(SatelliteArray.from_catalog(self.catalog), self.observer, self.ts, start,
+                                analysis_duration_minutes, min_elevation=min_elevation,
+                                coarse_step_seconds=coarse_step_seconds or DEFAULT_COARSE_STEP_SECONDS)
+        print(f"預測到 {len(passes)} 次過境")
+        self.passes_df = passes
+        passes.to_csv(os.path.join(self.output_dir, 'passes.csv'), index=False)
+        return passes
     
-    def generate_visualizations(self):
-        """生成可視化結果"""
-        # 嘗試從文件載入覆蓋率數據
-        coverage_file = os.path.join(self.output_dir, 'coverage_data.csv')
-        if os.path.exists(coverage_file):
-            coverage_df = pd.read_csv(coverage_file)
-        else:
-            # 檢查是否已執行分析
-            if not hasattr(self, 'coverage_df'):
-                print("請先執行分析或確保 coverage_data.csv 文件存在")
-                return
-            coverage_df = self.coverage_df
+    @timed_phase('handover_policies')
+    def compare_handover_policies(self, policies=None, interval_seconds=5, analysis_duration_minutes=24 * 60,
+                                  start=None, coarse_step_seconds=DEFAULT_COARSE_STEP_SECONDS):
+        """以同一次傳播的可見度資料模擬多個選星策略，比較切換頻率與斷線時間，並保存為 handover_policies.csv
+        
+        Args:
+            policies: handover_policy.HandoverPolicy 列表，None 表示預設的參數組合 (含仰角最高策略)
+            interval_seconds (float): 模擬時間步長（秒），應小於排程時槽
+            analysis_duration_minutes (int): 模擬時長（分鐘），上限 24 小時
+            start (datetime): 帶時區(UTC)的起始時間，預設為現在
+            coarse_step_seconds (float): 粗篩網格間隔（秒），None 表示逐一精算所有衛星
+        
+        Returns:
+            每個策略一列的 DataFrame
+        """
+        if not len(self.catalog):
+            raise ValueError("沒有衛星數據可供分析")
+        if policies is None:
+            policies = policy_grid()
+        
+        max_minutes = min(24 * 60, analysis_duration_minutes)
+        time_grid = TimeGrid.from_interval(start or datetime.now(utc), max_minutes, interval_seconds / 60.0)
+        print(f"傳播 {len(time_grid)} 個時間點的可見度資料...")
+        cube = VisibilityCube.from_propagation(SatelliteArray.from_catalog(self.catalog), self.observer, self.ts,
+                                               time_grid, coarse_step_seconds=coarse_step_seconds)
+        print(f"模擬 {len(policies)} 個選星策略...")
+        results = simulate_policies(cube, policies)
+        results.to_csv(os.path.join(self.output_dir, 'handover_policies.csv'), index=False)
+        self.policy_results = results
+        return results
+    
+    def save_results(self, coverage_df=None, stats=None, handovers_df=None):
+        """保存分析結果"""
+        paths = []
+        with self.metrics.phase('save_results'):
+            # 保存覆蓋率數據
+            if coverage_df is not None:
+                paths += write_frame(self.output_dir, 'coverage_data', coverage_df, formats=self.result_formats,
+                                     timestamp_columns=('time',))
+            
+            # 保存衛星切換事件 (Shiny 儀表板讀取 handover_data.csv)
+            if handovers_df is not None:
+                paths += write_frame(self.output_dir, 'handover_data', handovers_df, formats=self.result_formats,
+                                     timestamp_columns=('time', 'switch_time'))
+            
+            # 保存統計數據
+            if stats is not None:
+                stats_path = os.path.join(self.output_dir, 'coverage_stats.json')
+                with open(stats_path, 'w') as f:
+                    json.dump(stats, f, allow_nan=False)
+                paths.append(stats_path)
+        self.metrics.add('save_results', bytes_written=path_size(paths))
+    
+    @timed_phase('visualizations')
+    def generate_visualizations(self, coverage_df=None, preset=None, dpi=None, fmt=None,
+                                workers=DEFAULT_RENDER_WORKERS, force=False):
+        """生成可視化結果 (時間線圖與互動式熱力圖)，各圖表在行程池中同時繪製
+        
+        產物清單 (artifacts.json) 記錄各圖表的輸入指紋，分析結果、程式版本與解析度、格式都未改變時不重新繪製。
+        
+        Args:
+            coverage_df (DataFrame): 覆蓋數據；未指定時使用剛完成的分析結果，沒有時才讀取輸出目錄的結果文件
+            preset (str): 圖表預設組合 ('preview'、'screen'、'print'、'vector')，預設為 print (300 dpi PNG)
+            dpi (int): 覆寫預設組合的解析度
+            fmt (str): 覆寫預設組合的檔案格式 ('png'、'svg'、'pdf' 等 matplotlib 支援的格式)
+            workers (int): 繪圖行程數，0 表示自動決定，1 表示在本行程依序繪製
+            force (bool): 忽略產物清單，重新繪製所有圖表
+        """
+        dpi, fmt = resolve_preset(preset, dpi, fmt)
+        result = self._current_result(coverage_df)
+        if result is None:
+            print("請先執行分析或確保 coverage_data.csv 文件存在")
+            return
+        coverage_df = result.coverage_df
+        manifest = ArtifactManifest(self.output_dir)
+        self.render_format = fmt
             
         # 檢查資料是否為空
-        if coverage_df.empty:
+        if result.empty:
             print("警告：資料為空，無法生成視覺化")
             # 生成空的圖片文件以確保R應用程式不會出錯
-            for filename in ["elevation_timeline.png", "visible_satellites_timeline.png"]:
-                plt.figure(figsize=(12, 6))
-                plt.title('無數據可顯示')
-                plt.text(0.5, 0.5, '沒有可用的衛星數據', horizontalalignment='center', verticalalignment='center', transform=plt.gca().transAxes)
-                plt.tight_layout()
-                plt.savefig(f"{self.output_dir}/{filename}", dpi=300)
-                plt.close()
+            render_all([(render_empty, dict(path=os.path.join(self.output_dir, name), dpi=dpi, fmt=fmt))
+                        for name in timeline_filenames(fmt)], workers=1)
+            # 熱力圖也換成無數據頁面，先前結果的熱力圖與清單紀錄都不再有效
+            render_empty_heatmap(os.path.join(self.output_dir, HEATMAP_FILE))
+            for name in timeline_filenames(fmt) + (HEATMAP_FILE,):
+                manifest.invalidate(name)
             return
 
-        # 生成可見衛星數量時間線圖
-        if 'visible_satellites' in coverage_df.columns and not coverage_df['visible_satellites'].isnull().all():
-            plt.figure(figsize=(12, 6))
-            # 創建時間索引
-            time_indices = range(len(coverage_df))
-            plt.plot(time_indices, coverage_df['visible_satellites'])
-            # 使用中文字體函數
-            plot_with_chinese_font('台北市區可見 Starlink 衛星數量變化', '時間 (分鐘)', '可見衛星數量 (個)')
-            plt.grid(True, linestyle='--', alpha=0.7)
-            
-            # 設置X軸刻度，每5分鐘一個刻度
-            if len(coverage_df) > 20:
-                step = max(1, len(coverage_df) // 10)  # 不超過10個刻度
-                plt.xticks(time_indices[::step])
-            
-            plt.tight_layout()
-            plt.savefig(f"{self.output_dir}/visible_satellites_timeline.png", dpi=300)
-            plt.close()
-        else:
-            print("警告：缺少 visible_satellites 數據或數據全為 NaN，無法生成可見衛星數量圖")
-            plt.figure(figsize=(12, 6))
-            # 使用中文字體函數
-            plot_with_chinese_font('台北市區可見 Starlink 衛星數量變化 (無數據)', '時間點', '可見衛星數量 (個)')
-            plt.text(0.5, 0.5, '缺少可見衛星數量數據', horizontalalignment='center', verticalalignment='center', transform=plt.gca().transAxes)
-            plt.tight_layout()
-            plt.savefig(f"{self.output_dir}/visible_satellites_timeline.png", dpi=300)
-            plt.close()
-
-        # 生成最大仰角時間線圖
-        if 'best_alt' in coverage_df.columns and not coverage_df['best_alt'].isnull().all():
-            plt.figure(figsize=(12, 6))
-            # 創建時間索引
-            time_indices = range(len(coverage_df))
-            plt.plot(time_indices, coverage_df['best_alt'])
-            # 使用中文字體函數
-            plot_with_chinese_font('衛星最大仰角隨時間變化', '時間 (分鐘)', '最大仰角 (度)')
-            plt.grid(True, linestyle='--', alpha=0.7)
-            
-            # 設置X軸刻度，每5分鐘一個刻度
-            if len(coverage_df) > 20:
-                step = max(1, len(coverage_df) // 10)  # 不超過10個刻度
-                plt.xticks(time_indices[::step])
-            
-            plt.tight_layout()
-            plt.savefig(f"{self.output_dir}/elevation_timeline.png", dpi=300)
-            plt.close()
-        else:
-            print("警告：缺少 best_alt 數據或數據全為 NaN，無法生成仰角圖")
-            plt.figure(figsize=(12, 6))
-            # 使用中文字體函數
-            plot_with_chinese_font('衛星最大仰角隨時間變化 (無數據)', '時間', '最大仰角 (度)')
-            plt.text(0.5, 0.5, '缺少仰角數據', horizontalalignment='center', verticalalignment='center', transform=plt.gca().transAxes)
-            plt.tight_layout()
-            plt.savefig(f"{self.output_dir}/elevation_timeline.png", dpi=300)
-            plt.close()
+        def column(name):
+            return coverage_df[name].to_numpy(dtype=float) if name in coverage_df.columns else None
 
-        # 生成熱力圖
-        self._generate_heatmap(coverage_df)
+        # 各產物的輸入指紋：分析結果與程式版本，時間線圖另含解析度與格式
+        heatmap_inputs = f"{result.key}:{render_version()}"
+        timeline_inputs = f"{heatmap_inputs}:{dpi}:{fmt}"
+        visible_counts = column('visible_satellites')
+        tasks, phases = [], []
+        for task in timeline_tasks(self.output_dir, visible_counts, column('best_alt'), dpi, fmt):
+            name = os.path.basename(task[1]['path'])
+            if force or not manifest.is_current(name, timeline_inputs):
+                tasks.append(task)
+                phases.append((name, timeline_inputs, fmt))
+        if force or not manifest.is_current(HEATMAP_FILE, heatmap_inputs):
+            tasks.append((render_heatmap, dict(path=os.path.join(self.output_dir, HEATMAP_FILE),
+                                               visible_counts=np.nan_to_num(visible_counts) if visible_counts is not None
+                                               else np.zeros(len(coverage_df)))))
+            phases.append((HEATMAP_FILE, heatmap_inputs, 'heatmap'))
+        if not tasks:
+            print("圖表的輸入未改變，沿用現有的視覺化結果")
+            return
+        
+        # 各圖表在子行程中的繪製時間分別以圖表格式 (png、svg 等) 與 heatmap 為階段名稱記錄
+        with self.metrics.phase('render'):
+            results = render_all(tasks, workers=workers)
+        for (path, wall_seconds, cpu_seconds), (name, inputs, phase) in zip(results, phases):
+            self.metrics.record(phase, wall_seconds, cpu_seconds, bytes_written=path_size(path))
+            manifest.record(name, inputs, path)
 
         print("視覺化生成完成")
         
-    def _generate_heatmap(self, coverage_df):
-        """生成互動式熱力圖"""
-        try:
-            # 獲取分析持續時間（分鐘）
-            duration_minutes = len(coverage_df)
-            
-            # 計算小時和分鐘
-            hours = duration_minutes // 60
-            minutes = duration_minutes % 60
-            
-            if hours == 0:
-                # 如果分析時間少於一小時，只顯示分鐘
-                # 創建熱力圖的基本數據
-                data = np.zeros((1, minutes))
-                
-                # 遍歷每個時間點，填充數據
-                for i, row in coverage_df.iterrows():
-                    if i >= minutes:
-                        break
-                    data[0, i] = row['visible_satellites']
-                
-                # 創建時間標籤
-                hour_labels = ["00:00"]
-                
-                # 創建熱力圖
-                fig = px.imshow(data,
-                            labels=dict(x="分鐘", y="", color="可見衛星數"),
-                            x=[f"{m:02d}" for m in range(minutes)],
-                            y=hour_labels,
-                            title=f"衛星覆蓋熱力圖 ({minutes}分鐘分析)",
-                            color_continuous_scale="Viridis",
-                            aspect="auto")
-                
-            else:
-                # 創建熱力圖的基本數據
-                data = np.zeros((hours+1, 60))
-                
-                # 遍歷每個時間點，填充數據
-                for i, row in coverage_df.iterrows():
-                    if i >= duration_minutes:
-                        break
-                        
-                    hour = i // 60
-                    minute = i % 60
-                    data[hour, minute] = row['visible_satellites']
-                
-                # 創建時間標籤
-                hour_labels = [f"{h:02d}:00" for h in range(hours+1)]
-                
-                # 創建熱力圖
-                fig = px.imshow(data,
-                            labels=dict(x="分鐘", y="小時", color="可見衛星數"),
-                            x=[f"{m:02d}" for m in range(60)],
-                            y=hour_labels,
-                            title=f"衛星覆蓋熱力圖 ({hours}小時{minutes}分鐘分析)",
-                            color_continuous_scale="Viridis",
-                            aspect="auto")
-            
-            # 增加交互元素
-            fig.update_traces(
-                hovertemplate="時間: %{y}:%{x}<br>可見衛星數: %{z}<extra></extra>"
-            )
-            
-            # 調整布局
-            fig.update_layout(
-                autosize=True,
-                height=800,
-                margin=dict(t=50, l=50, b=50, r=50),
-                font=dict(family="Arial", size=12),
-            )
-            
-            # 保存為HTML文件
-            fig.write_html(f"{self.output_dir}/coverage_heatmap.html")
-            print(f"熱力圖已保存至 {self.output_dir}/coverage_heatmap.html")
-            
-        except Exception as e:
-            print(f"生成熱力圖時出錯: {e}")
-            # 創建一個簡單的錯誤頁面
-            with open(f"{self.output_dir}/coverage_heatmap.html", 'w') as f:
-                f.write("""
-                <!DOCTYPE html>
-                <html>
-                <head>
-                    <title>覆蓋率熱力圖</title>
-                    <style>
-                        body { 
-                            font-family: 'Noto Sans TC', Arial, sans-serif; 
-                            text-align: center; 
-                            margin-top: 50px;
-                            background-color: #f8f9fa;
-                        }
-                        .error-box {
-                            max-width: 600px;
-                            margin: 0 auto;
-                            background: white;
-                            border-radius: 8px;
-                            padding: 30px;
-                            box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-                        }
-                        h2 {
-                            color: #e74c3c;
-                        }
-                    </style>
-                </head>
-                <body>
-                    <div class="error-box">
-                        <h2>覆蓋率熱力圖</h2>
-                        <p>生成熱力圖時發生錯誤。請檢查日誌了解詳情。</p>
-                        <p>錯誤信息: """ + str(e) + """</p>
-                    </div>
-                </body>
-                </html>
-                """)
-    
-    def export_html_report(self):
-        """生成HTML報告"""
-        # 嘗試從文件載入覆蓋率數據
-        coverage_file = os.path.join(self.output_dir, 'coverage_data.csv')
-        stats_file = os.path.join(self.output_dir, 'coverage_stats.json')
-        
-        if os.path.exists(coverage_file):
-            coverage_df = pd.read_csv(coverage_file)
-        else:
-            # 檢查是否已執行分析
-            if not hasattr(self, 'coverage_df'):
-                print("請先執行分析或確保 coverage_data.csv 文件存在")
-                report_path = os.path.join(self.output_dir, 'report.html')
-                self._generate_empty_report(report_path)
-                return report_path
-            coverage_df = self.coverage_df
-            
-        # 載入統計數據
-        if os.path.exists(stats_file):
-            with open(stats_file, 'r') as f:
-                stats = json.load(f)
-        else:
-            # 計算統計數據
-            stats = self._calculate_stats(coverage_df)
+    @timed_phase('html_report')
+    def export_html_report(self, force=False):
+        """生成HTML報告
+        
+        使用剛完成的分析結果 (沒有時讀取輸出目錄的結果文件)，以預先建立的模板產生報告；
+        報告引用最近一次 generate_visualizations 繪製格式的時間線圖。
+        分析結果、程式版本、觀測點與圖檔格式都未改變時沿用現有的報告。
+        
+        Args:
+            force (bool): 忽略產物清單，重新產生報告
+        """
+        report_path = os.path.join(self.output_dir, 'report.html')
+        result = self._current_result()
+        if result is None:
+            print("請先執行分析或確保 coverage_data.csv 文件存在")
+            self._generate_empty_report(report_path)
+            return report_path
             
         # 檢查資料是否為空
-        if coverage_df.empty:
+        if result.empty:
             print("警告：資料為空，無法生成 HTML 報告")
-            report_path = os.path.join(self.output_dir, 'report.html')
             self._generate_empty_report(report_path)
             return report_path
+        
+        latitude = float(self.observer.latitude.degrees)
+        longitude = float(self.observer.longitude.degrees)
+        manifest = ArtifactManifest(self.output_dir)
+        timeline_files = self.timeline_files
+        inputs = f"{result.key}:{render_version()}:{latitude:.4f}:{longitude:.4f}:{','.join(timeline_files)}"
+        if not force and manifest.is_current('report.html', inputs):
+            print(f"報告的輸入未改變，沿用現有的 HTML 報告 {report_path}")
+            return report_path
+            
+        # 沒有統計數據時由覆蓋數據計算
+        stats = result.stats if result.stats is not None else self._calculate_stats(result.coverage_df)
             
         # 生成HTML報告
-        report_path = os.path.join(self.output_dir, 'report.html')
-        self._generate_html_report(report_path, coverage_df, stats)
+        self._generate_html_report(report_path, stats, timeline_files)
+        manifest.record('report.html', inputs, report_path)
+        self.metrics.add('html_report', bytes_written=path_size(report_path))
         print(f"HTML報告已保存至 {report_path}")
         return report_path
         
     def _generate_empty_report(self, report_path):
         """生成空報告"""
-        empty_html = """
-        <!DOCTYPE html>
-        <html lang="zh-TW">
-        <head>
-            <meta charset="UTF-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            <title>台北市 Starlink 衛星覆蓋分析報告</title>
-            <link href="https://fonts.googleapis.com/css2?family=Noto+Sans+TC:wght@300;400;500;700&display=swap" rel="stylesheet">
-            <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/5.15.3/css/all.min.css">
-            <style>
-                body {
-                    font-family: 'Noto Sans TC', sans-serif;
-                    line-height: 1.6;
-                    margin: 0;
-                    padding: 0;
-                    color: #333;
-                    background-color: #f5f7fa;
-                }
-                .container {
-                    max-width: 1200px;
-                    margin: 0 auto;
-                    padding: 20px;
-                }
-                header {
-                    background-color: #e74c3c;
-                    color: white;
-                    padding: 20px 0;
-                    margin-bottom: 30px;
-                    border-radius: 8px;
-                    box-shadow: 0 4px 6px rgba(0,0,0,0.1);
-                    text-align: center;
-                }
-                h1 {
-                    margin: 0;
-                    font-size: 2.5em;
-                    font-weight: 700;
-                }
-                .warning-box {
-                    background-color: white;
-                    border-radius: 8px;
-                    padding: 30px;
-                    margin: 40px auto;
-                    box-shadow: 0 2px 10px rgba(0,0,0,0.05);
-                    text-align: center;
-                    max-width: 600px;
-                }
-                .warning-icon {
-                    font-size: 60px;
-                    color: #e74c3c;
-                    margin-bottom: 20px;
-                }
-                .warning {
-                    color: #e74c3c;
-                    font-size: 1.5em;
-                    font-weight: 700;
-                    margin-bottom: 20px;
-                }
-                .message {
-                    font-size: 1.1em;
-                    color: #7f8c8d;
-                }
-                footer {
-                    text-align: center;
-                    margin-top: 50px;
-                    padding: 20px;
-                    color: #7f8c8d;
-                    font-size: 0.9em;
-                }
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <header>
-                    <h1>台北市 Starlink 衛星覆蓋分析報告</h1>
-                </header>
-
-                <div class="warning-box">
-                    <div class="warning-icon">
-                        <i class="fas fa-exclamation-triangle"></i>
-                    </div>
-                    <div class="warning">無法生成報告</div>
-                    <div class="message">分析結果為空，請檢查日誌以獲取更多信息</div>
-                </div>
-
-                <footer>
-                    生成於 """ + datetime.now(utc).strftime('%Y-%m-%d %H:%M:%S') + """ · 台北市 Starlink 衛星分析系統
-                </footer>
-            </div>
-        </body>
-        </html>
-        """
         with open(report_path, "w") as f:
-            f.write(empty_html)
+            f.write(render_empty_report(datetime.now(utc).strftime('%Y-%m-%d %H:%M:%S')))
+        ArtifactManifest(self.output_dir).invalidate('report.html')
         print(f"空報告已生成至 {report_path}")
         
     def _calculate_stats(self, coverage_df):
         """從覆蓋率數據計算統計數據"""
         try:
-            stats = {
-                'avg_visible_satellites': float(coverage_df['visible_satellites'].mean()),
-                'max_visible_satellites': int(coverage_df['visible_satellites'].max()),
-                'min_visible_satellites': int(coverage_df['visible_satellites'].min()),
-                'coverage_percentage': float((coverage_df['visible_satellites'] > 0).mean() * 100)
-            }
-            
-            # 如果有最佳仰角數據
-            if 'best_alt' in coverage_df.columns and not coverage_df['best_alt'].isnull().all():
-                stats['avg_elevation'] = float(coverage_df['best_alt'].mean())
-                stats['max_elevation'] = float(coverage_df['best_alt'].max())
-            else:
-                stats['avg_elevation'] = 0
-                stats['max_elevation'] = 0
-                
-            return stats
+            # 時間間隔由時間欄位推得，用於換算斷線時間
+            interval_minutes = None
+            if len(coverage_df) > 1:
+                times = pd.to_datetime(coverage_df['time'].iloc[:2])
+                interval_minutes = (times.iloc[1] - times.iloc[0]).total_seconds() / 60.0
+            # 沒有最佳仰角數據時 CoverageStats 以 0 表示
+            return CoverageStats.from_frame(coverage_df).summary(interval_minutes=interval_minutes)
         except Exception as e:
             print(f"計算統計數據時出錯: {e}")
             return {
@@ -634,206 +754,10 @@ class StarlinkAnalysis:
                 'max_elevation': 0
             }
             
-    def _generate_html_report(self, report_path, coverage_df, stats):
-        """生成HTML報告"""
-        # 獲取輸出目錄的絕對路徑
-        abs_output_dir = os.path.abspath(self.output_dir)
-        
-        html_content = f"""
-        <!DOCTYPE html>
-        <html lang="zh-TW">
-        <head>
-            <meta charset="UTF-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            <title>台北市 Starlink 衛星覆蓋分析報告</title>
-            <link href="https://fonts.googleapis.com/css2?family=Noto+Sans+TC:wght@300;400;500;700&display=swap" rel="stylesheet">
-            <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/5.15.3/css/all.min.css">
-            <style>
-                body {{
-                    font-family: 'Noto Sans TC', sans-serif;
-                    line-height: 1.6;
-                    margin: 0;
-                    padding: 0;
-                    color: #333;
-                    background-color: #f5f7fa;
-                }}
-                .container {{
-                    max-width: 1200px;
-                    margin: 0 auto;
-                    padding: 20px;
-                }}
-                header {{
-                    background-color: #3498db;
-                    color: white;
-                    padding: 20px 0;
-                    margin-bottom: 30px;
-                    border-radius: 8px;
-                    box-shadow: 0 4px 6px rgba(0,0,0,0.1);
-                    text-align: center;
-                }}
-                h1 {{
-                    margin: 0;
-                    font-size: 2.5em;
-                    font-weight: 700;
-                }}
-                .analysis-time {{
-                    margin-top: 10px;
-                    font-style: italic;
-                    opacity: 0.8;
-                }}
-                h2 {{
-                    color: #2980b9;
-                    padding-bottom: 10px;
-                    border-bottom: 2px solid #eee;
-                    margin-top: 40px;
-                    margin-bottom: 30px;
-                }}
-                h3 {{
-                    color: #3498db;
-                    margin-top: 30px;
-                }}
-                .stats-container {{
-                    display: flex;
-                    flex-wrap: wrap;
-                    gap: 20px;
-                    margin-bottom: 40px;
-                }}
-                .stat-card {{
-                    background-color: white;
-                    border-radius: 8px;
-                    padding: 20px;
-                    flex: 1 1 220px;
-                    box-shadow: 0 2px 10px rgba(0,0,0,0.05);
-                    transition: transform 0.3s, box-shadow 0.3s;
-                }}
-                .stat-card:hover {{
-                    transform: translateY(-5px);
-                    box-shadow: 0 5px 15px rgba(0,0,0,0.1);
-                }}
-                .stat-title {{
-                    font-size: 1em;
-                    color: #7f8c8d;
-                    margin-bottom: 10px;
-                    display: flex;
-                    align-items: center;
-                }}
-                .stat-title i {{
-                    margin-right: 8px;
-                    color: #3498db;
-                }}
-                .stat-value {{
-                    font-size: 2.2em;
-                    font-weight: 700;
-                    color: #2980b9;
-                }}
-                .visualization-container {{
-                    background-color: white;
-                    border-radius: 8px;
-                    padding: 20px;
-                    margin-bottom: 30px;
-                    box-shadow: 0 2px 10px rgba(0,0,0,0.05);
-                }}
-                img {{
-                    max-width: 100%;
-                    height: auto;
-                    border-radius: 8px;
-                    display: block;
-                    margin: 20px auto;
-                    border: 1px solid #eee;
-                }}
-                iframe {{
-                    width: 100%;
-                    border: none;
-                    border-radius: 8px;
-                    box-shadow: 0 2px 10px rgba(0,0,0,0.05);
-                }}
-                .analysis-params {{
-                    background-color: #eef2f5;
-                    border-radius: 8px;
-                    padding: 15px;
-                    margin-top: 20px;
-                    margin-bottom: 30px;
-                }}
-                .param-title {{
-                    font-weight: 700;
-                    color: #34495e;
-                    display: inline-block;
-                    width: 180px;
-                }}
-                footer {{
-                    text-align: center;
-                    margin-top: 50px;
-                    padding: 20px;
-                    color: #7f8c8d;
-                    font-size: 0.9em;
-                }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <header>
-                    <h1>台北市 Starlink 衛星覆蓋分析報告</h1>
-                    <div class="analysis-time">分析時間: {datetime.now(utc).strftime('%Y-%m-%d %H:%M:%S')} UTC</div>
-                </header>
-                
-                <div class="analysis-params">
-                    <div><span class="param-title">分析持續時間:</span> {stats.get('analysis_duration_minutes', 60)} 分鐘</div>
-                    <div><span class="param-title">觀測位置:</span> 緯度 {self.observer.latitude.degrees:.4f}°, 經度 {self.observer.longitude.degrees:.4f}°</div>
-                </div>
-                
-                <h2><i class="fas fa-chart-bar"></i> 主要統計數據</h2>
-                <div class="stats-container">
-                    <div class="stat-card">
-                        <div class="stat-title"><i class="fas fa-satellite"></i> 平均可見衛星數</div>
-                        <div class="stat-value">{stats.get('avg_visible_satellites', 0):.1f}</div>
-                    </div>
-                    <div class="stat-card">
-                        <div class="stat-title"><i class="fas fa-satellite-dish"></i> 最大可見衛星數</div>
-                        <div class="stat-value">{stats.get('max_visible_satellites', 0)}</div>
-                    </div>
-                    <div class="stat-card">
-                        <div class="stat-title"><i class="fas fa-satellite"></i> 最小可見衛星數</div>
-                        <div class="stat-value">{stats.get('min_visible_satellites', 0)}</div>
-                    </div>
-                    <div class="stat-card">
-                        <div class="stat-title"><i class="fas fa-angle-up"></i> 平均最佳仰角</div>
-                        <div class="stat-value">{stats.get('avg_elevation', 0):.1f}°</div>
-                    </div>
-                    <div class="stat-card">
-                        <div class="stat-title"><i class="fas fa-angle-double-up"></i> 最大仰角</div>
-                        <div class="stat-value">{stats.get('max_elevation', 0):.1f}°</div>
-                    </div>
-                    <div class="stat-card">
-                        <div class="stat-title"><i class="fas fa-signal"></i> 衛星覆蓋率</div>
-                        <div class="stat-value">{stats.get('coverage_percentage', 0):.1f}%</div>
-                    </div>
-                </div>
-                
-                <h2><i class="fas fa-chart-line"></i> 視覺化結果</h2>
-                
-                <div class="visualization-container">
-                    <h3><i class="fas fa-satellite"></i> 可見衛星數量時間線</h3>
-                    <img src="./visible_satellites_timeline.png" alt="可見衛星數量時間線">
-                </div>
-                
-                <div class="visualization-container">
-                    <h3><i class="fas fa-angle-up"></i> 最佳衛星仰角時間線</h3>
-                    <img src="./elevation_timeline.png" alt="最佳衛星仰角時間線">
-                </div>
-                
-                <div class="visualization-container">
-                    <h3><i class="fas fa-fire"></i> 衛星覆蓋熱力圖</h3>
-                    <iframe src="./coverage_heatmap.html" width="100%" height="600px"></iframe>
-                </div>
-                
-                <footer>
-                    生成於 {datetime.now(utc).strftime('%Y-%m-%d %H:%M:%S')} · 台北市 Starlink 衛星分析系統
-                </footer>
-            </div>
-        </body>
-        </html>
-        """
-        
+    def _generate_html_report(self, report_path, stats, timeline_files):
+        """以預先建立的模板生成HTML報告"""
+        html_content = render_report(stats, self.observer.latitude.degrees, self.observer.longitude.degrees,
+                                     datetime.now(utc).strftime('%Y-%m-%d %H:%M:%S'), timeline_files)
         with open(report_path, "w") as f:
             f.write(html_content)
 
@@ -845,17 +769,107 @@ if __name__ == "__main__":
     parser.add_argument('--cpu', type=int, default=0, help='使用的CPU數量 (0表示使用所有可用CPU)')
     parser.add_argument('--interval', type=float, default=1.0, help='分析間隔 (分鐘)')
     parser.add_argument('--duration', type=int, default=60, help='分析持續時間 (分鐘), 預設為60分鐘')
+    parser.add_argument('--prune', action='store_true', help='啟用兩階段粗篩 (結果與逐一精算相同，速度更快)')
+    parser.add_argument('--method', choices=['sampling', 'passes'], default='sampling',
+                        help='sampling: 每個時間點計算所有衛星；passes: 由過境事件推得覆蓋結果')
+    parser.add_argument('--coarse-step', type=float, default=DEFAULT_COARSE_STEP_SECONDS, help='粗篩網格間隔 (秒)')
+    parser.add_argument('--sites', default=None, help='站點 CSV (name,lat,lon[,elevation_m])，指定時一次傳播分析所有站點')
+    parser.add_argument('--grid', action='store_true', help='分析台灣本島經緯度網格的覆蓋 (輸出 grid_coverage.npz 與 grid_heatmap.html)')
+    parser.add_argument('--grid-step', type=float, default=DEFAULT_GRID_STEP_DEG, help='網格間隔 (度)')
+    parser.add_argument('--handover-policies', action='store_true',
+                        help='以同一次傳播比較多個選星策略的切換頻率與斷線時間 (輸出 handover_policies.csv)')
+    parser.add_argument('--policy-step', type=float, default=5.0, help='選星策略模擬的時間步長 (秒)')
+    parser.add_argument('--live', action='store_true',
+                        help='即時模式：持續更新往後的滑動視窗 (輸出 live_coverage.csv、live_visible.csv、live_status.json)')
+    parser.add_argument('--live-window', type=float, default=DEFAULT_WINDOW_MINUTES, help='即時模式的視窗長度 (分鐘)')
+    parser.add_argument('--live-refresh', type=float, default=DEFAULT_REFRESH_SECONDS, help='即時模式的更新頻率 (秒)')
+    parser.add_argument('--format', default=','.join(DEFAULT_FORMATS),
+                        help='覆蓋數據輸出格式，以逗號分隔 (csv、parquet、arrow；後兩者需要 pyarrow)，預設只輸出 CSV')
+    parser.add_argument('--parquet', action='store_true', help='另外輸出 Parquet 分片 (需要 pyarrow)')
+    parser.add_argument('--arrow', action='store_true', help='另外輸出 Arrow IPC 串流 (需要 pyarrow)')
+    parser.add_argument('--max-memory', default=None,
+                        help='傳播計算的記憶體預算 (例如 2G、512M)，依預算自動決定批次大小並以 float32 計算')
+    parser.add_argument('--resume', action='store_true',
+                        help='由輸出目錄中的檢查點繼續先前中斷的分析 (沿用原本的參數與 TLE)')
+    parser.add_argument('--result-cache', action='store_true', help='啟用分析結果快取 (參數相同時直接取回先前結果)')
+    parser.add_argument('--offline', action='store_true', help='離線模式，只使用本地 TLE 快取')
+    parser.add_argument('--tle-max-age', type=float, default=None, help='TLE 快取有效期限 (小時)')
+    parser.add_argument('--refresh-tle', action='store_true', help='忽略快取有效期限，重新驗證 TLE 數據')
+    parser.add_argument('--render-preset', choices=sorted(RENDER_PRESETS), default=DEFAULT_RENDER_PRESET,
+                        help='圖表解析度與格式 (preview: 72 dpi、screen: 150 dpi、print: 300 dpi PNG、vector: SVG)')
+    parser.add_argument('--force-render', action='store_true',
+                        help='忽略產物清單 (artifacts.json)，重新產生所有圖表與報告')
+    parser.add_argument('--profile', action='store_true', default=DEFAULT_PROFILE,
+                        help='以 cProfile 剖析整個執行，結果存為輸出目錄中的 profile.pstats')
     args = parser.parse_args()
     
+    if args.profile:
+        start_profiling(args.output)
+    
+    # Parquet / Arrow 為選用格式，以 --parquet / --arrow 加到 --format 之後
+    result_formats = list(parse_formats(args.format))
+    result_formats += [fmt for fmt, enabled in (('parquet', args.parquet), ('arrow', args.arrow))
+                       if enabled and fmt not in result_formats]
+    
     # 創建分析器物件
-    analyzer = StarlinkAnalysis(output_dir=args.output)
+    tle_store = TLEStore(max_age_hours=args.tle_max_age, offline=args.offline)
+    analyzer = StarlinkAnalysis(output_dir=args.output, tle_store=tle_store, tle_file=args.tle,
+                                result_cache=ResultCache() if args.result_cache else None,
+                                result_formats=result_formats)
+    if args.refresh_tle:
+        analyzer.download_tle_data(force_refresh=True)
+    
+    # 多站點批次模式：一次傳播，輸出各站點的覆蓋數據與摘要
+    if args.sites:
+        site_results = analyzer.analyze_sites(load_sites(args.sites), interval_minutes=args.interval,
+                                              analysis_duration_minutes=args.duration)
+        print(f"\n==== 多站點分析結果摘要 ====")
+        for name, result in site_results.items():
+            print(f"{name}: 平均可見衛星數量 {result['stats']['avg_visible_satellites']:.2f}，"
+                  f"覆蓋率 {result['stats']['coverage_percentage']:.1f}%")
+        print("============================\n")
+        raise SystemExit(0)
+    
+    # 區域網格模式：輸出 時間 × 緯度 × 經度 的覆蓋陣列與熱力圖
+    if args.grid:
+        grid_stats = analyzer.analyze_grid(step_deg=args.grid_step, interval_minutes=args.interval,
+                                           analysis_duration_minutes=args.duration)
+        print(f"\n==== 網格分析結果摘要 ====")
+        print(f"網格平均可見衛星數量: {grid_stats['avg_visible_satellites']:.2f}")
+        print(f"網格最小可見衛星數量: {grid_stats['min_visible_satellites']}")
+        print(f"網格覆蓋率: {grid_stats['coverage_percentage']:.1f}%")
+        print("============================\n")
+        raise SystemExit(0)
+    
+    # 即時模式：時間前進時只傳播新進入視窗的時間點，直到 Ctrl-C
+    if args.live:
+        run_live(analyzer, window_minutes=args.live_window, interval_seconds=args.interval * 60,
+                 refresh_seconds=args.live_refresh)
+        raise SystemExit(0)
+    
+    # 選星策略比較：傳播一次，重播所有策略
+    if args.handover_policies:
+        policy_results = analyzer.compare_handover_policies(interval_seconds=args.policy_step,
+                                                            analysis_duration_minutes=args.duration,
+                                                            coarse_step_seconds=args.coarse_step)
+        print(f"\n==== 選星策略比較 (依切換頻率排序) ====")
+        for _, row in policy_results.sort_values('handovers_per_hour').iterrows():
+            print(f"{row['policy']}: 每小時切換 {row['handovers_per_hour']:.1f} 次，"
+                  f"斷線 {row['outage_percentage']:.2f}%，平均仰角 {row['mean_serving_elevation']:.1f}°")
+        print("============================\n")
+        raise SystemExit(0)
     
     # 執行分析
-    analyzer.analyze_24h_coverage(interval_minutes=args.interval, analysis_duration_minutes=args.duration)
+    analyzer.analyze_24h_coverage(interval_minutes=args.interval, analysis_duration_minutes=args.duration,
+                                  workers=args.cpu,
+                                  coarse_step_seconds=args.coarse_step if args.prune else None,
+                                  method=args.method, resume=args.resume, max_memory=args.max_memory)
     
     # 生成視覺化和報告
-    analyzer.generate_visualizations()
-    analyzer.export_html_report()
+    analyzer.generate_visualizations(preset=args.render_preset, force=args.force_render)
+    analyzer.export_html_report(force=args.force_render)
+    print(f"\n==== 各階段耗時 (run_metrics.json) ====")
+    print(analyzer.metrics.format_table())
     
     # 打印分析結果
     if hasattr(analyzer, 'coverage_df') and not analyzer.coverage_df.empty:
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+任意解析度的分析時間網格
+
+以起始時間加上秒數偏移量陣列表示時間序列，可一次轉換為 skyfield 時間陣列，
+支援秒級(甚至次秒級)間隔，不必建立 Python datetime 列表。
+"""
+
+import numpy as np
+import pandas as pd
+
+# 時間標籤格式，與 coverage_data.csv 既有的格式一致
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+SUBSECOND_TIME_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+
+class TimeGrid:
+    """起始時間 + 固定間隔的時間網格"""
+
+    def __init__(self, start, offsets_seconds):
+        """
+        Args:
+            start (datetime): 帶時區(UTC)的起始時間
+            offsets_seconds: 相對起始時間的秒數偏移量陣列
+        """
+        self.start = start
+        self.offsets_seconds = np.asarray(offsets_seconds, dtype=float)
+
+    @classmethod
+    def from_interval(cls, start, duration_minutes, interval_minutes, include_end=False):
+        """以分析時長與間隔(分鐘，可為小數)建立時間網格
+
+        Args:
+            start (datetime): 帶時區(UTC)的起始時間
+            duration_minutes (float): 分析時長(分鐘)
+            interval_minutes (float): 時間間隔(分鐘)，可小於 1 以取得秒級解析度
+            include_end (bool): 是否包含結束時間點
+
+        Returns:
+            TimeGrid
+        """
+        if interval_minutes is None or interval_minutes <= 0:
+            raise ValueError(f"時間間隔必須大於 0，收到 {interval_minutes}")
+        # 以微秒為最小單位，避免 0.1 分鐘 * 60 之類的浮點誤差
+        step_seconds = round(float(interval_minutes) * 60.0, 6)
+        # 先四捨五入再取整，避免 0.1 分鐘這類十進位小數的浮點誤差多出或少掉一個時間點
+        steps = round(float(duration_minutes) * 60.0 / step_seconds, 9)
+        n_times = int(np.floor(steps)) + 1 if include_end else int(np.ceil(steps))
+        return cls(start, np.arange(max(n_times, 0)) * step_seconds)
+
+    def __len__(self):
+        return len(self.offsets_seconds)
+
+    def __getitem__(self, index):
+        """以切片取出子網格 (共用同一個起始時間)"""
+        if not isinstance(index, slice):
+            raise TypeError("TimeGrid 只支援切片索引")
+        return TimeGrid(self.start, self.offsets_seconds[index])
+
+    @property
+    def step_seconds(self):
+        """相鄰時間點的間隔(秒)，少於兩個時間點時為 None"""
+        if len(self) < 2:
+            return None
+        return float(self.offsets_seconds[1] - self.offsets_seconds[0])
+
+    def to_skyfield(self, ts):
+        """一次轉換為 skyfield 時間陣列"""
+        start = self.start
+        seconds = start.second + start.microsecond / 1e6 + self.offsets_seconds
+        return ts.utc(start.year, start.month, start.day, start.hour, start.minute, seconds)
+
+    def to_datetime_index(self):
+        """轉換為 pandas DatetimeIndex (UTC)"""
+        return pd.Timestamp(self.start) + pd.to_timedelta(self.offsets_seconds, unit='s')
+
+    @property
+    def has_subsecond(self):
+        """時間間隔是否不為整數秒
+
+        只看偏移量，不看起始時間：預設起始時間 datetime.now() 帶有微秒，
+        標籤仍與先前相同使用 TIME_FORMAT (截去起始時間的微秒)。
+        """
+        return bool(np.any(np.mod(self.offsets_seconds, 1.0)))
+
+    def labels(self, subsecond=None):
+        """時間標籤字串列表，間隔不為整數秒時保留微秒
+
+        Args:
+            subsecond (bool): 是否保留微秒；None 表示依本網格自動判斷。
+                分批輸出子網格時應傳入整個網格的判斷結果，使各批格式一致
+        """
+        if subsecond is None:
+            subsecond = self.has_subsecond
+        return self.to_datetime_index().strftime(SUBSECOND_TIME_FORMAT if subsecond else TIME_FORMAT).tolist()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地 TLE 快取
+
+所有分析器共用同一份磁碟上的 TLE 資料：在有效期限內直接讀取本地檔案，
+過期後以 ETag / Last-Modified 向 CelesTrak 做條件式重新驗證，
+離線模式則完全不連線，只使用既有快取。
+"""
+
+import os
+import json
+import time
+import hashlib
+import argparse
+
+STARLINK_TLE_URL = 'https://celestrak.org/NORAD/elements/gp.php?GROUP=starlink&FORMAT=tle'
+
+# 預設快取目錄與有效期限，可用環境變數覆寫
+DEFAULT_CACHE_DIR = os.environ.get(
+    'STARLINK_TLE_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'tle_cache'))
+DEFAULT_MAX_AGE_HOURS = float(os.environ.get('STARLINK_TLE_MAX_AGE_HOURS', '2'))
+DEFAULT_OFFLINE = os.environ.get('STARLINK_TLE_OFFLINE', '0').lower() in ('1', 'true', 'yes')
+
+REQUEST_TIMEOUT_SECONDS = 30
+
+
+class TLEStore:
+    """具有效期限、條件式重新驗證與離線模式的 TLE 磁碟快取"""
+
+    def __init__(self, cache_dir=None, url=STARLINK_TLE_URL, max_age_hours=None, offline=None):
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self.url = url
+        self.max_age_hours = DEFAULT_MAX_AGE_HOURS if max_age_hours is None else float(max_age_hours)
+        self.offline = DEFAULT_OFFLINE if offline is None else bool(offline)
+
+        # 以來源網址區分快取檔案，不同群組的 TLE 可共用同一目錄
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()[:12]
+        self.tle_path = os.path.join(self.cache_dir, f"{key}.tle")
+        self.meta_path = os.path.join(self.cache_dir, f"{key}.json")
+
+    def _read_meta(self):
+        if not os.path.exists(self.meta_path):
+            return {}
+        try:
+            with open(self.meta_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_meta(self, meta):
+        self._atomic_write(self.meta_path, json.dumps(meta))
+
+    def _atomic_write(self, path, text):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+    def _read_cached_lines(self):
+        with open(self.tle_path, 'r') as f:
+            return f.read().strip().split('\n')
+
+    def has_cache(self):
+        """是否已有本地快取"""
+        return os.path.exists(self.tle_path)
+
+    def age_hours(self):
+        """快取距離上次下載或驗證的時數，沒有快取時回傳 None"""
+        if not self.has_cache():
+            return None
+        fetched_at = self._read_meta().get('fetched_at', os.path.getmtime(self.tle_path))
+        return (time.time() - fetched_at) / 3600.0
+
+    def is_fresh(self):
+        """快取是否仍在有效期限內"""
+        age = self.age_hours()
+        return age is not None and age <= self.max_age_hours
+
+    def get_lines(self, force_refresh=False):
+        """取得 TLE 文字行
+
+        Args:
+            force_refresh (bool): 忽略有效期限，立即向來源重新驗證
+
+        Returns:
+            TLE 文字行列表 (名稱、第一行、第二行交替)
+        """
+        if self.offline:
+            if not self.has_cache():
+                raise Exception(f"離線模式下找不到 TLE 快取: {self.tle_path}")
+            print(f"離線模式：使用本地 TLE 快取 {self.tle_path}")
+            return self._read_cached_lines()
+
+        if not force_refresh and self.is_fresh():
+            print(f"使用本地 TLE 快取 (已快取 {self.age_hours():.1f} 小時)")
+            return self._read_cached_lines()
+
+        try:
+            return self._revalidate()
+        except Exception as e:
+            if self.has_cache():
+                print(f"更新 TLE 數據失敗 ({e})，改用過期的本地快取")
+                return self._read_cached_lines()
+            raise
+
+    def _revalidate(self):
+        """向來源做條件式請求，未變更時只更新驗證時間"""
+        import requests
+
+        meta = self._read_meta()
+        headers = {}
+        if self.has_cache():
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+
+        print("正在下載 Starlink TLE 數據...")
+        response = requests.get(self.url, headers=headers, timeout=REQUEST_TIMEOUT_SECONDS)
+        if response.status_code == 304:
+            meta['fetched_at'] = time.time()
+            self._write_meta(meta)
+            print("TLE 數據未變更，沿用本地快取")
+            return self._read_cached_lines()
+        if response.status_code != 200:
+            raise Exception(f"下載失敗，狀態碼：{response.status_code}")
+
+        tle_data = response.text.strip().split('\n')
+        if len(tle_data) < 3:
+            raise Exception("TLE 數據格式錯誤")
+
+        self._atomic_write(self.tle_path, '\n'.join(line.rstrip('\r') for line in tle_data) + '\n')
+        self._write_meta({
+            'url': self.url,
+            'fetched_at': time.time(),
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+        })
+        return self._read_cached_lines()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Starlink TLE 本地快取工具')
+    parser.add_argument('--refresh', action='store_true', help='忽略有效期限，立即向來源重新驗證')
+    parser.add_argument('--cache-dir', default=None, help='快取目錄')
+    parser.add_argument('--max-age', type=float, default=None, help='快取有效期限 (小時)')
+    args = parser.parse_args()
+
+    store = TLEStore(cache_dir=args.cache_dir, max_age_hours=args.max_age)
+    lines = store.get_lines(force_refresh=args.refresh)
+    print(f"TLE 快取: {store.tle_path} ({len(lines) // 3} 顆衛星)")
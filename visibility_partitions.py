@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+以 TLE 雜湊分區的增量可見度計算
+
+可見紀錄依 UTC 對齊的時間區塊 (預設每 6 小時一塊) 保存，
+每個區塊內再以衛星 TLE 兩行內容的雜湊值分區。
+TLE 更新後只計算雜湊值不在區塊中的衛星 (軌道根數變動或新增者)，
+已不在目錄中的衛星 (例如已墜毀) 直接從區塊移除；
+時間前進時只有新進入分析時段的區塊需要完整計算。
+"""
+
+import os
+import glob
+import json
+import hashlib
+from datetime import datetime, timezone
+
+import numpy as np
+from skyfield.api import wgs84
+
+from propagation import SatelliteArray, iter_visible, DEFAULT_MIN_ELEVATION
+from result_cache import code_version
+from time_grid import TimeGrid
+
+DEFAULT_PARTITION_DIR = os.environ.get(
+    'STARLINK_PARTITION_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'visibility_partitions'))
+DEFAULT_BLOCK_HOURS = 6
+
+
+def tle_line_hashes(catalog):
+    """每顆衛星 TLE 兩行內容的雜湊值 (名稱不影響軌道，不列入)"""
+    return np.array([hashlib.sha256(f"{line1}\n{line2}".encode('utf-8')).hexdigest()[:16]
+                     for line1, line2 in zip(catalog.records['line1'].tolist(), catalog.records['line2'].tolist())],
+                    dtype='<U16')
+
+
+def aligned_start(moment, interval_seconds):
+    """將時間向下對齊到自 1970-01-01 UTC 起的固定間隔，使各次執行的時間點一致"""
+    return _utc_from_step(int(np.floor(moment.timestamp() / interval_seconds)), interval_seconds)
+
+
+class VisibilityPartitions:
+    """以 (時間區塊, TLE 雜湊) 分區保存的可見紀錄"""
+
+    def __init__(self, lat, lon, elevation=0, interval_minutes=1, min_elevation=DEFAULT_MIN_ELEVATION,
+                 partition_dir=None, block_hours=DEFAULT_BLOCK_HOURS, coarse_step_seconds=None):
+        """
+        Args:
+            lat (float): 觀測點緯度
+            lon (float): 觀測點經度
+            elevation (float): 觀測點海拔(公尺)
+            interval_minutes (float): 時間間隔(分鐘)
+            min_elevation (float): 最小可見仰角(度)
+            partition_dir (str): 分區保存位置，預設為 data/visibility_partitions
+            block_hours (float): 時間區塊長度(小時)
+            coarse_step_seconds (float): 計算時使用的粗篩網格間隔(秒)，None 表示逐一精算
+        """
+        self.observer = wgs84.latlon(lat, lon, elevation)
+        self.step_seconds = round(float(interval_minutes) * 60.0, 6)
+        self.min_elevation = min_elevation
+        self.block_steps = max(1, int(round(block_hours * 3600.0 / self.step_seconds)))
+        self.coarse_step_seconds = coarse_step_seconds
+        # 觀測點與時間網格的設定不同時使用不同的子目錄；引擎程式碼變更時自動失效
+        config = json.dumps({'lat': round(float(lat), 6), 'lon': round(float(lon), 6),
+                             'elevation': round(float(elevation), 3), 'step_seconds': self.step_seconds,
+                             'min_elevation': float(min_elevation), 'block_steps': self.block_steps,
+                             'code_version': code_version()}, sort_keys=True)
+        self.path = os.path.join(partition_dir or DEFAULT_PARTITION_DIR,
+                                 hashlib.sha256(config.encode('utf-8')).hexdigest()[:16])
+        self.stats = {'reused': 0, 'computed': 0, 'dropped': 0, 'blocks': 0}
+
+    def _block_path(self, block):
+        return os.path.join(self.path, f"block-{block}.npz")
+
+    def _load_block(self, block):
+        try:
+            with np.load(self._block_path(block)) as data:
+                return {key: data[key] for key in data.files}
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _save_block(self, block, data):
+        os.makedirs(self.path, exist_ok=True)
+        tmp_path = f"{self._block_path(block)}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, **data)
+        os.replace(tmp_path, self._block_path(block))
+
+    def _compute(self, satellite_array, ts, block):
+        """計算 satellite_array 在整個時間區塊內的可見紀錄 (衛星索引為 satellite_array 內的索引)"""
+        first_step = block * self.block_steps
+        time_grid = TimeGrid(_utc_from_step(first_step, self.step_seconds),
+                             np.arange(self.block_steps) * self.step_seconds)
+        chunks = list(iter_visible(satellite_array, self.observer, time_grid.to_skyfield(ts),
+                                   min_elevation=self.min_elevation, coarse_step_seconds=self.coarse_step_seconds))
+        if not chunks:
+            return (np.array([], dtype=np.int32),) * 2 + (np.array([], dtype=np.float32),) * 3
+        step, satellite, alt, az, distance = (np.concatenate(column) for column in zip(*chunks))
+        return (step.astype(np.int32), satellite.astype(np.int32), alt.astype(np.float32),
+                az.astype(np.float32), distance.astype(np.float32))
+
+    def update_block(self, block, catalog, ts, hashes=None, satellite_array=None):
+        """補齊時間區塊中缺少的 TLE 雜湊分區，並移除已不在目錄中的分區
+
+        satellite_array 為整份目錄的衛星陣列，逐區塊呼叫時由呼叫端建立一次後傳入，
+        未提供時才由目錄建立。
+
+        Returns:
+            區塊資料 dict (hashes、partition、step、alt、az、distance)
+        """
+        hashes = tle_line_hashes(catalog) if hashes is None else hashes
+        current, first_index = np.unique(hashes, return_index=True)
+        data = self._load_block(block)
+        if data is None:
+            data = {'hashes': np.array([], dtype='<U16'), 'partition': np.array([], dtype=np.int32),
+                    'step': np.array([], dtype=np.int32), 'alt': np.array([], dtype=np.float32),
+                    'az': np.array([], dtype=np.float32), 'distance': np.array([], dtype=np.float32)}
+
+        stored = data['hashes']
+        keep_partition = np.isin(stored, current)
+        missing = current[~np.isin(current, stored)]
+        self.stats['reused'] += int(keep_partition.sum())
+        self.stats['dropped'] += int((~keep_partition).sum())
+        self.stats['computed'] += len(missing)
+        self.stats['blocks'] += 1
+        if not len(missing) and keep_partition.all():
+            return data
+
+        # 沿用仍在目錄中的分區，分區編號重新對應到新的雜湊列表
+        new_hashes = np.concatenate((stored[keep_partition], missing))
+        remap = np.full(len(stored), -1, dtype=np.int32)
+        remap[keep_partition] = np.arange(int(keep_partition.sum()), dtype=np.int32)
+        rows = keep_partition[data['partition']] if len(stored) else np.zeros(0, dtype=bool)
+        parts = [(remap[data['partition'][rows]], data['step'][rows], data['alt'][rows], data['az'][rows],
+                  data['distance'][rows])]
+
+        if len(missing):
+            missing_indices = first_index[np.searchsorted(current, missing)]
+            if satellite_array is None:
+                satellite_array = SatelliteArray.from_catalog(catalog)
+            step, satellite, alt, az, distance = self._compute(satellite_array.subset(missing_indices), ts, block)
+            parts.append((satellite + int(keep_partition.sum()), step, alt, az, distance))
+
+        partition, step, alt, az, distance = (np.concatenate(column) for column in zip(*parts))
+        data = {'hashes': new_hashes, 'partition': partition.astype(np.int32), 'step': step.astype(np.int32),
+                'alt': alt, 'az': az, 'distance': distance}
+        self._save_block(block, data)
+        return data
+
+    def iter_visible(self, catalog, ts, time_grid, satellite_array=None):
+        """以分區結果產生與 propagation.iter_visible 相同格式的可見紀錄 (依時間、再依衛星排序)
+
+        time_grid 的起始時間需對齊到時間間隔 (aligned_start)。
+        只計算缺少的分區，並刪除早於分析時段的舊區塊。
+        satellite_array 為呼叫端已由同一份目錄建立的衛星陣列，未提供時建立一次供所有區塊共用。
+
+        Yields:
+            (time_index, satellite_index, alt, az, distance) 陣列組，每個時間區塊一組
+        """
+        if len(time_grid) == 0:
+            return
+        first_step = int(round(time_grid.start.timestamp() / self.step_seconds))
+        last_step = first_step + int(round(time_grid.offsets_seconds[-1] / self.step_seconds))
+        hashes = tle_line_hashes(catalog)
+        # 整份目錄只建立一次衛星陣列，各區塊從中取出缺少的衛星
+        if satellite_array is None:
+            satellite_array = SatelliteArray.from_catalog(catalog)
+        # 雜湊相同的衛星(重複的 TLE)共用同一個分區
+        unique_hashes, inverse = np.unique(hashes, return_inverse=True)
+        order = np.argsort(inverse, kind='stable')
+        counts = np.bincount(inverse, minlength=len(unique_hashes))
+        offsets = np.concatenate(([0], np.cumsum(counts)))
+
+        self._remove_expired(first_step // self.block_steps)
+        for block in range(first_step // self.block_steps, last_step // self.block_steps + 1):
+            data = self.update_block(block, catalog, ts, hashes, satellite_array)
+            step = data['step'].astype(np.int64) + block * self.block_steps
+            rows = (step >= first_step) & (step <= last_step)
+            # 分區 -> 目前目錄中的衛星索引 (可能對應多顆衛星)
+            unique_index = np.searchsorted(unique_hashes, data['hashes'])[data['partition'][rows]]
+            repeat = counts[unique_index]
+            satellite = order[np.repeat(offsets[unique_index], repeat) + _ranges(repeat)]
+            time_index = np.repeat(step[rows] - first_step, repeat)
+            alt, az, distance = (np.repeat(data[key][rows], repeat) for key in ('alt', 'az', 'distance'))
+            sort = np.lexsort((satellite, time_index))
+            yield (time_index[sort], satellite[sort], alt[sort].astype(float), az[sort].astype(float),
+                   distance[sort].astype(float))
+
+    def _remove_expired(self, first_block):
+        """刪除完全早於分析時段的區塊"""
+        for path in glob.glob(os.path.join(self.path, 'block-*.npz')):
+            try:
+                block = int(os.path.basename(path)[len('block-'):-len('.npz')])
+            except ValueError:
+                continue
+            if block < first_block:
+                os.remove(path)
+
+
+def _utc_from_step(step, step_seconds):
+    return datetime.fromtimestamp(step * step_seconds, timezone.utc)
+
+
+def _ranges(counts):
+    """[0..counts[0]), [0..counts[1]), ... 串接後的陣列"""
+    if len(counts) == 0:
+        return np.array([], dtype=np.int64)
+    ends = np.cumsum(counts)
+    return np.arange(ends[-1]) - np.repeat(ends - counts, counts)
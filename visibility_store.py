@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+精簡的欄式可見度紀錄
+
+每筆 (時間點, 衛星) 可見紀錄只存整數與 float32：
+衛星以整數 ID 加上名稱字典表示，時間為 int32 時間索引加上時間網格，
+仰角/方位角/距離為 float32，方向為 uint8 類別代碼。
+每個欄位是一個無標頭的小端序二進位檔，另以 meta.json 描述欄位與字典，
+Python 端以記憶體映射讀取，R 端以 readBin 直接讀取 (R/read_visibility_store.R)，
+不需要經過 reticulate 複製資料，也不需要額外套件。
+"""
+
+import os
+import json
+
+import numpy as np
+import pandas as pd
+
+from time_grid import TimeGrid
+
+STORE_VERSION = 1
+META_FILE = 'meta.json'
+
+# 方向類別，代碼為 round(方位角 / 45) % 8
+DIRECTIONS = ["北", "東北", "東", "東南", "南", "西南", "西", "西北"]
+
+# 欄位名稱 -> NumPy 型別 (皆為小端序)
+COLUMNS = {
+    'time_index': '<i4',
+    'satellite_id': '<i4',
+    'elev': '<f4',
+    'az': '<f4',
+    'distance': '<f4',
+    'direction': 'u1',
+    'rain': 'u1',
+}
+
+
+def direction_codes(azimuth):
+    """將方位角(度)向量化轉換為方向代碼 (與 py/visibility.get_direction 相同的分組)"""
+    return (np.round(np.asarray(azimuth, dtype=float) / 45.0).astype(np.int64) % 8).astype(np.uint8)
+
+
+class VisibilityStoreWriter:
+    """分批附加可見紀錄到欄式存放目錄"""
+
+    def __init__(self, path, satellite_names, time_grid, min_elevation=None):
+        """
+        Args:
+            path (str): 存放目錄 (例如 output/visibility.store)
+            satellite_names: 衛星名稱列表，索引即為 satellite_id
+            time_grid (TimeGrid): 時間網格，time_index 為其索引
+            min_elevation (float): 記錄用的仰角門檻
+        """
+        self.path = path
+        self.n_rows = 0
+        os.makedirs(path, exist_ok=True)
+        self._files = {name: open(os.path.join(path, f"{name}.bin"), 'wb') for name in COLUMNS}
+        time_grid.offsets_seconds.astype('<f8').tofile(os.path.join(path, 'time_offsets.bin'))
+        self._meta = {
+            'version': STORE_VERSION,
+            'n_rows': 0,
+            'complete': False,
+            'start': pd.Timestamp(time_grid.start).isoformat(),
+            'n_times': len(time_grid),
+            'min_elevation': min_elevation,
+            'columns': {name: {'file': f"{name}.bin", 'dtype': np.dtype(dtype).name, 'size': np.dtype(dtype).itemsize}
+                        for name, dtype in COLUMNS.items()},
+            'satellites': list(satellite_names),
+            'directions': DIRECTIONS,
+        }
+        self._write_meta()
+
+    def _write_meta(self):
+        tmp_path = os.path.join(self.path, f"{META_FILE}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._meta, f, ensure_ascii=False)
+        os.replace(tmp_path, os.path.join(self.path, META_FILE))
+
+    def append(self, time_index, satellite_index, alt, az, distance, rain=None):
+        """附加一批紀錄 (各參數為等長陣列)，寫出後更新 meta.json 的列數，讀取端可讀到已完成的部分"""
+        n = len(time_index)
+        if n == 0:
+            return
+        if rain is None:
+            rain = np.zeros(n, dtype=np.uint8)
+        values = {
+            'time_index': time_index,
+            'satellite_id': satellite_index,
+            'elev': alt,
+            'az': az,
+            'distance': distance,
+            'direction': direction_codes(az),
+            'rain': rain,
+        }
+        for name, dtype in COLUMNS.items():
+            self._files[name].write(np.ascontiguousarray(values[name], dtype=dtype).tobytes())
+            self._files[name].flush()
+        self.n_rows += n
+        self._meta['n_rows'] = self.n_rows
+        self._write_meta()
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+        self._meta['complete'] = True
+        self._write_meta()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+
+
+class VisibilityStore:
+    """以記憶體映射讀取的欄式可見紀錄"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, META_FILE), 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        if self.meta.get('version') != STORE_VERSION:
+            raise ValueError(f"不支援的可見紀錄格式版本: {self.meta.get('version')}")
+        self.n_rows = int(self.meta['n_rows'])
+        self.satellites = self.meta['satellites']
+        self.directions = self.meta['directions']
+        offsets = np.fromfile(os.path.join(path, 'time_offsets.bin'), dtype='<f8')
+        self.time_grid = TimeGrid(pd.Timestamp(self.meta['start']).to_pydatetime(), offsets)
+
+    def __len__(self):
+        return self.n_rows
+
+    def column(self, name):
+        """以記憶體映射取得欄位陣列 (只讀取 meta.json 記錄的列數)"""
+        spec = self.meta['columns'][name]
+        if self.n_rows == 0:
+            return np.empty(0, dtype=COLUMNS[name])
+        return np.memmap(os.path.join(self.path, spec['file']), dtype=COLUMNS[name], mode='r', shape=(self.n_rows,))
+
+    def to_frame(self):
+        """轉換為與 compute_visibility 相同欄位的 DataFrame；衛星與方向為類別型別"""
+        time_index = self.column('time_index')
+        return pd.DataFrame({
+            'time': self.time_grid.to_datetime_index()[np.asarray(time_index)],
+            'satellite': pd.Categorical.from_codes(np.asarray(self.column('satellite_id')), self.satellites),
+            'elev': np.asarray(self.column('elev')),
+            'az': np.asarray(self.column('az')),
+            'distance': np.asarray(self.column('distance')),
+            'direction': pd.Categorical.from_codes(np.asarray(self.column('direction'), dtype=np.int8),
+                                                   self.directions),
+            'rain': np.asarray(self.column('rain')),
+        })
+
+    def nbytes(self):
+        """欄位檔案的總大小(bytes)"""
+        return sum(os.path.getsize(os.path.join(self.path, spec['file'])) for spec in self.meta['columns'].values())